@@ -5,6 +5,7 @@ Core package for Hekate SD Card Migrator
 from core.disk_manager import DiskManager
 from core.partition_scanner import PartitionScanner
 from core.partition_writer import PartitionWriter
+from core.fat32_formatter import Fat32Formatter
 from core.migration_engine import MigrationEngine
 from core.partition_models import DiskLayout, Partition, PartitionType
 
@@ -12,6 +13,7 @@ __all__ = [
     'DiskManager',
     'PartitionScanner',
     'PartitionWriter',
+    'Fat32Formatter',
     'MigrationEngine',
     'DiskLayout',
     'Partition',
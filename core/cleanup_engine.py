@@ -2,26 +2,64 @@
 Cleanup Engine - Remove unwanted partitions and expand FAT32 on single SD card
 """
 
+import sys
 import time
 import logging
 import subprocess
 import tempfile
 import os
+import re
+import shutil
+import stat
+import traceback
+from collections import deque
 from pathlib import Path
 from typing import Callable, Optional
-from core.disk_manager import DiskManager
+from core.disk_manager import DiskManager, DiskpartSession
+from core.fat32_formatter import Fat32Formatter
 from core.partition_writer import PartitionWriter
-from core.partition_models import DiskLayout
+from core.partition_models import DiskLayout, RAW_FOLDER_NAME, RAW_FOLDER_ID, EMUMMC_INI_TEMPLATE
+
+if sys.platform == 'win32':
+    import pythoncom
+    import win32api
+    import wmi
 
 logger = logging.getLogger(__name__)
 
 SECTOR_SIZE = 512
 
+# Windows-generated folders and files not worth copying through the temporary backup
+BACKUP_EXCLUDE_DIRS = ['System Volume Information', '$RECYCLE.BIN', 'FOUND.000']
+BACKUP_EXCLUDE_FILES = ['desktop.ini', 'Thumbs.db']
+
+# Bootloader ini files belonging to removed partitions (matched case-insensitively like Windows globs)
+_ANDROID_INI = re.compile(r'^.*android.*\.ini$', re.IGNORECASE)
+_LINUX_INI = re.compile(r'^(?:L4T.*\.ini|lakka\.ini)$', re.IGNORECASE)
+
+# Robocopy per-file line with /BYTES, e.g. "New File    12345    Nintendo\\Contents\\..."
+# Matched against the raw output bytes; lines are only decoded when logged
+_ROBOCOPY_FILE_LINE = re.compile(rb'^(?:New File|Newer|Older|Changed|Tweaked)?\s*(\d+)\s+\S')
+
+# Robocopy writes to a pipe in the console (OEM) code page
+ROBOCOPY_ENCODING = 'oem'
+
+def _parse_disk_index(disk_path: str) -> int:
+    """Get N from a \\\\.\\PhysicalDriveN path"""
+    prefix, sep, index = disk_path.rpartition('PhysicalDrive')
+    if not sep or prefix != '\\\\.\\' or not index.isdigit():
+        raise ValueError(f"Not a physical drive path: {disk_path}")
+    return int(index)
+
 class CleanupEngine:
     """Handles the cleanup process for a single SD card"""
 
     def __init__(self, disk, source_layout: DiskLayout, target_layout: DiskLayout, options: dict):
         self.disk = disk
+        self.disk_index = _parse_disk_index(disk['path'])
+
+        # Every diskpart script starts by selecting this disk
+        self._dp_select = f"select disk {self.disk_index}\n"
         self.source_layout = source_layout
         self.target_layout = target_layout
         self.options = options
@@ -36,29 +74,39 @@ class CleanupEngine:
 
         self.cancelled = False
 
+        # WMI connection and partition query cache (created lazily on the worker thread)
+        self._wmi = None
+        self._part_cache = {}
+
+        # One diskpart process shared by every rescan/assign in this run
+        self._diskpart = DiskpartSession()
+
     def run(self):
         """Execute cleanup operation"""
         # Initialize COM for this thread (needed for WMI operations)
-        import pythoncom
         pythoncom.CoInitialize()
 
         try:
             self._report_progress("Initializing", 0, "Preparing cleanup...")
 
-            # Stage 1: Backup FAT32 data to temporary location
-            self._backup_fat32_data()
+            if self._fat32_unchanged():
+                # FAT32 keeps its exact extent - its data never has to move
+                self._preserve_fat32_in_place()
+            else:
+                # Stage 1: Backup FAT32 data to temporary location
+                self._backup_fat32_data()
 
-            # Stage 2: Clean disk (delete all partitions)
-            self._clean_disk()
+                # Stage 2: Clean disk (delete all partitions)
+                self._clean_disk()
 
-            # Stage 3: Write new partition table
-            self._write_partition_tables()
+                # Stage 3: Write new partition table
+                self._write_partition_tables()
 
-            # Stage 4: Create FAT32 filesystem
-            self._create_fat32_filesystem()
+                # Stage 4: Create FAT32 filesystem
+                self._create_fat32_filesystem()
 
-            # Stage 5: Restore FAT32 data
-            self._restore_fat32_data()
+                # Stage 5: Restore FAT32 data
+                self._restore_fat32_data()
 
             # Stage 6: Update emuMMC config if emuMMC is preserved
             if not self.options.get('remove_emummc', False) and self.source_layout.has_emummc:
@@ -70,7 +118,6 @@ class CleanupEngine:
 
         except Exception as e:
             logger.error(f"Cleanup failed: {e}")
-            import traceback
             logger.error(traceback.format_exc())
             if self.on_error:
                 self.on_error(str(e))
@@ -78,25 +125,52 @@ class CleanupEngine:
             # Cleanup temp directory if it exists
             if hasattr(self, 'temp_backup_dir') and os.path.exists(self.temp_backup_dir):
                 try:
-                    import shutil
-                    shutil.rmtree(self.temp_backup_dir)
+                    self._remove_temp_dir(self.temp_backup_dir)
                     logger.info(f"Cleaned up temporary backup directory: {self.temp_backup_dir}")
                 except Exception as e:
                     logger.warning(f"Failed to cleanup temp directory: {e}")
 
+            self._diskpart.close()
+
             # Uninitialize COM when done
             pythoncom.CoUninitialize()
 
+    def _fat32_unchanged(self):
+        """Check if the target FAT32 partition covers exactly the same sectors as the source"""
+        source_fat32 = self.source_layout.get_fat32_partition()
+        target_fat32 = self.target_layout.get_fat32_partition()
+
+        if not source_fat32 or not target_fat32:
+            return False
+
+        return (source_fat32.start_sector == target_fat32.start_sector and
+                source_fat32.size_sectors == target_fat32.size_sectors)
+
+    def _preserve_fat32_in_place(self):
+        """Rewrite the partition table around an untouched FAT32 filesystem"""
+        logger.info("FAT32 extent is unchanged - skipping backup, format and restore")
+        self._report_progress("Preserving FAT32", 10, "FAT32 is unchanged, keeping data in place...")
+
+        # Clean only wipes the partition tables; FAT32 starts well past them
+        self._clean_disk()
+        self._write_partition_tables()
+
+        fat32_part = self.target_layout.get_fat32_partition()
+
+        logger.info("Assigning and locking drive letter for FAT32 partition...")
+        self.fat32_drive = self._assign_and_lock_drive_letter(fat32_part)
+
+        # Clean up bootloader ini files for removed partitions
+        self._cleanup_bootloader_ini_files()
+
+        self._report_progress("Preserving FAT32", 95, "Cleanup complete")
+
     def _backup_fat32_data(self):
         """Backup FAT32 data to temporary location"""
         self._report_progress("Backing up FAT32", 5, "Creating temporary backup of FAT32 data...")
 
         # Get FAT32 partition from source layout
-        fat32_part = None
-        for part in self.source_layout.partitions:
-            if part.category == 'FAT32':
-                fat32_part = part
-                break
+        fat32_part = self.source_layout.get_fat32_partition()
 
         if not fat32_part:
             raise Exception("No FAT32 partition found!")
@@ -115,12 +189,20 @@ class CleanupEngine:
 
         self._report_progress("Backing up FAT32", 10, f"Backing up from {drive_letter} to temp folder...")
 
+        # Used space on the source volume is the progress denominator
+        try:
+            used_bytes = shutil.disk_usage(drive_letter + '\\').used
+        except OSError:
+            used_bytes = 0
+
         # Use robocopy to backup FAT32 data
-        self._copy_files_robocopy(
+        self.backup_bytes = self._copy_files_robocopy(
             drive_letter,
             self.temp_backup_dir,
             "Backing up FAT32",
-            10
+            10,
+            progress_span=25,
+            total_bytes=used_bytes
         )
 
         self._report_progress("Backing up FAT32", 35, "FAT32 data backed up successfully")
@@ -134,13 +216,13 @@ class CleanupEngine:
 
         # Wait for Windows to release the disk
         self._report_progress("Cleaning Disk", 43, "Waiting for Windows to release disk...")
-        logger.info("Waiting 3 seconds for Windows to release disk...")
-        time.sleep(3)
+        logger.info("Waiting for Windows to drop the old partitions...")
+        if not self._wait_for_partitions(lambda partitions: not partitions, timeout=3.0):
+            logger.warning("Old partitions still listed after clean, continuing anyway")
 
         # Additional refresh
         logger.info("Performing additional disk refresh...")
         self.disk_manager._prepare_disk_for_write(self.disk['path'])
-        time.sleep(1)
 
         self._report_progress("Cleaning Disk", 45, "Disk cleaned successfully")
 
@@ -155,43 +237,36 @@ class CleanupEngine:
 
         # Refresh disk to make new partitions visible
         logger.info("Refreshing disk to make partitions visible...")
-        self._refresh_disk_partitions(self.disk['path'])
-        time.sleep(2)
+        self._refresh_disk_partitions()
+
+        fat32_part = self.target_layout.get_fat32_partition()
+        if fat32_part and not self._wait_for_partition_visible(fat32_part.start_sector):
+            logger.warning("New FAT32 partition not visible yet, continuing anyway")
 
         self._report_progress("Writing Partition Table", 55, "Partition table written")
 
     def _create_fat32_filesystem(self):
-        """Create FAT32 filesystem using fat32format.exe"""
+        """Create FAT32 filesystem directly on the partition"""
         self._report_progress("Creating FAT32", 60, "Formatting FAT32 partition...")
 
         # Get FAT32 partition from target layout
-        fat32_part = None
-        for part in self.target_layout.partitions:
-            if part.category == 'FAT32':
-                fat32_part = part
-                break
+        fat32_part = self.target_layout.get_fat32_partition()
 
         if not fat32_part:
             raise Exception("No FAT32 partition in target layout!")
 
         logger.info("Waiting for Windows to recognize new partitions...")
-        time.sleep(3)
-
-        logger.info("Refreshing disk before formatting...")
-        self._refresh_disk_partitions(self.disk['path'])
-        time.sleep(2)
+        if not self._wait_for_partition_visible(fat32_part.start_sector):
+            logger.info("Refreshing disk before formatting...")
+            self._refresh_disk_partitions()
+            self._wait_for_partition_visible(fat32_part.start_sector)
 
-        logger.info("Formatting FAT32 partition with fat32format.exe...")
+        # 128 sectors per cluster = 64KB, optimal for SD cards
+        logger.info("Writing FAT32 filesystem...")
+        Fat32Formatter(self.disk_manager).format(self.disk['path'], fat32_part, sectors_per_cluster=128)
 
-        # Calculate optimal cluster size (128 sectors = 64KB)
-        sectors_per_cluster = 128
-
-        # Get the tool path
-        tool_dir = Path(__file__).parent.parent / "tool"
-        fat32format_exe = tool_dir / "fat32format.exe"
-
-        if not fat32format_exe.exists():
-            raise FileNotFoundError(f"fat32format.exe not found at {fat32format_exe}")
+        # Let Windows pick up the new filesystem before mounting it
+        self._refresh_disk_partitions()
 
         # Assign and lock drive letter
         logger.info("Assigning and locking drive letter for FAT32 partition...")
@@ -199,30 +274,6 @@ class CleanupEngine:
 
         logger.info(f"FAT32 partition locked to drive letter: {self.fat32_drive}")
 
-        # Run fat32format.exe
-        format_cmd = [
-            str(fat32format_exe),
-            f"-c{sectors_per_cluster}",
-            f"{self.fat32_drive}"
-        ]
-
-        logger.info(f"Running format command: {' '.join(format_cmd)}")
-
-        result = subprocess.run(
-            format_cmd,
-            input="Y\n",  # Auto-confirm
-            capture_output=True,
-            text=True,
-            timeout=300,
-            creationflags=subprocess.CREATE_NO_WINDOW
-        )
-
-        logger.info(f"Format command output:\n{result.stdout}")
-
-        if result.returncode != 0:
-            logger.error(f"Format failed: {result.stderr}")
-            raise RuntimeError(f"FAT32 format failed: {result.stderr}")
-
         logger.info("FAT32 filesystem created successfully")
         self._report_progress("Creating FAT32", 70, "FAT32 partition formatted")
 
@@ -243,7 +294,9 @@ class CleanupEngine:
             self.temp_backup_dir,
             self.fat32_drive,
             "Restoring FAT32",
-            75
+            75,
+            progress_span=15,
+            total_bytes=getattr(self, 'backup_bytes', 0)
         )
 
         self._report_progress("Restoring FAT32", 90, "FAT32 data restored successfully")
@@ -269,32 +322,30 @@ class CleanupEngine:
             logger.info(f"Checking bootloader ini files in {bootloader_ini_path}")
 
             # Determine which ini files to remove based on cleanup options
-            ini_files_to_remove = []
-
-            # Remove Android ini files if Android partition was deleted
-            if self.options.get('remove_android', False):
-                # Look for android-related ini files
-                android_patterns = ['android.ini', '*android*.ini']
-                for pattern in android_patterns:
-                    for ini_file in bootloader_ini_path.glob(pattern):
-                        if ini_file.is_file():
-                            ini_files_to_remove.append(ini_file)
-                            logger.info(f"Found Android ini file to remove: {ini_file.name}")
-
-            # Remove Linux ini files if Linux partition was deleted
-            if self.options.get('remove_linux', False):
-                # Look for linux-related ini files (L4T variants and Lakka)
-                linux_patterns = ['L4T*.ini', 'lakka.ini']
-                for pattern in linux_patterns:
-                    for ini_file in bootloader_ini_path.glob(pattern):
-                        if ini_file.is_file() and ini_file not in ini_files_to_remove:
-                            ini_files_to_remove.append(ini_file)
-                            logger.info(f"Found Linux ini file to remove: {ini_file.name}")
+            remove_android = self.options.get('remove_android', False)
+            remove_linux = self.options.get('remove_linux', False)
+            ini_files_to_remove = set()
+
+            # Single directory pass matched against the precompiled patterns
+            with os.scandir(bootloader_ini_path) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+
+                    # Remove Android ini files if Android partition was deleted
+                    if remove_android and _ANDROID_INI.match(entry.name):
+                        ini_files_to_remove.add(Path(entry.path))
+                        logger.info(f"Found Android ini file to remove: {entry.name}")
+
+                    # Remove Linux ini files if Linux partition was deleted (L4T variants and Lakka)
+                    elif remove_linux and _LINUX_INI.match(entry.name):
+                        ini_files_to_remove.add(Path(entry.path))
+                        logger.info(f"Found Linux ini file to remove: {entry.name}")
 
             # Remove the identified ini files
             if ini_files_to_remove:
                 logger.info(f"Removing {len(ini_files_to_remove)} bootloader ini file(s)...")
-                for ini_file in ini_files_to_remove:
+                for ini_file in sorted(ini_files_to_remove):
                     try:
                         ini_file.unlink()
                         logger.info(f"Removed: {ini_file.name}")
@@ -307,7 +358,6 @@ class CleanupEngine:
 
         except Exception as e:
             logger.error(f"Error cleaning up bootloader ini files: {e}")
-            import traceback
             logger.error(traceback.format_exc())
             # Don't raise - this is not critical enough to fail the entire cleanup
 
@@ -332,7 +382,6 @@ class CleanupEngine:
 
             base_path = Path(self.fat32_drive + "\\")
             emummc_path = base_path / "emuMMC"
-            emummc_path.mkdir(exist_ok=True)
 
             # Calculate emuMMC sector offset using same logic as migration_engine
             target_emummc_gpt_start = target_emummc[0].start_sector
@@ -347,44 +396,38 @@ class CleanupEngine:
             logger.info(f"emuMMC MBR partition start: 0x{target_emummc_gpt_start:X}")
             logger.info(f"emuMMC ini sector (aligned to 32MB): 0x{emummc_ini_sector:X}")
 
-            # Create RAW folder
-            raw_folder_name = "RAW1"
-            raw_folder_path = emummc_path / raw_folder_name
-            raw_folder_path.mkdir(exist_ok=True)
+            # Create emuMMC and RAW folders in one call
+            raw_folder_path = emummc_path / RAW_FOLDER_NAME
+            raw_folder_path.mkdir(parents=True, exist_ok=True)
 
-            # Create raw_based file
+            # Create raw_based file (written to a temp name, then renamed into place)
             raw_based_file = raw_folder_path / "raw_based"
-            with open(raw_based_file, 'wb') as f:
+            raw_based_tmp = raw_folder_path / "raw_based.tmp"
+            with open(raw_based_tmp, 'wb') as f:
                 f.write(emummc_ini_sector.to_bytes(4, byteorder='little'))
+            os.replace(raw_based_tmp, raw_based_file)
 
             logger.info(f"Created raw_based file with sector: 0x{emummc_ini_sector:x}")
 
             # Create emummc.ini
-            folder_id = int.from_bytes(raw_folder_name.encode('ascii')[:4].ljust(4, b'\x00'), byteorder='little')
             emummc_ini_path = emummc_path / "emummc.ini"
+            emummc_ini_tmp = emummc_path / "emummc.ini.tmp"
 
-            ini_content = (
-                "[emummc]\n"
-                "enabled=1\n"
-                f"sector=0x{emummc_ini_sector:X}\n"
-                f"id=0x{folder_id:X}\n"
-                f"path=emuMMC/{raw_folder_name}\n"
-                f"nintendo_path=emuMMC/{raw_folder_name}/Nintendo\n"
-            )
-
-            with open(emummc_ini_path, 'w', encoding='utf-8') as f:
-                f.write(ini_content)
+            emummc_ini_tmp.write_bytes(EMUMMC_INI_TEMPLATE % (emummc_ini_sector, RAW_FOLDER_ID))
+            os.replace(emummc_ini_tmp, emummc_ini_path)
 
             logger.info(f"Created emummc.ini successfully")
             self._report_progress("Updating emuMMC", 99, "emuMMC config updated")
 
         except Exception as e:
             logger.error(f"Error updating emuMMC config: {e}")
-            import traceback
             logger.error(traceback.format_exc())
 
-    def _copy_files_robocopy(self, source, target, stage_name, base_progress):
-        """Copy files using robocopy"""
+    def _copy_files_robocopy(self, source, target, stage_name, base_progress, progress_span=25, total_bytes=0):
+        """Copy files using robocopy, streaming its output into progress updates
+
+        Returns the number of bytes robocopy reported as copied.
+        """
         source = source.rstrip('\\')
         target = target.rstrip('\\')
 
@@ -401,68 +444,194 @@ class CleanupEngine:
             '/W:1',         # Wait 1 second between retries
             '/NP',          # No progress percentage per file
             '/NDL',         # No directory listing
-            '/TEE',         # Output to console and log
-            '/MT:8'         # Multi-threaded (8 threads)
+            '/NJH',         # No job header
+            '/BYTES',       # Plain byte counts for progress parsing
+            '/J',           # Unbuffered I/O for large files
+            '/MT:2'         # Only 2 threads (the SD card is always one end of the copy)
         ]
 
+        # Skip Windows metadata that is recreated on mount
+        exclude_dirs = self.options.get('backup_exclude_dirs', BACKUP_EXCLUDE_DIRS)
+        exclude_files = self.options.get('backup_exclude_files', BACKUP_EXCLUDE_FILES)
+        if exclude_dirs:
+            cmd += ['/XD', *exclude_dirs]
+        if exclude_files:
+            cmd += ['/XF', *exclude_files]
+
         logger.info(f"Robocopy command: {' '.join(cmd)}")
         self._report_progress(stage_name, base_progress, "Copying files with robocopy...")
 
+        files_copied = 0
+        bytes_seen = 0
+        bytes_copied = 0
+        last_report = 0.0
+        output_tail = deque(maxlen=50)
+
         try:
-            result = subprocess.run(
+            process = subprocess.Popen(
                 cmd,
-                capture_output=True,
-                text=True,
-                timeout=3600,
-                encoding='utf-8',
-                errors='replace',
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                bufsize=1 << 16,  # Binary reads - no per-line text decoding
                 creationflags=subprocess.CREATE_NO_WINDOW
             )
 
+            for line in iter(process.stdout.readline, b''):
+                line = line.strip()
+                if not line:
+                    continue
+                output_tail.append(line)
+
+                match = _ROBOCOPY_FILE_LINE.match(line)
+                if match:
+                    files_copied += 1
+                    bytes_seen += int(match.group(1))
+
+                    now = time.monotonic()
+                    if self.on_progress and now - last_report >= 0.5:
+                        last_report = now
+                        if total_bytes:
+                            fraction = min(bytes_seen / total_bytes, 1.0)
+                            percent = base_progress + progress_span * fraction
+                            message = f"Copied {files_copied} files ({fraction * 100:.0f}%)"
+                        else:
+                            percent = base_progress
+                            message = f"Copied {files_copied} files"
+                        self._report_progress(stage_name, percent, message)
+
+                elif line.startswith((b'Bytes :', b'Files :')):
+                    logger.info(f"Robocopy summary: {line.decode(ROBOCOPY_ENCODING, 'replace')}")
+                    if line.startswith(b'Bytes :'):
+                        parts = line.split()
+                        if len(parts) >= 4 and parts[3].isdigit():
+                            bytes_copied = int(parts[3])
+
+            process.wait()
+
             # Robocopy return codes: 0-7 are success, 8+ are errors
-            if result.returncode >= 8:
-                logger.error(f"Robocopy failed with return code {result.returncode}")
-                logger.error(f"Output: {result.stdout}")
-                logger.error(f"Errors: {result.stderr}")
-                raise Exception(f"File copy failed with robocopy error code {result.returncode}")
-
-            logger.info(f"Robocopy completed with return code {result.returncode}")
-            logger.info(f"Output: {result.stdout}")
-
-        except subprocess.TimeoutExpired:
-            logger.error("Robocopy timed out")
-            raise Exception("File copy timed out")
+            if process.returncode >= 8:
+                logger.error(f"Robocopy failed with return code {process.returncode}")
+                logger.error("Output: " + b"\n".join(output_tail).decode(ROBOCOPY_ENCODING, 'replace'))
+                raise Exception(f"File copy failed with robocopy error code {process.returncode}")
+
+            logger.info(f"Robocopy completed with return code {process.returncode} ({files_copied} files)")
+            self._report_progress(stage_name, base_progress + progress_span, f"Copied {files_copied} files")
+
         except Exception as e:
             logger.error(f"Robocopy error: {e}")
             raise
 
-    def _get_drive_letter_for_partition(self, start_sector):
-        """Get drive letter for a partition at a specific sector"""
-        disk_index = self.disk['path'].replace("\\\\.\\PhysicalDrive", "")
+        return bytes_copied or bytes_seen
 
-        try:
-            # Create a new WMI connection for this thread
-            import wmi
-            wmi_conn = wmi.WMI()
+    def _remove_temp_dir(self, path):
+        """Delete the temporary backup tree"""
+        # Native rd deletes deep trees (including read-only files copied by
+        # robocopy /COPY:DAT) much faster than a per-file Python walk
+        subprocess.run(
+            ['cmd', '/c', 'rd', '/s', '/q', path],
+            capture_output=True,
+            timeout=600,
+            creationflags=subprocess.CREATE_NO_WINDOW
+        )
 
-            partitions = wmi_conn.query(
-                f"SELECT * FROM Win32_DiskPartition WHERE DiskIndex={disk_index}"
+        if os.path.exists(path):
+            def clear_readonly(func, failed_path, _):
+                os.chmod(failed_path, stat.S_IWRITE)
+                func(failed_path)
+
+            shutil.rmtree(path, onerror=clear_readonly)
+
+    def _wmi_conn(self):
+        """Get the WMI connection, creating it on first use"""
+        if self._wmi is None:
+            self._wmi = wmi.WMI()
+        return self._wmi
+
+    def _get_partitions(self, max_age=1.0):
+        """Get [(start_sector, DeviceID, Index), ...] for a disk, cached for max_age seconds"""
+        return self._get_partition_index(max_age)[0]
+
+    def _get_partition_index(self, max_age=1.0):
+        """Get (partitions, partitions keyed by start rounded to 1MB) for a disk, cached for max_age seconds"""
+        cached = self._part_cache.get(self.disk_index)
+        if cached and time.monotonic() - cached[0] < max_age:
+            return cached[1], cached[2]
+
+        partitions = [
+            (int(part.StartingOffset) // SECTOR_SIZE, part.DeviceID, int(part.Index))
+            for part in self._wmi_conn().query(
+                f"SELECT DeviceID, Index, StartingOffset FROM Win32_DiskPartition WHERE DiskIndex={self.disk_index}"
             )
+        ]
+        by_start = {round(part[0] / 2048): part for part in partitions}
+        self._part_cache[self.disk_index] = (time.monotonic(), partitions, by_start)
+        return partitions, by_start
+
+    def _find_partition(self, start_sector, max_age=1.0):
+        """Get (start_sector, DeviceID, Index) of the partition within 1MB of start_sector, or None"""
+        partitions, by_start = self._get_partition_index(max_age)
+
+        part = by_start.get(round(start_sector / 2048))
+        if part and abs(part[0] - start_sector) < 2048:
+            return part
+
+        # Starts that straddle a 1MB rounding boundary still match within tolerance
+        for part in partitions:
+            if abs(part[0] - start_sector) < 2048:
+                return part
+        return None
 
-            for partition in partitions:
-                part_start = int(partition.StartingOffset) // SECTOR_SIZE
+    def _invalidate_partition_cache(self):
+        """Drop cached partition lists after the disk layout may have changed"""
+        self._part_cache.clear()
+
+    def _wait_for(self, condition, timeout, interval=0.1):
+        """Poll condition until it is true or timeout elapses"""
+        deadline = time.monotonic() + timeout
+        while True:
+            if condition():
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+
+    def _wait_for_partitions(self, predicate, timeout=5.0, interval=0.1):
+        """Poll this disk's partition list until predicate(partitions) is true"""
+        def check():
+            try:
+                return predicate(self._get_partitions(max_age=0))
+            except Exception as e:
+                logger.debug(f"Partition query failed while waiting: {e}")
+                return False
+
+        return self._wait_for(check, timeout, interval)
 
-                if abs(part_start - start_sector) < 2048:  # Within 1MB tolerance
-                    # Get associated logical disk
-                    logical_disks = wmi_conn.query(
-                        f"ASSOCIATORS OF {{Win32_DiskPartition.DeviceID='{partition.DeviceID}'}} "
-                        f"WHERE AssocClass=Win32_LogicalDiskToPartition"
-                    )
+    def _wait_for_partition_visible(self, start_sector, timeout=5.0, interval=0.1):
+        """Wait until Windows lists a partition at start_sector"""
+        def check():
+            try:
+                return self._find_partition(start_sector, max_age=0) is not None
+            except Exception as e:
+                logger.debug(f"Partition query failed while waiting: {e}")
+                return False
 
-                    if logical_disks:
-                        drive_letter = logical_disks[0].DeviceID
-                        logger.info(f"Found drive letter: {drive_letter}")
-                        return drive_letter
+        return self._wait_for(check, timeout, interval)
+
+    def _get_drive_letter_for_partition(self, start_sector):
+        """Get drive letter for a partition at a specific sector"""
+        try:
+            part = self._find_partition(start_sector)  # Within 1MB tolerance
+            if part:
+                # Get associated logical disk
+                logical_disks = self._wmi_conn().query(
+                    f"ASSOCIATORS OF {{Win32_DiskPartition.DeviceID='{part[1]}'}} "
+                    f"WHERE AssocClass=Win32_LogicalDiskToPartition"
+                )
+
+                if logical_disks:
+                    drive_letter = logical_disks[0].DeviceID
+                    logger.info(f"Found drive letter: {drive_letter}")
+                    return drive_letter
 
         except Exception as e:
             logger.error(f"Error finding drive letter: {e}")
@@ -471,8 +640,6 @@ class CleanupEngine:
 
     def _assign_and_lock_drive_letter(self, partition):
         """Assign and lock a drive letter for a partition"""
-        disk_index = self.disk['path'].replace("\\\\.\\PhysicalDrive", "")
-
         # Find partition number
         partition_num = self._find_partition_number(partition.start_sector)
 
@@ -480,24 +647,18 @@ class CleanupEngine:
             raise RuntimeError(f"Could not find partition at sector {partition.start_sector}")
 
         # Assign drive letter
-        diskpart_script = f"""select disk {disk_index}
-select partition {partition_num}
+        diskpart_script = f"""{self._dp_select}select partition {partition_num}
 assign
 """
 
-        result = subprocess.run(
-            ['diskpart'],
-            input=diskpart_script,
-            capture_output=True,
-            text=True,
-            timeout=30,
-            creationflags=subprocess.CREATE_NO_WINDOW
-        )
+        drives_before = win32api.GetLogicalDrives()
+        output = self._diskpart.run(diskpart_script, timeout=30).lower()
 
-        if result.returncode != 0 and "already assigned" not in result.stdout.lower():
-            logger.warning(f"Diskpart assign returned: {result.stderr}")
-
-        time.sleep(2)
+        if "error" in output and "already assigned" not in output:
+            logger.warning(f"Diskpart assign returned: {output.strip()}")
+        else:
+            # Wait for the new letter to show up in the logical drive bitmask
+            self._wait_for(lambda: win32api.GetLogicalDrives() != drives_before, timeout=5.0)
 
         # Get the actual drive letter
         drive_letter = self._get_drive_letter_for_partition(partition.start_sector)
@@ -510,67 +671,46 @@ assign
 
     def _find_partition_number(self, start_sector):
         """Find partition number for a partition at a specific sector"""
-        disk_index = self.disk['path'].replace("\\\\.\\PhysicalDrive", "")
-        MAX_RETRIES = 10
-        RETRY_DELAY = 2
-
-        for attempt in range(MAX_RETRIES):
-            try:
-                # Create a new WMI connection for this thread
-                import wmi
-                wmi_conn = wmi.WMI()
-
-                partitions = wmi_conn.query(
-                    f"SELECT * FROM Win32_DiskPartition WHERE DiskIndex={disk_index}"
-                )
-
-                for part in partitions:
-                    part_start = int(part.StartingOffset) // SECTOR_SIZE
-
-                    if abs(part_start - start_sector) < 2048:
-                        logger.info(f"Found matching partition number: {part.Index}")
-                        return int(part.Index)
-
-                if attempt < MAX_RETRIES - 1:
-                    logger.info(f"Partition not found, refreshing...")
-                    diskpart_script = f"select disk {disk_index}\nrescan\n"
-                    subprocess.run(['diskpart'], input=diskpart_script, capture_output=True, text=True, timeout=30, creationflags=subprocess.CREATE_NO_WINDOW)
-                    time.sleep(RETRY_DELAY)
+        try:
+            partitions = self.disk_manager.get_drive_layout(self.disk['path'])
+        except Exception as e:
+            logger.warning(f"Error reading drive layout: {e}")
+            return None
 
-            except Exception as e:
-                logger.warning(f"Error finding partition: {e}")
-                if attempt < MAX_RETRIES - 1:
-                    time.sleep(RETRY_DELAY)
+        for number, part_start, _ in partitions:
+            if abs(part_start - start_sector) < 2048:  # Within 1MB tolerance
+                logger.info(f"Found matching partition number: {number}")
+                return number
 
         return None
 
-    def _refresh_disk_partitions(self, disk_path):
+    def _refresh_disk_partitions(self):
         """Refresh disk to make new partitions visible"""
-        try:
-            disk_index = disk_path.replace("\\\\.\\PhysicalDrive", "")
+        if self.disk_manager.rescan_disk(self.disk['path']):
+            self._invalidate_partition_cache()
+            logger.info("Disk partitions refreshed")
+            return
 
-            diskpart_script = f"""select disk {disk_index}
-rescan
-"""
+        # Fall back to diskpart if the IOCTL isn't available
+        try:
+            diskpart_script = self._dp_select + "rescan\n"
 
-            subprocess.run(
-                ['diskpart'],
-                input=diskpart_script,
-                capture_output=True,
-                text=True,
-                timeout=10,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            self._diskpart.run(diskpart_script, timeout=10)
+            self._invalidate_partition_cache()
 
             logger.info("Disk partitions refreshed")
 
         except Exception as e:
             logger.warning(f"Could not refresh disk partitions: {e}")
 
-    def _report_progress(self, stage: str, percent: float, message: str):
-        """Report progress to callback"""
+    def _report_progress(self, stage: str, percent: float, message):
+        """Report progress to callback
+
+        message may be a string or a zero-argument callable that builds it,
+        so frequent callers skip the formatting when no callback is installed.
+        """
         if self.on_progress:
-            self.on_progress(stage, percent, message)
+            self.on_progress(stage, percent, message() if callable(message) else message)
 
     def cancel(self):
         """Cancel cleanup operation"""
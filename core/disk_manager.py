@@ -7,6 +7,17 @@ import os
 import subprocess
 import logging
 import time
+import queue
+import threading
+import re
+import struct
+import atexit
+import mmap
+import ctypes
+import zlib
+import codecs
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 if sys.platform == 'win32':
     import wmi
@@ -14,32 +25,272 @@ if sys.platform == 'win32':
     import win32api
     import pywintypes
     import winioctlcon
+    import win32event
+    import winerror
 
 logger = logging.getLogger(__name__)
 
+# Seconds a cached disk topology stays valid
+TOPOLOGY_TTL = 2.0
+
+# Seconds it stays valid while a change watcher is invalidating it on events
+WATCHED_TOPOLOGY_TTL = 60.0
+
+# Drive arrival/removal and volume mount/unmount, polled by WMI every 2 seconds
+_TOPOLOGY_EVENT_WQL = (
+    "SELECT * FROM __InstanceOperationEvent WITHIN 2 WHERE "
+    "TargetInstance ISA 'Win32_DiskDrive' OR TargetInstance ISA 'Win32_LogicalDisk'"
+)
+
+# DeviceID key in a WMI reference path, e.g. ...Win32_DiskPartition.DeviceID="Disk #1, Partition #0"
+_REF_DEVICE_ID = re.compile(r'DeviceID="([^"]+)"')
+
+# GET_LENGTH_INFO output: LARGE_INTEGER Length
+_U64 = struct.Struct('<Q')
+
+# STORAGE_DEVICE_NUMBER: DeviceType, DeviceNumber, PartitionNumber (-1 if not partitionable)
+_STORAGE_DEVICE_NUMBER = struct.Struct('<IIi')
+
+# STORAGE_PROPERTY_QUERY for StorageAdapterProperty (PropertyId 1, PropertyStandardQuery)
+_ADAPTER_PROPERTY_QUERY = struct.pack('<II4x', 1, 0)
+
+# STORAGE_ADAPTER_DESCRIPTOR head: Version, Size, MaximumTransferLength, MaximumPhysicalPages
+_ADAPTER_DESCRIPTOR = struct.Struct('<IIII')
+
+# DRIVE_LAYOUT_INFORMATION_EX head: PartitionStyle, PartitionCount, then the 40-byte MBR/GPT union
+_DRIVE_LAYOUT_HEADER = struct.Struct('<II40x')
+
+# PARTITION_INFORMATION_EX head: PartitionStyle, StartingOffset, PartitionLength, PartitionNumber
+# Each entry is 144 bytes including the MBR/GPT union
+_PARTITION_ENTRY = struct.Struct('<I4xqqI')
+_PARTITION_ENTRY_SIZE = 144
+
+# Room for a full 128-entry GPT layout
+_DRIVE_LAYOUT_BUFFER_SIZE = _DRIVE_LAYOUT_HEADER.size + 128 * _PARTITION_ENTRY_SIZE
+
+# IOCTL_STORAGE_MANAGE_DATA_SET_ATTRIBUTES (not in winioctlcon): CTL_CODE(0x2D, 0x501, METHOD_BUFFERED, FILE_WRITE_ACCESS)
+IOCTL_STORAGE_MANAGE_DATA_SET_ATTRIBUTES = 0x2D9404
+DEVICE_DSM_ACTION_TRIM = 1
+
+# DEVICE_MANAGE_DATA_SET_ATTRIBUTES: Size, Action, Flags, ParameterBlockOffset/Length,
+# DataSetRangesOffset/Length, then one 8-aligned DEVICE_DATA_SET_RANGE (StartingOffset, LengthInBytes)
+_DSM_ATTRIBUTES = struct.Struct('<IIIIIII4xqQ')
+
+# SetFileCompletionNotificationModes flags
+FILE_SKIP_COMPLETION_PORT_ON_SUCCESS = 0x1
+FILE_SKIP_SET_EVENT_ON_HANDLE = 0x2
+
+# A bare drive letter, e.g. "H:"
+_DRIVE_LETTER = re.compile(r'^[A-Za-z]:$')
+
+# WQL templates for per-disk status queries
+_Q_DRIVE_STATUS = "SELECT Caption, Status, Availability, Size, InterfaceType FROM Win32_DiskDrive WHERE Index={0}"
+_Q_DISK_PARTITIONS = "SELECT DeviceID, Size FROM Win32_DiskPartition WHERE DiskIndex={0}"
+_Q_PARTITION_LOGICAL_DISKS = (
+    "ASSOCIATORS OF {{Win32_DiskPartition.DeviceID='{0}'}} "
+    "WHERE AssocClass=Win32_LogicalDiskToPartition"
+)
+
+def allocate_aligned_buffer(size):
+    """
+    Allocate a zero-filled, page-aligned writable buffer
+
+    FILE_FLAG_NO_BUFFERING transfers need sector-aligned memory, which a
+    bytes/bytearray object does not guarantee; an anonymous mapping always
+    starts on a page boundary.
+    """
+    return mmap.mmap(-1, size)
+
+def _com_hresult(error):
+    """HRESULT of a pywintypes.com_error, or of the one wrapped by a wmi.x_wmi"""
+    com_error = getattr(error, 'com_error', error)
+    return getattr(com_error, 'hresult', None)
+
+
 class DiskManager:
     """Manages disk enumeration and access"""
 
-    def __init__(self):
+    def __init__(self, watch_changes=False):
+        """
+        watch_changes: Invalidate the cached topology from a background WMI
+                       event subscription instead of re-querying every few
+                       seconds (for long-lived instances such as the GUI's)
+        """
         if sys.platform != 'win32':
             raise RuntimeError("This tool only supports Windows")
 
+        # WMI connection, made on first use (see the wmi property)
+        self._wmi = None
+
+        # Cached disk/partition/volume topology (see _get_topology)
+        self._topo_cache = None
+        self._topo_ts = 0.0
+        self._topo_generation = 0
+        self._topo_lock = threading.Lock()
+
+        # Background WMI event watcher (see _watch_topology)
+        self._watch_stop = threading.Event()
+        self._watch_thread = None
+        self._watching = False
+        if watch_changes:
+            self._start_topology_watcher()
+
+        # Open write handles kept across write_sectors calls: {disk_path: handle}
+        self._write_handles = {}
+
+        # Index of the access mode that last opened each disk for writing
+        self._last_open_mode = {}
+
+        # Buffered writes defeat sector-exact write-through, so only probe them on request
+        self.allow_buffered_writes = False
+
+    @property
+    def wmi(self):
+        """
+        WMI connection, made on first use
+
+        Most disk operations go through IOCTLs, so instances that never query
+        WMI skip the COM connection entirely, and engines connect from their
+        worker thread after CoInitialize instead of from the GUI thread.
+        """
+        if self._wmi is None:
+            try:
+                self._wmi = wmi.WMI()
+            except Exception as e:
+                error_msg = str(e)
+                # Provide more helpful error message
+                if 'winmgmts' in error_msg.lower():
+                    raise RuntimeError(
+                        "Failed to connect to Windows Management Instrumentation (WMI).\n\n"
+                        "Possible solutions:\n"
+                        "1. Restart the 'Windows Management Instrumentation' service\n"
+                        "2. Run: net stop winmgmt && net start winmgmt (as admin)\n"
+                        "3. Check if antivirus is blocking WMI access\n"
+                        "4. Repair WMI repository: winmgmt /salvagerepository"
+                    )
+                else:
+                    raise RuntimeError(f"Failed to initialize disk manager: {error_msg}")
+        return self._wmi
+
+    def _get_topology(self, max_age=None):
+        """
+        Get the drive -> partition -> logical disk topology
+
+        Built from four flat WQL queries joined locally, instead of one
+        ASSOCIATORS OF round-trip per partition, and cached for max_age seconds.
+        Returns dict with:
+            drives:               {disk index: Win32_DiskDrive}
+            partitions_by_drive:  {disk index: [partition DeviceID, ...]}
+            drive_by_partition:   {partition DeviceID: disk index}
+            logical_by_partition: {partition DeviceID: [drive letter, ...]}
+            partition_by_logical: {drive letter: partition DeviceID}
+            logical_disks:        {drive letter: Win32_LogicalDisk}
+        """
+        if max_age is None:
+            max_age = WATCHED_TOPOLOGY_TTL if self._watching else TOPOLOGY_TTL
+
+        with self._topo_lock:
+            cache = self._topo_cache
+            if cache is not None and time.monotonic() - self._topo_ts < max_age:
+                return cache
+            generation = self._topo_generation
+
+        drives = {
+            int(disk.Index): disk
+            for disk in self.wmi.query(
+                "SELECT Caption, Model, Index, Size, MediaType, InterfaceType FROM Win32_DiskDrive"
+            )
+        }
+
+        partitions_by_drive = {}
+        drive_by_partition = {}
+        for partition in self.wmi.query("SELECT DeviceID, DiskIndex FROM Win32_DiskPartition"):
+            partitions_by_drive.setdefault(int(partition.DiskIndex), []).append(partition.DeviceID)
+            drive_by_partition[partition.DeviceID] = int(partition.DiskIndex)
+
+        logical_by_partition = {}
+        partition_by_logical = {}
+        for link in self.wmi.query("SELECT Antecedent, Dependent FROM Win32_LogicalDiskToPartition"):
+            # Read the raw reference paths; attribute access would resolve each into a WMI object
+            partition_id = _REF_DEVICE_ID.search(link.wmi_property('Antecedent').value)
+            letter = _REF_DEVICE_ID.search(link.wmi_property('Dependent').value)
+            if partition_id and letter:
+                logical_by_partition.setdefault(partition_id.group(1), []).append(letter.group(1))
+                partition_by_logical[letter.group(1)] = partition_id.group(1)
+
+        logical_disks = {
+            logical_disk.DeviceID: logical_disk
+            for logical_disk in self.wmi.query(
+                "SELECT DeviceID, VolumeName, Size, FileSystem FROM Win32_LogicalDisk"
+            )
+        }
+
+        topology = {
+            'drives': drives,
+            'partitions_by_drive': partitions_by_drive,
+            'drive_by_partition': drive_by_partition,
+            'logical_by_partition': logical_by_partition,
+            'partition_by_logical': partition_by_logical,
+            'logical_disks': logical_disks,
+        }
+
+        # Don't cache a snapshot that was invalidated while it was being built
+        with self._topo_lock:
+            if generation == self._topo_generation:
+                self._topo_cache = topology
+                self._topo_ts = time.monotonic()
+
+        return topology
+
+    def _invalidate_topology(self):
+        """Drop the cached topology after partitions or volumes may have changed"""
+        with self._topo_lock:
+            self._topo_cache = None
+            self._topo_generation += 1
+
+    def _start_topology_watcher(self):
+        """Start the background thread that invalidates the topology on disk/volume events"""
+        self._watching = True
+        self._watch_thread = threading.Thread(target=self._watch_topology, daemon=True)
+        self._watch_thread.start()
+        atexit.register(self.close)
+
+    def _watch_topology(self):
+        """Invalidate the cached topology whenever a drive or volume appears or goes away"""
+        # WMI objects are bound to the thread's COM apartment, so use a separate connection
+        import pythoncom
+        pythoncom.CoInitialize()
+
         try:
-            self.wmi = wmi.WMI()
+            watcher = wmi.WMI().watch_for(raw_wql=_TOPOLOGY_EVENT_WQL)
+            while not self._watch_stop.is_set():
+                try:
+                    watcher(timeout_ms=500)
+                except wmi.x_wmi_timed_out:
+                    continue
+
+                logger.debug("Disk or volume change detected, dropping cached topology")
+                self._invalidate_topology()
+
         except Exception as e:
-            error_msg = str(e)
-            # Provide more helpful error message
-            if 'winmgmts' in error_msg.lower():
-                raise RuntimeError(
-                    "Failed to connect to Windows Management Instrumentation (WMI).\n\n"
-                    "Possible solutions:\n"
-                    "1. Restart the 'Windows Management Instrumentation' service\n"
-                    "2. Run: net stop winmgmt && net start winmgmt (as admin)\n"
-                    "3. Check if antivirus is blocking WMI access\n"
-                    "4. Repair WMI repository: winmgmt /salvagerepository"
-                )
-            else:
-                raise RuntimeError(f"Failed to initialize disk manager: {error_msg}")
+            logger.warning(f"Disk change watcher stopped, falling back to polling: {e}")
+        finally:
+            # Without events the short TTL applies again
+            self._watching = False
+            pythoncom.CoUninitialize()
+
+    def close(self):
+        """Stop the topology watcher and release cached write handles"""
+        self._watch_stop.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join(timeout=2.0)
+            self._watch_thread = None
+
+        for disk_path in list(self._write_handles):
+            try:
+                self.close_write_handle(disk_path)
+            except pywintypes.error as e:
+                logger.warning(f"Could not close write handle for {disk_path}: {e}")
 
     def list_disks(self):
         """
@@ -49,32 +300,32 @@ class DiskManager:
         disks = []
 
         try:
-            for disk in self.wmi.Win32_DiskDrive():
-                # Get disk properties
+            # Served from the cached topology when it is still fresh
+            for disk in self._get_topology()['drives'].values():
+                # Get disk properties (COM returns Size as a string; parse it once)
+                size_bytes = int(disk.Size) if disk.Size else 0
                 disk_info = {
                     'name': disk.Caption or disk.Model or f"Disk {disk.Index}",
                     'path': f"\\\\.\\PhysicalDrive{disk.Index}",
                     'index': disk.Index,
-                    'size_bytes': int(disk.Size) if disk.Size else 0,
-                    'size_gb': int(disk.Size) / (1024**3) if disk.Size else 0,
+                    'size_bytes': size_bytes,
+                    'size_gb': size_bytes / (1024**3),
                     'removable': disk.MediaType and 'Removable' in disk.MediaType,
                     'interface': disk.InterfaceType or 'Unknown'
                 }
 
                 disks.append(disk_info)
 
+        except (wmi.x_wmi, pywintypes.com_error):
+            raise RuntimeError(
+                "Failed to query disk drives from WMI.\n\n"
+                "This may be a WMI service issue. Try:\n"
+                "1. Restart Windows Management Instrumentation service\n"
+                "2. Check Windows Event Viewer for WMI errors\n"
+                "3. Run as Administrator if not already"
+            )
         except Exception as e:
-            error_msg = str(e)
-            if 'winmgmts' in error_msg.lower() or 'win32_diskdrive' in error_msg.lower():
-                raise RuntimeError(
-                    "Failed to query disk drives from WMI.\n\n"
-                    "This may be a WMI service issue. Try:\n"
-                    "1. Restart Windows Management Instrumentation service\n"
-                    "2. Check Windows Event Viewer for WMI errors\n"
-                    "3. Run as Administrator if not already"
-                )
-            else:
-                raise RuntimeError(f"Failed to list disks: {error_msg}")
+            raise RuntimeError(f"Failed to list disks: {e}")
 
         return disks
 
@@ -86,40 +337,47 @@ class DiskManager:
         drives = []
 
         try:
-            # Get all logical disks
-            for partition in self.wmi.Win32_DiskPartition():
-                # Get associated logical disks (drive letters)
-                for logical_disk in partition.associators("Win32_LogicalDiskToPartition"):
-                    # Get the physical disk this partition belongs to
-                    for physical_disk in partition.associators("Win32_DiskDriveToDiskPartition"):
-                        # Only include removable media (SD cards, USB drives)
-                        if physical_disk.MediaType and 'Removable' in physical_disk.MediaType:
-                            drive_info = {
-                                'letter': logical_disk.DeviceID,  # e.g., "H:"
-                                'name': logical_disk.VolumeName or logical_disk.DeviceID,
-                                'physical_drive': f"\\\\.\\PhysicalDrive{physical_disk.Index}",
-                                'physical_index': physical_disk.Index,
-                                'disk_name': physical_disk.Caption or physical_disk.Model or f"Disk {physical_disk.Index}",
-                                'size_bytes': int(physical_disk.Size) if physical_disk.Size else 0,
-                                'size_gb': int(physical_disk.Size) / (1024**3) if physical_disk.Size else 0,
-                                'partition_size_bytes': int(logical_disk.Size) if logical_disk.Size else 0,
-                                'partition_size_gb': int(logical_disk.Size) / (1024**3) if logical_disk.Size else 0,
-                                'file_system': logical_disk.FileSystem or 'Unknown'
-                            }
-                            drives.append(drive_info)
-
+            topology = self._get_topology()
+
+            for index, physical_disk in topology['drives'].items():
+                # Only include removable media (SD cards, USB drives)
+                if not (physical_disk.MediaType and 'Removable' in physical_disk.MediaType):
+                    continue
+
+                for partition_id in topology['partitions_by_drive'].get(index, ()):
+                    # Associated logical disks (drive letters)
+                    for letter in topology['logical_by_partition'].get(partition_id, ()):
+                        logical_disk = topology['logical_disks'].get(letter)
+                        if logical_disk is None:
+                            continue
+
+                        size_bytes = int(physical_disk.Size) if physical_disk.Size else 0
+                        partition_size_bytes = int(logical_disk.Size) if logical_disk.Size else 0
+
+                        drive_info = {
+                            'letter': logical_disk.DeviceID,  # e.g., "H:"
+                            'name': logical_disk.VolumeName or logical_disk.DeviceID,
+                            'physical_drive': f"\\\\.\\PhysicalDrive{physical_disk.Index}",
+                            'physical_index': physical_disk.Index,
+                            'disk_name': physical_disk.Caption or physical_disk.Model or f"Disk {physical_disk.Index}",
+                            'size_bytes': size_bytes,
+                            'size_gb': size_bytes / (1024**3),
+                            'partition_size_bytes': partition_size_bytes,
+                            'partition_size_gb': partition_size_bytes / (1024**3),
+                            'file_system': logical_disk.FileSystem or 'Unknown'
+                        }
+                        drives.append(drive_info)
+
+        except (wmi.x_wmi, pywintypes.com_error):
+            raise RuntimeError(
+                "Failed to query drives from WMI.\n\n"
+                "This may be a WMI service issue. Try:\n"
+                "1. Restart Windows Management Instrumentation service\n"
+                "2. Check Windows Event Viewer for WMI errors\n"
+                "3. Run as Administrator if not already"
+            )
         except Exception as e:
-            error_msg = str(e)
-            if 'winmgmts' in error_msg.lower():
-                raise RuntimeError(
-                    "Failed to query drives from WMI.\n\n"
-                    "This may be a WMI service issue. Try:\n"
-                    "1. Restart Windows Management Instrumentation service\n"
-                    "2. Check Windows Event Viewer for WMI errors\n"
-                    "3. Run as Administrator if not already"
-                )
-            else:
-                raise RuntimeError(f"Failed to list drive letters: {error_msg}")
+            raise RuntimeError(f"Failed to list drive letters: {e}")
 
         return drives
 
@@ -127,58 +385,117 @@ class DiskManager:
         """
         Map a drive letter (e.g., 'H:') to its physical drive path
         Returns dict with physical drive info
+
+        Resolved with IOCTL_STORAGE_GET_DEVICE_NUMBER on the volume; the WMI
+        topology is only used for volumes that don't support it (virtual drives).
         """
         if not drive_letter.endswith(':'):
             drive_letter += ':'
 
-        try:
-            # Find the logical disk
-            logical_disks = self.wmi.query(f"SELECT * FROM Win32_LogicalDisk WHERE DeviceID='{drive_letter}'")
-            if not logical_disks:
-                raise ValueError(f"Drive {drive_letter} not found")
+        # Reject anything that is not a drive letter before touching WMI
+        if not _DRIVE_LETTER.match(drive_letter):
+            raise ValueError(f"Invalid drive letter: {drive_letter!r}")
 
-            logical_disk = logical_disks[0]
-
-            # Get the partition
-            partitions = self.wmi.query(
-                f"ASSOCIATORS OF {{Win32_LogicalDisk.DeviceID='{drive_letter}'}} "
-                f"WHERE AssocClass=Win32_LogicalDiskToPartition"
-            )
-
-            if not partitions:
-                raise ValueError(f"No partition found for drive {drive_letter}")
-
-            partition = partitions[0]
-
-            # Get the physical disk
-            physical_disks = self.wmi.query(
-                f"ASSOCIATORS OF {{Win32_DiskPartition.DeviceID='{partition.DeviceID}'}} "
-                f"WHERE AssocClass=Win32_DiskDriveToDiskPartition"
-            )
-
-            if not physical_disks:
-                raise ValueError(f"No physical disk found for drive {drive_letter}")
-
-            physical_disk = physical_disks[0]
+        try:
+            try:
+                disk_index = self._device_number_for_letter(drive_letter)
+            except pywintypes.error as e:
+                if e.winerror != winerror.ERROR_INVALID_FUNCTION:
+                    raise
+                return self._get_physical_drive_from_letter_wmi(drive_letter)
+
+            disk_path = f"\\\\.\\PhysicalDrive{disk_index}"
+            size_bytes = self.get_disk_size(disk_path)
+            _, partition_size_bytes, _ = win32file.GetDiskFreeSpaceEx(drive_letter + "\\")
+
+            # Friendly name only if WMI has already been queried; not worth a round trip
+            cache = self._topo_cache
+            physical_disk = cache['drives'].get(disk_index) if cache else None
+            if physical_disk is not None:
+                name = physical_disk.Caption or physical_disk.Model or f"Disk {disk_index}"
+            else:
+                name = f"Disk {disk_index}"
 
             return {
                 'letter': drive_letter,
-                'name': physical_disk.Caption or physical_disk.Model or f"Disk {physical_disk.Index}",
-                'path': f"\\\\.\\PhysicalDrive{physical_disk.Index}",
-                'index': physical_disk.Index,
-                'size_bytes': int(physical_disk.Size) if physical_disk.Size else 0,
-                'size_gb': int(physical_disk.Size) / (1024**3) if physical_disk.Size else 0,
-                'partition_size_bytes': int(logical_disk.Size) if logical_disk.Size else 0,
-                'partition_size_gb': int(logical_disk.Size) / (1024**3) if logical_disk.Size else 0,
+                'name': name,
+                'path': disk_path,
+                'index': disk_index,
+                'size_bytes': size_bytes,
+                'size_gb': size_bytes / (1024**3),
+                'partition_size_bytes': partition_size_bytes,
+                'partition_size_gb': partition_size_bytes / (1024**3),
             }
 
         except Exception as e:
             raise RuntimeError(f"Failed to map drive letter {drive_letter}: {str(e)}")
 
-    def read_sectors(self, disk_path, start_sector, count):
+    def _device_number_for_letter(self, drive_letter):
+        """Get the physical disk number behind a drive letter with IOCTL_STORAGE_GET_DEVICE_NUMBER"""
+        handle = win32file.CreateFile(
+            f"\\\\.\\{drive_letter}",
+            0,
+            win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+            None,
+            win32file.OPEN_EXISTING,
+            0,
+            None
+        )
+
+        try:
+            device_number = win32file.DeviceIoControl(
+                handle,
+                winioctlcon.IOCTL_STORAGE_GET_DEVICE_NUMBER,
+                None,
+                _STORAGE_DEVICE_NUMBER.size
+            )
+        finally:
+            win32file.CloseHandle(handle)
+
+        device_type, disk_number, partition_number = _STORAGE_DEVICE_NUMBER.unpack(device_number)
+        return disk_number
+
+    def _get_physical_drive_from_letter_wmi(self, drive_letter):
+        """Map a drive letter to its physical drive through the WMI topology"""
+        topology = self._get_topology()
+
+        # Find the logical disk
+        logical_disk = topology['logical_disks'].get(drive_letter.upper())
+        if logical_disk is None:
+            raise ValueError(f"Drive {drive_letter} not found")
+
+        # Get the partition
+        partition_id = topology['partition_by_logical'].get(logical_disk.DeviceID)
+        if partition_id is None:
+            raise ValueError(f"No partition found for drive {drive_letter}")
+
+        # Get the physical disk
+        physical_disk = topology['drives'].get(topology['drive_by_partition'].get(partition_id))
+        if physical_disk is None:
+            raise ValueError(f"No physical disk found for drive {drive_letter}")
+
+        size_bytes = int(physical_disk.Size) if physical_disk.Size else 0
+        partition_size_bytes = int(logical_disk.Size) if logical_disk.Size else 0
+
+        return {
+            'letter': drive_letter,
+            'name': physical_disk.Caption or physical_disk.Model or f"Disk {physical_disk.Index}",
+            'path': f"\\\\.\\PhysicalDrive{physical_disk.Index}",
+            'index': physical_disk.Index,
+            'size_bytes': size_bytes,
+            'size_gb': size_bytes / (1024**3),
+            'partition_size_bytes': partition_size_bytes,
+            'partition_size_gb': partition_size_bytes / (1024**3),
+        }
+
+    def read_sectors(self, disk_path, start_sector, count, buffer=None):
         """
         Read sectors from disk
         Returns bytes
+
+        buffer: optional writable buffer of at least count sectors, reused
+                across calls by bulk readers (see allocate_aligned_buffer). The data is read into it in place
+                and a memoryview over the read bytes is returned instead.
         """
         SECTOR_SIZE = 512
 
@@ -190,33 +507,172 @@ class DiskManager:
                 win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
                 None,
                 win32file.OPEN_EXISTING,
-                0,
+                win32file.FILE_FLAG_OVERLAPPED,
                 None
             )
 
-            # Seek to position
-            offset = start_sector * SECTOR_SIZE
-            win32file.SetFilePointer(handle, offset, win32file.FILE_BEGIN)
-
-            # Read data
+            # Read data at the requested offset
             size = count * SECTOR_SIZE
-            error_code, data = win32file.ReadFile(handle, size)
-
-            win32file.CloseHandle(handle)
+            try:
+                if buffer is None:
+                    target = win32file.AllocateReadBuffer(size)
+                else:
+                    if len(buffer) < size:
+                        raise ValueError(f"Read buffer too small: {len(buffer)} < {size} bytes")
+                    target = memoryview(buffer)[:size]
+                bytes_read = self._overlapped_io(handle, start_sector * SECTOR_SIZE, target, write=False)
+            finally:
+                win32file.CloseHandle(handle)
 
-            if error_code != 0:
-                raise IOError(f"Read error: {error_code}")
+            if bytes_read != size:
+                raise IOError(f"Incomplete read: {bytes_read}/{size} bytes")
 
-            return data
+            if buffer is None:
+                return bytes(target)
+            return target
 
         except pywintypes.error as e:
             raise IOError(f"Failed to read from disk: {e}")
 
-    def write_sectors(self, disk_path, start_sector, data, skip_prepare=False):
+    def _overlapped_io(self, handle, offset, buffer, write):
+        """
+        Issue a single read or write at a byte offset on an overlapped handle
+        and wait for it to complete. Returns the number of bytes transferred.
+        """
+        overlapped = pywintypes.OVERLAPPED()
+        overlapped.Offset = offset & 0xFFFFFFFF
+        overlapped.OffsetHigh = offset >> 32
+        overlapped.hEvent = win32event.CreateEvent(None, True, False, None)
+
+        try:
+            if write:
+                error_code, _ = win32file.WriteFile(handle, buffer, overlapped)
+            else:
+                error_code, _ = win32file.ReadFile(handle, buffer, overlapped)
+
+            if error_code not in (0, winerror.ERROR_IO_PENDING):
+                raise IOError(f"{'Write' if write else 'Read'} error code: {error_code}")
+
+            win32event.WaitForSingleObject(overlapped.hEvent, win32event.INFINITE)
+            return win32file.GetOverlappedResult(handle, overlapped, False)
+        finally:
+            win32api.CloseHandle(overlapped.hEvent)
+
+    def _open_for_write(self, disk_path):
+        """
+        Return a write handle for disk_path, reusing the cached one if present
+
+        The handle is kept until close_write_handle() is called.
+        """
+        handle = self._write_handles.get(disk_path)
+        if handle is not None:
+            return handle
+
+        handle = self._create_write_handle(disk_path)
+        self._write_handles[disk_path] = handle
+        return handle
+
+    def _create_write_handle(self, disk_path, share_read=False):
+        """
+        Open a new overlapped write handle for disk_path
+
+        The access modes are probed from strictest to most permissive and the
+        mode that worked last time for this disk is tried first. With
+        share_read, only modes that let a second handle read the disk are tried.
+        """
+        logger.debug(f"Opening disk {disk_path} for writing...")
+
+        # Try to open with different access modes
+        access_modes = [
+            # Mode 1: Exclusive, no buffering (strictest)
+            {
+                'desc': 'exclusive + no buffering',
+                'access': win32file.GENERIC_WRITE,
+                'share': 0,
+                'flags': win32file.FILE_FLAG_WRITE_THROUGH | win32file.FILE_FLAG_NO_BUFFERING | win32file.FILE_FLAG_OVERLAPPED
+            },
+            # Mode 2: Shared read, no buffering
+            {
+                'desc': 'shared read + no buffering',
+                'access': win32file.GENERIC_WRITE,
+                'share': win32file.FILE_SHARE_READ,
+                'flags': win32file.FILE_FLAG_WRITE_THROUGH | win32file.FILE_FLAG_NO_BUFFERING | win32file.FILE_FLAG_OVERLAPPED
+            }
+        ]
+
+        if self.allow_buffered_writes:
+            # Mode 3: Standard buffered write
+            access_modes.append({
+                'desc': 'exclusive + buffered',
+                'access': win32file.GENERIC_WRITE,
+                'share': 0,
+                'flags': win32file.FILE_FLAG_WRITE_THROUGH | win32file.FILE_FLAG_OVERLAPPED
+            })
+
+        last_error = None
+
+        preferred = self._last_open_mode.get(disk_path, 0)
+        if preferred >= len(access_modes):
+            preferred = 0
+        order = [preferred] + [i for i in range(len(access_modes)) if i != preferred]
+
+        for mode_index in order:
+            mode = access_modes[mode_index]
+            if share_read and not mode['share'] & win32file.FILE_SHARE_READ:
+                continue
+            try:
+                logger.debug(f"Trying to open with mode: {mode['desc']}")
+                handle = win32file.CreateFile(
+                    disk_path,
+                    mode['access'],
+                    mode['share'],
+                    None,
+                    win32file.OPEN_EXISTING,
+                    mode['flags'],
+                    None
+                )
+                logger.debug(f"Successfully opened disk handle: {handle} with mode: {mode['desc']}")
+                # A shared open says nothing about whether the exclusive modes would work
+                if not share_read:
+                    self._last_open_mode[disk_path] = mode_index
+                return handle
+            except pywintypes.error as e:
+                last_error = e
+                logger.debug(f"Failed to open with mode {mode['desc']}: {e}")
+
+        if not share_read:
+            self._last_open_mode.pop(disk_path, None)
+        raise last_error
+
+    def flush_disk(self, disk_path):
+        """Flush pending writes on the cached write handle for disk_path"""
+        handle = self._write_handles.get(disk_path)
+        if handle is not None:
+            win32file.FlushFileBuffers(handle)
+            logger.debug("Flushed file buffers")
+
+    def close_write_handle(self, disk_path, flush=True):
+        """Flush and close the cached write handle for disk_path, if any"""
+        handle = self._write_handles.pop(disk_path, None)
+        if handle is None:
+            return
+
+        try:
+            if flush:
+                win32file.FlushFileBuffers(handle)
+                logger.debug("Flushed file buffers")
+        finally:
+            win32file.CloseHandle(handle)
+            logger.debug("Closed disk handle")
+
+    def write_sectors(self, disk_path, start_sector, data, skip_prepare=False, keep_open=False, flush=True):
         """
         Write sectors to disk
         data: bytes to write (must be multiple of 512)
         skip_prepare: Skip disk preparation (used for batch writes)
+        keep_open: Keep the disk handle open for following writes; the caller
+                   must call close_write_handle() when the batch is done
+        flush: Flush file buffers after this write
         """
         SECTOR_SIZE = 512
         MAX_RETRIES = 3
@@ -238,81 +694,20 @@ class DiskManager:
                 if attempt == 0 and not skip_prepare:
                     self._prepare_disk_for_write(disk_path)
 
-                # Open disk for writing
-                logger.debug(f"Opening disk {disk_path} for writing...")
-
-                # Try to open with different access modes
-                access_modes = [
-                    # Mode 1: Exclusive, no buffering (strictest)
-                    {
-                        'desc': 'exclusive + no buffering',
-                        'access': win32file.GENERIC_WRITE | win32file.GENERIC_READ,
-                        'share': 0,
-                        'flags': win32file.FILE_FLAG_WRITE_THROUGH | win32file.FILE_FLAG_NO_BUFFERING
-                    },
-                    # Mode 2: Shared read, no buffering
-                    {
-                        'desc': 'shared read + no buffering',
-                        'access': win32file.GENERIC_WRITE | win32file.GENERIC_READ,
-                        'share': win32file.FILE_SHARE_READ,
-                        'flags': win32file.FILE_FLAG_WRITE_THROUGH | win32file.FILE_FLAG_NO_BUFFERING
-                    },
-                    # Mode 3: Standard buffered write
-                    {
-                        'desc': 'exclusive + buffered',
-                        'access': win32file.GENERIC_WRITE | win32file.GENERIC_READ,
-                        'share': 0,
-                        'flags': win32file.FILE_FLAG_WRITE_THROUGH
-                    }
-                ]
-
-                handle = None
-                last_error = None
-
-                for mode in access_modes:
-                    try:
-                        logger.debug(f"Trying to open with mode: {mode['desc']}")
-                        handle = win32file.CreateFile(
-                            disk_path,
-                            mode['access'],
-                            mode['share'],
-                            None,
-                            win32file.OPEN_EXISTING,
-                            mode['flags'],
-                            None
-                        )
-                        logger.debug(f"Successfully opened disk handle: {handle} with mode: {mode['desc']}")
-                        break
-                    except pywintypes.error as e:
-                        last_error = e
-                        logger.debug(f"Failed to open with mode {mode['desc']}: {e}")
-
-                if handle is None:
-                    raise last_error
+                handle = self._open_for_write(disk_path)
 
-                # Seek to position
+                # Write data at the requested offset
                 offset = start_sector * SECTOR_SIZE
-                logger.debug(f"Seeking to offset {offset} (sector {start_sector})...")
-                new_pos = win32file.SetFilePointer(handle, offset, win32file.FILE_BEGIN)
-                logger.debug(f"Seek successful, new position: {new_pos}")
-
-                # Write data
-                logger.debug(f"Writing {len(data)} bytes...")
-                error_code, bytes_written = win32file.WriteFile(handle, data)
-                logger.debug(f"Write completed: error_code={error_code}, bytes_written={bytes_written}")
-
-                # Flush to ensure data is written
-                win32file.FlushFileBuffers(handle)
-                logger.debug("Flushed file buffers")
-
-                # Close handle
-                win32file.CloseHandle(handle)
-                handle = None
-                logger.debug("Closed disk handle")
-
-                # Check for errors
-                if error_code != 0:
-                    raise IOError(f"Write error code: {error_code}")
+                logger.debug(f"Writing {len(data)} bytes at offset {offset} (sector {start_sector})...")
+                bytes_written = self._overlapped_io(handle, offset, data, write=True)
+                logger.debug(f"Write completed: bytes_written={bytes_written}")
+
+                if keep_open:
+                    # Flush to ensure data is written
+                    if flush:
+                        self.flush_disk(disk_path)
+                else:
+                    self.close_write_handle(disk_path, flush=flush)
 
                 if bytes_written != len(data):
                     raise IOError(f"Incomplete write: {bytes_written}/{len(data)} bytes")
@@ -322,12 +717,11 @@ class DiskManager:
                 return
 
             except pywintypes.error as e:
-                # Close handle if open
-                if handle is not None:
-                    try:
-                        win32file.CloseHandle(handle)
-                    except:
-                        pass
+                # Drop the handle so a retry probes the access modes again
+                try:
+                    self.close_write_handle(disk_path, flush=False)
+                except:
+                    pass
 
                 error_code = e.winerror if hasattr(e, 'winerror') else None
                 error_msg = e.strerror if hasattr(e, 'strerror') else str(e)
@@ -380,21 +774,25 @@ class DiskManager:
                 time.sleep(RETRY_DELAY)
 
             except Exception as e:
-                # Close handle if open
-                if handle is not None:
-                    try:
-                        win32file.CloseHandle(handle)
-                    except:
-                        pass
+                # Drop the handle so a retry probes the access modes again
+                try:
+                    self.close_write_handle(disk_path, flush=False)
+                except:
+                    pass
 
                 logger.error(f"Unexpected error in write_sectors: {type(e).__name__}: {e}")
                 raise IOError(f"Failed to write to disk: {e}")
 
     def clean_disk(self, disk_path):
         """
-        Delete all partitions on the disk using diskpart clean command
+        Delete all partitions on the disk
         This is essential before migration to release all Windows locks
+
+        The partition layout is deleted with IOCTL_DISK_DELETE_DRIVE_LAYOUT;
+        diskpart clean is only used if the IOCTL route fails.
         """
+        self.close_write_handle(disk_path)
+
         try:
             logger.info(f"Cleaning disk {disk_path} (deleting all partitions)...")
 
@@ -402,6 +800,14 @@ class DiskManager:
             disk_index = disk_path.replace("\\\\.\\PhysicalDrive", "")
             logger.debug(f"Disk index: {disk_index}")
 
+            try:
+                self._clean_disk_ioctl(disk_path, disk_index)
+                logger.info("Successfully cleaned disk")
+                logger.info("All partitions have been deleted")
+                return True
+            except pywintypes.error as e:
+                logger.warning(f"Could not delete drive layout directly ({e}), falling back to diskpart")
+
             # Use diskpart to clean the disk
             diskpart_script = f"select disk {disk_index}\nclean\n"
 
@@ -415,11 +821,13 @@ class DiskManager:
                 creationflags=subprocess.CREATE_NO_WINDOW
             )
 
+            self._invalidate_topology()
+
             if result.returncode == 0:
                 logger.info("Successfully cleaned disk with diskpart")
                 logger.info("All partitions have been deleted")
                 logger.info("Waiting for Windows to update partition cache...")
-                time.sleep(2)  # Give Windows time to update partition cache
+                self._wait_until_writable(disk_path)
                 return True
             else:
                 logger.error(f"Diskpart clean failed: {result.stderr}")
@@ -432,10 +840,145 @@ class DiskManager:
             logger.error(f"Error cleaning disk: {e}")
             return False
 
+    def _clean_disk_ioctl(self, disk_path, disk_index):
+        """
+        Delete the partition layout with IOCTLs instead of diskpart
+        Raises pywintypes.error if the disk cannot be opened or the layout deleted
+        """
+        # Mounted volumes would keep the old partitions alive in the volume manager
+        self._dismount_disk_volumes(disk_index)
+
+        handle = win32file.CreateFile(
+            disk_path,
+            win32file.GENERIC_READ | win32file.GENERIC_WRITE,
+            win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+            None,
+            win32file.OPEN_EXISTING,
+            0,
+            None
+        )
+
+        try:
+            win32file.DeviceIoControl(handle, winioctlcon.IOCTL_DISK_DELETE_DRIVE_LAYOUT, None, 0)
+            logger.debug("Sent IOCTL_DISK_DELETE_DRIVE_LAYOUT")
+        finally:
+            win32file.CloseHandle(handle)
+
+        self._invalidate_topology()
+        self._wait_until_writable(disk_path)
+
+    def trim_disk(self, disk_path, start_sector, count):
+        """
+        Tell the device a sector range no longer holds data (TRIM/UNMAP)
+
+        Returns True if the device accepted the request, False if it (or a
+        USB bridge in front of it) doesn't support it. Trimmed sectors are not
+        guaranteed to read back as zeros, so callers must still zero anything
+        that has to be zero.
+        """
+        SECTOR_SIZE = 512
+
+        # Deallocation needs write access, and the cached exclusive handle would block the open
+        self.close_write_handle(disk_path)
+
+        attributes = _DSM_ATTRIBUTES.pack(
+            28,                         # sizeof(DEVICE_MANAGE_DATA_SET_ATTRIBUTES)
+            DEVICE_DSM_ACTION_TRIM,
+            0,
+            0, 0,                       # No parameter block
+            32, 16,                     # One range, right after the header
+            start_sector * SECTOR_SIZE,
+            count * SECTOR_SIZE
+        )
+
+        try:
+            handle = win32file.CreateFile(
+                disk_path,
+                win32file.GENERIC_READ | win32file.GENERIC_WRITE,
+                win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+                None,
+                win32file.OPEN_EXISTING,
+                0,
+                None
+            )
+            try:
+                win32file.DeviceIoControl(handle, IOCTL_STORAGE_MANAGE_DATA_SET_ATTRIBUTES, attributes, 0)
+            finally:
+                win32file.CloseHandle(handle)
+
+            logger.info(f"Trimmed {count} sectors from sector {start_sector} on {disk_path}")
+            return True
+
+        except pywintypes.error as e:
+            logger.info(f"TRIM not available on {disk_path}: {e}")
+            return False
+
+    def rescan_disk(self, disk_path):
+        """
+        Make Windows re-read the disk's partition table (IOCTL_DISK_UPDATE_PROPERTIES)
+
+        Does the partition-table part of diskpart's "rescan" without starting a
+        diskpart process. Returns False if the IOCTL failed.
+        """
+        try:
+            handle = win32file.CreateFile(
+                disk_path,
+                win32file.GENERIC_READ,
+                win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+                None,
+                win32file.OPEN_EXISTING,
+                0,
+                None
+            )
+            try:
+                win32file.DeviceIoControl(handle, winioctlcon.IOCTL_DISK_UPDATE_PROPERTIES, None, 0)
+            finally:
+                win32file.CloseHandle(handle)
+            return True
+
+        except pywintypes.error as e:
+            logger.debug(f"IOCTL_DISK_UPDATE_PROPERTIES failed on {disk_path}: {e}")
+            return False
+
+    def _wait_until_writable(self, disk_path, timeout=2.0, interval=0.05):
+        """
+        Wait for the disk to accept writes again after a layout change
+
+        Sends IOCTL_DISK_UPDATE_PROPERTIES so the partition manager re-reads
+        the layout, then polls IOCTL_DISK_IS_WRITABLE instead of sleeping a
+        fixed time. Returns True once writable, False on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                handle = win32file.CreateFile(
+                    disk_path,
+                    win32file.GENERIC_READ,
+                    win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+                    None,
+                    win32file.OPEN_EXISTING,
+                    0,
+                    None
+                )
+                try:
+                    win32file.DeviceIoControl(handle, winioctlcon.IOCTL_DISK_UPDATE_PROPERTIES, None, 0)
+                    win32file.DeviceIoControl(handle, winioctlcon.IOCTL_DISK_IS_WRITABLE, None, 0)
+                    return True
+                finally:
+                    win32file.CloseHandle(handle)
+            except pywintypes.error as e:
+                if time.monotonic() >= deadline:
+                    logger.warning(f"Disk did not report writable within {timeout}s, continuing anyway: {e}")
+                    return False
+                time.sleep(interval)
+
     def _prepare_disk_for_write(self, disk_path):
         """
         Attempt to prepare disk for writing by locking volumes and updating disk cache
         """
+        # An open write handle would block the offline/online and volume locks
+        self.close_write_handle(disk_path)
+
         try:
             logger.info(f"Preparing disk {disk_path} for write operations...")
 
@@ -459,7 +1002,7 @@ class DiskManager:
 
                 if result.returncode == 0:
                     logger.info("Successfully refreshed disk with diskpart")
-                    time.sleep(0.5)  # Give Windows time to update
+                    self._wait_until_writable(disk_path)
                 else:
                     logger.warning(f"Diskpart returned error: {result.stderr}")
 
@@ -467,74 +1010,7 @@ class DiskManager:
                 logger.warning(f"Could not use diskpart to refresh disk: {e}")
 
             # Try to lock all volumes on this disk
-            try:
-                # Query for all partitions on this disk
-                partitions = self.wmi.query(
-                    f"SELECT * FROM Win32_DiskPartition WHERE DiskIndex={disk_index}"
-                )
-
-                logger.debug(f"Found {len(partitions)} partitions on disk {disk_index}")
-
-                for partition in partitions:
-                    # Get associated logical disks
-                    logical_disks = self.wmi.query(
-                        f"ASSOCIATORS OF {{Win32_DiskPartition.DeviceID='{partition.DeviceID}'}} "
-                        f"WHERE AssocClass=Win32_LogicalDiskToPartition"
-                    )
-
-                    for logical_disk in logical_disks:
-                        volume_path = f"\\\\.\\{logical_disk.DeviceID}"
-                        logger.info(f"Attempting to lock volume {volume_path}...")
-
-                        try:
-                            # Open volume
-                            vol_handle = win32file.CreateFile(
-                                volume_path,
-                                win32file.GENERIC_READ | win32file.GENERIC_WRITE,
-                                win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
-                                None,
-                                win32file.OPEN_EXISTING,
-                                0,
-                                None
-                            )
-
-                            # Try to lock volume
-                            try:
-                                win32file.DeviceIoControl(
-                                    vol_handle,
-                                    winioctlcon.FSCTL_LOCK_VOLUME,
-                                    None,
-                                    0
-                                )
-                                logger.info(f"Successfully locked volume {volume_path}")
-
-                                # Try to dismount
-                                try:
-                                    win32file.DeviceIoControl(
-                                        vol_handle,
-                                        winioctlcon.FSCTL_DISMOUNT_VOLUME,
-                                        None,
-                                        0
-                                    )
-                                    logger.info(f"Successfully dismounted volume {volume_path}")
-                                except:
-                                    logger.warning(f"Could not dismount volume {volume_path}")
-
-                            except pywintypes.error as e:
-                                logger.warning(f"Could not lock volume {volume_path}: {e}")
-
-                            win32file.CloseHandle(vol_handle)
-
-                        except pywintypes.error as e:
-                            logger.warning(f"Could not open volume {volume_path}: {e}")
-
-            except Exception as e:
-                # Don't log full exception details for COM errors (they're expected after disk clean)
-                error_str = str(e)
-                if "COM Error" in error_str or "-2147352567" in error_str:
-                    logger.debug(f"Could not enumerate partitions (WMI cache may be stale after disk operations): {type(e).__name__}")
-                else:
-                    logger.warning(f"Could not enumerate partitions for locking: {e}")
+            self._dismount_disk_volumes(disk_index)
 
             # Check for write protection
             try:
@@ -588,6 +1064,507 @@ class DiskManager:
             logger.warning(f"Error preparing disk for write: {e}")
             # Don't fail here - just log and continue
 
+    def _dismount_disk_volumes(self, disk_index):
+        """Lock and dismount every mounted volume on a disk"""
+        try:
+            # Partitions on this disk, from a fresh topology (diskpart may have just remounted volumes)
+            self._invalidate_topology()
+            topology = self._get_topology()
+            partition_ids = topology['partitions_by_drive'].get(int(disk_index), [])
+
+            logger.debug(f"Found {len(partition_ids)} partitions on disk {disk_index}")
+
+            volume_paths = [
+                f"\\\\.\\{logical_disk}"
+                for partition_id in partition_ids
+                for logical_disk in topology['logical_by_partition'].get(partition_id, ())
+            ]
+
+            # Lock/dismount waits are per volume, so overlap them
+            if volume_paths:
+                with ThreadPoolExecutor(max_workers=min(8, len(volume_paths))) as executor:
+                    list(executor.map(self._lock_dismount_volume, volume_paths))
+
+        except (wmi.x_wmi, pywintypes.com_error) as e:
+            # COM errors are expected after a disk clean; don't format the full error text
+            logger.debug(f"Could not enumerate partitions (WMI cache may be stale after disk operations): "
+                         f"{type(e).__name__} hresult={_com_hresult(e)}")
+        except Exception as e:
+            logger.warning(f"Could not enumerate partitions for locking: {e}")
+
+        # Volumes were just dismounted; don't serve this topology to the next caller
+        self._invalidate_topology()
+
+    def _lock_dismount_volume(self, volume_path):
+        """Lock and dismount one volume so raw writes to its disk are not blocked"""
+        logger.info(f"Attempting to lock volume {volume_path}...")
+
+        try:
+            # Open volume
+            vol_handle = win32file.CreateFile(
+                volume_path,
+                win32file.GENERIC_READ | win32file.GENERIC_WRITE,
+                win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+                None,
+                win32file.OPEN_EXISTING,
+                0,
+                None
+            )
+
+            # Try to lock volume
+            try:
+                win32file.DeviceIoControl(
+                    vol_handle,
+                    winioctlcon.FSCTL_LOCK_VOLUME,
+                    None,
+                    0
+                )
+                logger.info(f"Successfully locked volume {volume_path}")
+
+                # Try to dismount
+                try:
+                    win32file.DeviceIoControl(
+                        vol_handle,
+                        winioctlcon.FSCTL_DISMOUNT_VOLUME,
+                        None,
+                        0
+                    )
+                    logger.info(f"Successfully dismounted volume {volume_path}")
+                except:
+                    logger.warning(f"Could not dismount volume {volume_path}")
+
+            except pywintypes.error as e:
+                logger.warning(f"Could not lock volume {volume_path}: {e}")
+
+            win32file.CloseHandle(vol_handle)
+
+        except pywintypes.error as e:
+            logger.warning(f"Could not open volume {volume_path}: {e}")
+
+    def write_sectors_many(self, disk_path, runs, skip_prepare=False):
+        """
+        Write several (start_sector, data) runs in one batch
+        All runs are queued as overlapped writes on one handle bound to an I/O
+        completion port, then the disk is flushed once. If the batch cannot be
+        issued, the runs are written one at a time with write_sectors().
+        """
+        SECTOR_SIZE = 512
+
+        for start_sector, data in runs:
+            if len(data) % SECTOR_SIZE != 0:
+                raise ValueError("Data size must be multiple of 512 bytes")
+
+        if not runs:
+            return
+
+        if not skip_prepare:
+            self._prepare_disk_for_write(disk_path)
+
+        # A handle can only ever be bound to one completion port, so start from a fresh one
+        self.close_write_handle(disk_path)
+
+        port = None
+        try:
+            handle = self._open_for_write(disk_path)
+            port = win32file.CreateIoCompletionPort(handle, None, 0, 0)
+
+            failure = None
+            issued = 0
+            for start_sector, data in runs:
+                offset = start_sector * SECTOR_SIZE
+                overlapped = pywintypes.OVERLAPPED()
+                overlapped.Offset = offset & 0xFFFFFFFF
+                overlapped.OffsetHigh = offset >> 32
+                overlapped.object = len(data)
+                try:
+                    win32file.WriteFile(handle, data, overlapped)
+                except pywintypes.error as e:
+                    failure = e
+                    break
+                issued += 1
+
+            # Drain every write that was issued, even after a failure
+            for _ in range(issued):
+                error_code, bytes_written, _, overlapped = win32file.GetQueuedCompletionStatus(
+                    port, win32event.INFINITE
+                )
+                if failure is None and error_code != 0:
+                    failure = IOError(f"Write error code: {error_code}")
+                elif failure is None and bytes_written != overlapped.object:
+                    failure = IOError(f"Incomplete write: {bytes_written}/{overlapped.object} bytes")
+
+            if failure is not None:
+                raise failure
+
+            win32file.FlushFileBuffers(handle)
+            logger.debug(f"Batched write of {len(runs)} runs to {disk_path} completed")
+
+        except (pywintypes.error, IOError) as e:
+            logger.warning(f"Batched write failed ({e}), writing runs one at a time")
+            self.close_write_handle(disk_path, flush=False)
+            for start_sector, data in runs:
+                self.write_sectors(disk_path, start_sector, data, skip_prepare=True, keep_open=True, flush=False)
+
+        finally:
+            self.close_write_handle(disk_path)
+            if port is not None:
+                win32api.CloseHandle(port)
+
+    def open_async(self, disk_path, write=False, share_read=False):
+        """
+        Open a new overlapped handle on disk_path that the caller owns
+
+        Unlike the cached write handle, this one can be bound to an I/O
+        completion port. The caller must close it with win32file.CloseHandle.
+        Read handles bypass the cache, so their buffers must come from
+        allocate_aligned_buffer(). A write handle opened with share_read
+        leaves the disk open for a separate read handle.
+        """
+        if write:
+            # The cached handle would block an exclusive open
+            self.close_write_handle(disk_path)
+            return self._create_write_handle(disk_path, share_read=share_read)
+
+        return win32file.CreateFile(
+            disk_path,
+            win32file.GENERIC_READ,
+            win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+            None,
+            win32file.OPEN_EXISTING,
+            win32file.FILE_FLAG_OVERLAPPED | win32file.FILE_FLAG_NO_BUFFERING,
+            None
+        )
+
+    def _skip_completion_port_on_success(self, handle):
+        """
+        Stop queueing completion packets for I/Os on handle that complete inline
+        Returns True if the mode was set, so the caller must then handle
+        synchronous completions itself.
+        """
+        try:
+            ok = ctypes.windll.kernel32.SetFileCompletionNotificationModes(
+                int(handle), FILE_SKIP_COMPLETION_PORT_ON_SUCCESS | FILE_SKIP_SET_EVENT_ON_HANDLE
+            )
+        except (AttributeError, OSError):
+            return False
+        return bool(ok)
+
+    def copy_sectors(self, source_path, source_start, target_path, target_start, total_sectors,
+                     io_sectors, queue_depth, on_progress=None, is_cancelled=None, buffers=None,
+                     checksums=None, skip_zero_chunks=False):
+        """
+        Copy a sector range between disks with overlapped I/O on a completion port
+
+        Up to queue_depth reads of io_sectors each are kept in flight; each
+        completed read is written to the target from the same buffer, and the
+        buffer is reused for the next read once its write completes.
+        on_progress(sectors_copied) is called after every completed (or skipped) write.
+        is_cancelled() is checked between completions; returns False if the
+        copy was cancelled, True when all sectors were copied.
+        buffers: optional list of aligned buffers of at least io_sectors each,
+                 reused across calls; missing ones are allocated.
+        checksums: optional dict filled with {sector_offset: (count, crc32)} for
+                   every chunk as it passes through, for verify_sectors.
+        skip_zero_chunks: when a source chunk is all zeros, read the target
+                          chunk first and skip the write if it is already zero.
+                          Reads are cheaper than writes on SD cards and don't
+                          wear the flash.
+        """
+        SECTOR_SIZE = 512
+        READ_KEY, WRITE_KEY, CHECK_KEY = 1, 2, 3
+
+        source = self.open_async(source_path)
+        target = None
+        target_reader = None
+        port = None
+        outstanding = 0
+
+        try:
+            # Zero-chunk checks read the target through a second handle, which an exclusive
+            # write handle would block, so the writer shares read access in that case
+            if skip_zero_chunks:
+                try:
+                    target = self.open_async(target_path, write=True, share_read=True)
+                except pywintypes.error as e:
+                    logger.debug(f"Cannot share {target_path} for reading, not skipping zero chunks: {e}")
+                    skip_zero_chunks = False
+            if target is None:
+                target = self.open_async(target_path, write=True)
+            port = win32file.CreateIoCompletionPort(source, None, READ_KEY, 0)
+            win32file.CreateIoCompletionPort(target, port, WRITE_KEY, 0)
+
+            if skip_zero_chunks:
+                try:
+                    target_reader = self.open_async(target_path)
+                    win32file.CreateIoCompletionPort(target_reader, port, CHECK_KEY, 0)
+                except pywintypes.error as e:
+                    logger.debug(f"Cannot read {target_path} while writing, not skipping zero chunks: {e}")
+                    if target_reader is not None:
+                        win32file.CloseHandle(target_reader)
+                    target_reader = None
+
+            handles = {READ_KEY: source, WRITE_KEY: target, CHECK_KEY: target_reader}
+            bases = {READ_KEY: source_start, WRITE_KEY: target_start, CHECK_KEY: target_start}
+
+            # I/Os the driver finishes inline are handled here instead of through a port packet
+            skips_port = {key: self._skip_completion_port_on_success(handle)
+                          for key, handle in handles.items() if handle is not None}
+            completed_inline = deque()
+
+            def submit(key, buffer, sector_offset, count):
+                handle = handles[key]
+                offset = (bases[key] + sector_offset) * SECTOR_SIZE
+                overlapped = pywintypes.OVERLAPPED()
+                overlapped.Offset = offset & 0xFFFFFFFF
+                overlapped.OffsetHigh = offset >> 32
+                # Per-operation state travels with the OVERLAPPED and comes back on completion
+                overlapped.object = (buffer, sector_offset, count)
+                view = memoryview(buffer)[:count * SECTOR_SIZE]
+                if key == WRITE_KEY:
+                    error_code, _ = win32file.WriteFile(handle, view, overlapped)
+                else:
+                    error_code, _ = win32file.ReadFile(handle, view, overlapped)
+
+                if error_code == 0 and skips_port[key]:
+                    transferred = win32file.GetOverlappedResult(handle, overlapped, False)
+                    completed_inline.append((0, transferred, key, overlapped))
+
+            next_sector = 0
+            sectors_copied = 0
+            sectors_skipped = 0
+            cancelled = False
+
+            if buffers is None:
+                buffers = []
+            while len(buffers) < queue_depth:
+                buffers.append(allocate_aligned_buffer(io_sectors * SECTOR_SIZE))
+
+            # All-zero chunk, compared as 64-bit words and copied back over stale target data
+            zeros = memoryview(bytes(io_sectors * SECTOR_SIZE)) if target_reader is not None else None
+
+            # Prime the pipeline: one read per buffer
+            for buffer in buffers[:queue_depth]:
+                if next_sector >= total_sectors:
+                    break
+                count = min(io_sectors, total_sectors - next_sector)
+                submit(READ_KEY, buffer, next_sector, count)
+                outstanding += 1
+                next_sector += count
+
+            while outstanding:
+                if completed_inline:
+                    error_code, transferred, key, overlapped = completed_inline.popleft()
+                else:
+                    error_code, transferred, key, overlapped = win32file.GetQueuedCompletionStatus(
+                        port, win32event.INFINITE
+                    )
+                outstanding -= 1
+                buffer, sector_offset, count = overlapped.object
+                size = count * SECTOR_SIZE
+
+                if error_code != 0:
+                    raise IOError(f"{'Write' if key == WRITE_KEY else 'Read'} error code: {error_code} "
+                                  f"at sector offset {sector_offset}")
+                if transferred != size:
+                    raise IOError(f"Incomplete {'write' if key == WRITE_KEY else 'read'}: "
+                                  f"{transferred}/{size} bytes at sector offset {sector_offset}")
+
+                view = memoryview(buffer)[:size]
+
+                if key == READ_KEY:
+                    if zeros is not None and view.cast('Q') == zeros[:size].cast('Q'):
+                        if checksums is not None:
+                            checksums[sector_offset] = (count, zlib.crc32(view))
+                        # Read what the target already holds into the same buffer
+                        submit(CHECK_KEY, buffer, sector_offset, count)
+                        outstanding += 1
+                        continue
+
+                    # Same buffer goes straight back out as the write
+                    submit(WRITE_KEY, buffer, sector_offset, count)
+                    outstanding += 1
+                    # The write only reads the buffer, so checksum it while the write is in flight
+                    if checksums is not None:
+                        checksums[sector_offset] = (count, zlib.crc32(view))
+                    continue
+
+                if key == CHECK_KEY:
+                    if view.cast('Q') != zeros[:size].cast('Q'):
+                        # Stale data on the target: restore the zeros and write them
+                        view[:] = zeros[:size]
+                        submit(WRITE_KEY, buffer, sector_offset, count)
+                        outstanding += 1
+                        continue
+                    sectors_skipped += count
+
+                sectors_copied += count
+                if on_progress:
+                    on_progress(sectors_copied)
+
+                if is_cancelled and is_cancelled():
+                    cancelled = True
+
+                # Refill the freed buffer
+                if not cancelled and next_sector < total_sectors:
+                    count = min(io_sectors, total_sectors - next_sector)
+                    submit(READ_KEY, buffer, next_sector, count)
+                    outstanding += 1
+                    next_sector += count
+
+            if sectors_skipped:
+                logger.info(f"Skipped writing {sectors_skipped} zero sectors already zero on the target")
+
+            win32file.FlushFileBuffers(target)
+            return not cancelled
+
+        finally:
+            # Buffers must outlive their I/O, so cancel and drain before closing anything
+            if outstanding and port is not None:
+                outstanding -= len(completed_inline)
+                for handle in (source, target, target_reader):
+                    if handle is not None:
+                        try:
+                            win32file.CancelIo(handle)
+                        except pywintypes.error:
+                            pass
+                while outstanding:
+                    _, _, _, overlapped = win32file.GetQueuedCompletionStatus(port, 5000)
+                    if overlapped is None:
+                        logger.warning(f"Timed out draining {outstanding} pending disk operations")
+                        break
+                    outstanding -= 1
+
+            win32file.CloseHandle(source)
+            if target is not None:
+                win32file.CloseHandle(target)
+            if target_reader is not None:
+                win32file.CloseHandle(target_reader)
+            if port is not None:
+                win32api.CloseHandle(port)
+
+    def verify_sectors(self, disk_path, start_sector, checksums, buffer=None, on_progress=None,
+                       is_cancelled=None):
+        """
+        Read back chunks recorded by copy_sectors and compare their CRC32s
+
+        checksums: {sector_offset: (count, crc32)} relative to start_sector.
+        buffer: optional aligned buffer large enough for the largest chunk.
+        on_progress(sectors_verified) is called after every chunk.
+        Returns the sector offset of the first mismatching chunk, or None if
+        everything matched (or the check was cancelled).
+        """
+        SECTOR_SIZE = 512
+
+        largest = max((count for count, _ in checksums.values()), default=0) * SECTOR_SIZE
+        if buffer is None or len(buffer) < largest:
+            buffer = allocate_aligned_buffer(largest)
+
+        handle = self.open_async(disk_path)
+        try:
+            sectors_verified = 0
+            for sector_offset in sorted(checksums):
+                if is_cancelled and is_cancelled():
+                    return None
+
+                count, expected = checksums[sector_offset]
+                view = memoryview(buffer)[:count * SECTOR_SIZE]
+                transferred = self._overlapped_io(
+                    handle, (start_sector + sector_offset) * SECTOR_SIZE, view, write=False
+                )
+                if transferred != len(view):
+                    raise IOError(f"Incomplete read: {transferred}/{len(view)} bytes "
+                                  f"at sector offset {sector_offset}")
+
+                if zlib.crc32(view) != expected:
+                    return sector_offset
+
+                sectors_verified += count
+                if on_progress:
+                    on_progress(sectors_verified)
+
+            return None
+
+        finally:
+            win32file.CloseHandle(handle)
+
+    def get_max_transfer_length(self, disk_path):
+        """
+        Get the largest single transfer the disk's storage adapter accepts, in bytes
+        Returns None if the adapter can't be queried
+        """
+        try:
+            handle = win32file.CreateFile(
+                disk_path,
+                0,
+                win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+                None,
+                win32file.OPEN_EXISTING,
+                0,
+                None
+            )
+            try:
+                descriptor = win32file.DeviceIoControl(
+                    handle,
+                    winioctlcon.IOCTL_STORAGE_QUERY_PROPERTY,
+                    _ADAPTER_PROPERTY_QUERY,
+                    64
+                )
+            finally:
+                win32file.CloseHandle(handle)
+
+            _, _, max_transfer, max_pages = _ADAPTER_DESCRIPTOR.unpack_from(descriptor)
+
+            # Scatter/gather limits the transfer too: one page per physical page entry
+            if max_pages:
+                max_transfer = min(max_transfer, (max_pages - 1) * mmap.PAGESIZE)
+
+            logger.debug(f"{disk_path}: maximum transfer length {max_transfer} bytes")
+            return max_transfer or None
+
+        except pywintypes.error as e:
+            logger.debug(f"Could not query storage adapter for {disk_path}: {e}")
+            return None
+
+    def get_drive_layout(self, disk_path, refresh=True):
+        """
+        Read the partition table Windows has for the disk via IOCTL_DISK_GET_DRIVE_LAYOUT_EX
+
+        Returns a list of (partition_number, start_sector, size_sectors) tuples,
+        skipping unused MBR slots. partition_number is the 1-based number
+        diskpart's "select partition" expects. With refresh, the partition
+        manager re-reads the on-disk layout first (IOCTL_DISK_UPDATE_PROPERTIES).
+        """
+        handle = win32file.CreateFile(
+            disk_path,
+            win32file.GENERIC_READ,
+            win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
+            None,
+            win32file.OPEN_EXISTING,
+            0,
+            None
+        )
+        try:
+            if refresh:
+                win32file.DeviceIoControl(handle, winioctlcon.IOCTL_DISK_UPDATE_PROPERTIES, None, 0)
+            layout = win32file.DeviceIoControl(
+                handle,
+                winioctlcon.IOCTL_DISK_GET_DRIVE_LAYOUT_EX,
+                None,
+                _DRIVE_LAYOUT_BUFFER_SIZE
+            )
+        finally:
+            win32file.CloseHandle(handle)
+
+        _, count = _DRIVE_LAYOUT_HEADER.unpack_from(layout)
+        partitions = []
+        for i in range(count):
+            offset = _DRIVE_LAYOUT_HEADER.size + i * _PARTITION_ENTRY_SIZE
+            _, start, length, number = _PARTITION_ENTRY.unpack_from(layout, offset)
+            if number and length:
+                partitions.append((number, start // 512, length // 512))
+
+        return partitions
+
     def _check_disk_status(self, disk_path):
         """
         Check and log disk status for debugging
@@ -595,11 +1572,11 @@ class DiskManager:
         try:
             logger.info("Checking disk status...")
 
-            # Extract disk index
-            disk_index = disk_path.replace("\\\\.\\PhysicalDrive", "")
+            # Extract disk index (int() keeps anything else out of the WQL)
+            disk_index = int(disk_path.replace("\\\\.\\PhysicalDrive", ""))
 
             # Query disk information
-            disks = self.wmi.query(f"SELECT * FROM Win32_DiskDrive WHERE Index={disk_index}")
+            disks = self.wmi.query(_Q_DRIVE_STATUS.format(disk_index))
 
             if disks:
                 disk = disks[0]
@@ -610,19 +1587,14 @@ class DiskManager:
                 logger.info(f"Interface Type: {disk.InterfaceType}")
 
                 # Check partitions
-                partitions = self.wmi.query(
-                    f"SELECT * FROM Win32_DiskPartition WHERE DiskIndex={disk_index}"
-                )
+                partitions = self.wmi.query(_Q_DISK_PARTITIONS.format(disk_index))
                 logger.info(f"Number of partitions: {len(partitions)}")
 
                 for idx, partition in enumerate(partitions):
                     logger.info(f"  Partition {idx}: {partition.DeviceID}, Size: {partition.Size}")
 
                     # Check if mounted
-                    logical_disks = self.wmi.query(
-                        f"ASSOCIATORS OF {{Win32_DiskPartition.DeviceID='{partition.DeviceID}'}} "
-                        f"WHERE AssocClass=Win32_LogicalDiskToPartition"
-                    )
+                    logical_disks = self.wmi.query(_Q_PARTITION_LOGICAL_DISKS.format(partition.DeviceID))
 
                     for ld in logical_disks:
                         logger.warning(f"    MOUNTED AS: {ld.DeviceID} - This may prevent write access!")
@@ -635,9 +1607,10 @@ class DiskManager:
         Get disk size in bytes
         """
         try:
+            # GET_LENGTH_INFO is a FILE_READ_ACCESS IOCTL, so a query-only handle is not enough
             handle = win32file.CreateFile(
                 disk_path,
-                0,
+                win32file.GENERIC_READ,
                 win32file.FILE_SHARE_READ | win32file.FILE_SHARE_WRITE,
                 None,
                 win32file.OPEN_EXISTING,
@@ -645,21 +1618,18 @@ class DiskManager:
                 None
             )
 
-            # Get disk geometry
-            geometry = win32file.DeviceIoControl(
-                handle,
-                winioctlcon.IOCTL_DISK_GET_DRIVE_GEOMETRY,
-                None,
-                24
-            )
-
-            win32file.CloseHandle(handle)
-
-            # Parse geometry (simple approach)
-            import struct
-            cylinders, media_type, tracks_per_cylinder, sectors_per_track, bytes_per_sector = struct.unpack('QIIII', geometry)
+            # Get the true byte length (CHS geometry under-reports LBA-only disks)
+            try:
+                length_info = win32file.DeviceIoControl(
+                    handle,
+                    winioctlcon.IOCTL_DISK_GET_LENGTH_INFO,
+                    None,
+                    8
+                )
+            finally:
+                win32file.CloseHandle(handle)
 
-            total_size = cylinders * tracks_per_cylinder * sectors_per_track * bytes_per_sector
+            total_size, = _U64.unpack(length_info)
 
             return total_size
 
@@ -684,3 +1654,118 @@ class DiskManager:
                 raise
             except Exception as wmi_error:
                 raise IOError(f"Failed to get disk size for {disk_path}: {wmi_error}")
+
+
+class DiskpartSession:
+    """
+    Long-lived diskpart.exe process
+
+    Starting diskpart costs hundreds of milliseconds (process creation plus
+    attaching to the Virtual Disk Service), so scripts are fed to one running
+    instance and each command is considered finished once diskpart prints its
+    next prompt.
+    """
+
+    PROMPT = "DISKPART> "
+    # diskpart writes its output in the console's OEM code page
+    ENCODING = 'oem'
+
+    def __init__(self):
+        self._process = None
+        self._chunks = queue.Queue()
+        self._buffer = ""
+
+    def run(self, script, timeout=30):
+        """Run a diskpart script and return its combined output"""
+        commands = [line.strip() for line in script.splitlines() if line.strip()]
+        if not commands:
+            return ""
+
+        if self._process is None or self._process.poll() is not None:
+            self._start(timeout)
+
+        self._process.stdin.write(("\n".join(commands) + "\n").encode('ascii'))
+        self._process.stdin.flush()
+
+        return self._read_prompts(len(commands), timeout)
+
+    def close(self):
+        """Exit diskpart"""
+        if self._process is None:
+            return
+
+        try:
+            if self._process.poll() is None:
+                self._process.stdin.write(b"exit\n")
+                self._process.stdin.flush()
+                self._process.wait(timeout=5)
+        except Exception as e:
+            logger.debug(f"diskpart did not exit cleanly: {e}")
+            self._process.kill()
+        finally:
+            self._process = None
+
+    def _start(self, timeout):
+        """Spawn diskpart and wait for its first prompt"""
+        self._chunks = queue.Queue()
+        self._buffer = ""
+        self._process = subprocess.Popen(
+            ['diskpart'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            creationflags=subprocess.CREATE_NO_WINDOW
+        )
+
+        # The prompt is not newline-terminated, so raw chunks are pumped from a
+        # reader thread instead of iterating over lines
+        threading.Thread(
+            target=self._pump, args=(self._process.stdout, self._chunks), daemon=True
+        ).start()
+
+        self._read_prompts(1, timeout)
+
+    @staticmethod
+    def _pump(stream, chunks):
+        """Forward raw diskpart output to the chunk queue until EOF"""
+        fd = stream.fileno()
+        # Incremental so a multibyte character split across two reads still decodes
+        decoder = codecs.getincrementaldecoder(DiskpartSession.ENCODING)(errors='replace')
+        while True:
+            data = os.read(fd, 4096)
+            if not data:
+                tail = decoder.decode(b'', final=True)
+                if tail:
+                    chunks.put(tail)
+                chunks.put(None)
+                return
+            chunks.put(decoder.decode(data))
+
+    def _read_prompts(self, count, timeout):
+        """Collect output until diskpart has printed count more prompts"""
+        deadline = time.monotonic() + timeout
+        output = []
+
+        while count:
+            index = self._buffer.find(self.PROMPT)
+            if index >= 0:
+                output.append(self._buffer[:index])
+                self._buffer = self._buffer[index + len(self.PROMPT):]
+                count -= 1
+                continue
+
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise queue.Empty
+                chunk = self._chunks.get(timeout=remaining)
+            except queue.Empty:
+                self.close()
+                raise subprocess.TimeoutExpired('diskpart', timeout)
+
+            if chunk is None:
+                self._process = None
+                raise RuntimeError("diskpart exited unexpectedly")
+            self._buffer += chunk
+
+        return "".join(output)
@@ -0,0 +1,169 @@
+"""
+FAT32 Formatter - Create an empty FAT32 filesystem directly on a partition
+"""
+
+import logging
+import struct
+import time
+from core.partition_models import Partition
+from core.disk_manager import allocate_aligned_buffer
+
+logger = logging.getLogger(__name__)
+
+SECTOR_SIZE = 512
+RESERVED_SECTORS = 32
+NUM_FATS = 2
+ROOT_CLUSTER = 2
+FSINFO_SECTOR = 1
+BACKUP_BOOT_SECTOR = 6
+MIN_FAT32_CLUSTERS = 65525
+
+# Zeroed FAT sectors are written in chunks of this size
+ZERO_CHUNK_SECTORS = 8192  # 4MB
+
+
+class Fat32Formatter:
+    """Writes boot sectors, FATs and an empty root directory for a FAT32 partition"""
+
+    def __init__(self, disk_manager):
+        self.disk_manager = disk_manager
+
+    def format(self, disk_path: str, partition: Partition, sectors_per_cluster: int = 128):
+        """
+        Format a partition as FAT32
+
+        The layout is fully determined by the partition size and cluster size,
+        so only the reserved region, both FATs and the root directory cluster
+        are written - the data area is left untouched.
+        """
+        total_sectors = partition.size_sectors
+        reserved_sectors, fat_sectors = self._calculate_layout(total_sectors, sectors_per_cluster)
+
+        data_start = reserved_sectors + NUM_FATS * fat_sectors
+        cluster_count = (total_sectors - data_start) // sectors_per_cluster
+
+        if cluster_count < MIN_FAT32_CLUSTERS:
+            raise ValueError(
+                f"Partition too small for FAT32: {cluster_count} clusters "
+                f"(minimum {MIN_FAT32_CLUSTERS})"
+            )
+
+        logger.info(f"Formatting FAT32 at sector {partition.start_sector}: {total_sectors} sectors, "
+                    f"{sectors_per_cluster} sectors/cluster, {cluster_count} clusters, "
+                    f"FAT size {fat_sectors} sectors")
+
+        # 1. Reserved region: boot sector, FSInfo and their backups
+        # The first write prepares the disk (dismounts any volume Windows mounted)
+        reserved = self._build_reserved_region(
+            partition.start_sector, total_sectors, sectors_per_cluster,
+            reserved_sectors, fat_sectors, cluster_count
+        )
+        self.disk_manager.write_sectors(disk_path, partition.start_sector, reserved)
+
+        # 2. Both FATs, zeroed apart from the media/EOC entries and the root directory chain
+        fat_start = partition.start_sector + reserved_sectors
+        # Two aligned chunks cover every FAT write: all zeros, and zeros behind the FAT header.
+        # Shorter writes use memoryview slices of them, so nothing is copied or reallocated.
+        zero_chunk = memoryview(allocate_aligned_buffer(ZERO_CHUNK_SECTORS * SECTOR_SIZE))
+        header_chunk = memoryview(allocate_aligned_buffer(ZERO_CHUNK_SECTORS * SECTOR_SIZE))
+        struct.pack_into('<III', header_chunk, 0, 0x0FFFFFF8, 0x0FFFFFFF, 0x0FFFFFFF)
+
+        # The handle stays open across the FAT chunks and is flushed once at the end
+        try:
+            for fat in range(NUM_FATS):
+                fat_offset = fat_start + fat * fat_sectors
+                written = 0
+                while written < fat_sectors:
+                    count = min(ZERO_CHUNK_SECTORS, fat_sectors - written)
+                    source = header_chunk if written == 0 else zero_chunk
+                    chunk = source[:count * SECTOR_SIZE]
+
+                    self.disk_manager.write_sectors(disk_path, fat_offset + written, chunk,
+                                                    skip_prepare=True, keep_open=True, flush=False)
+                    written += count
+
+            # 3. Empty root directory (cluster 2 is the first data cluster)
+            self.disk_manager.write_sectors(
+                disk_path,
+                partition.start_sector + data_start,
+                zero_chunk[:sectors_per_cluster * SECTOR_SIZE],
+                skip_prepare=True,
+                keep_open=True,
+                flush=False
+            )
+        finally:
+            self.disk_manager.close_write_handle(disk_path)
+
+        logger.info("FAT32 filesystem written")
+
+    def _calculate_layout(self, total_sectors: int, sectors_per_cluster: int) -> tuple:
+        """
+        Return (reserved_sectors, fat_sectors)
+
+        Reserved sectors are padded so the data area starts on a cluster
+        boundary, which keeps clusters aligned to the SD card's erase blocks.
+        """
+        # Each FAT entry is 4 bytes; size the FAT for every cluster that could fit
+        numerator = 4 * (total_sectors - RESERVED_SECTORS)
+        denominator = sectors_per_cluster * SECTOR_SIZE + 4 * NUM_FATS
+        fat_sectors = numerator // denominator + 1
+
+        # Round FAT size up to whole clusters so both FATs end cluster-aligned
+        fat_sectors = -(-fat_sectors // sectors_per_cluster) * sectors_per_cluster
+
+        reserved_sectors = RESERVED_SECTORS
+        misalignment = (reserved_sectors + NUM_FATS * fat_sectors) % sectors_per_cluster
+        if misalignment:
+            reserved_sectors += sectors_per_cluster - misalignment
+
+        return reserved_sectors, fat_sectors
+
+    def _build_reserved_region(self, hidden_sectors, total_sectors, sectors_per_cluster,
+                               reserved_sectors, fat_sectors, cluster_count) -> bytes:
+        """Build the reserved region with boot sector, FSInfo and backups"""
+        region = bytearray(reserved_sectors * SECTOR_SIZE)
+
+        boot_sector = bytearray(SECTOR_SIZE)
+        boot_sector[0:3] = b'\xEB\x58\x90'                          # Jump instruction
+        boot_sector[3:11] = b'MSWIN4.1'                             # OEM name
+        struct.pack_into('<HBHBHHBHHHII', boot_sector, 11,
+                         SECTOR_SIZE,                               # Bytes per sector
+                         sectors_per_cluster,                       # Sectors per cluster
+                         reserved_sectors,                          # Reserved sectors
+                         NUM_FATS,                                  # Number of FATs
+                         0,                                         # Root entries (0 for FAT32)
+                         0,                                         # Total sectors 16-bit
+                         0xF8,                                      # Media descriptor (fixed disk)
+                         0,                                         # FAT size 16-bit
+                         63,                                        # Sectors per track
+                         255,                                       # Number of heads
+                         hidden_sectors,                            # Hidden sectors (partition start)
+                         total_sectors)                             # Total sectors 32-bit
+        struct.pack_into('<IHHIHH', boot_sector, 36,
+                         fat_sectors,                               # FAT size 32-bit
+                         0,                                         # Ext flags (FATs mirrored)
+                         0,                                         # Filesystem version
+                         ROOT_CLUSTER,                              # Root directory cluster
+                         FSINFO_SECTOR,                             # FSInfo sector
+                         BACKUP_BOOT_SECTOR)                        # Backup boot sector
+        boot_sector[64] = 0x80                                      # Drive number
+        boot_sector[66] = 0x29                                      # Extended boot signature
+        struct.pack_into('<I', boot_sector, 67, int(time.time()) & 0xFFFFFFFF)  # Volume serial
+        boot_sector[71:82] = b'NO NAME    '                         # Volume label
+        boot_sector[82:90] = b'FAT32   '                            # Filesystem type
+        boot_sector[510:512] = b'\x55\xAA'
+
+        fsinfo = bytearray(SECTOR_SIZE)
+        struct.pack_into('<I', fsinfo, 0, 0x41615252)               # Lead signature
+        struct.pack_into('<III', fsinfo, 484,
+                         0x61417272,                                # Struct signature
+                         cluster_count - 1,                         # Free clusters (root uses one)
+                         ROOT_CLUSTER + 1)                          # Next free cluster hint
+        struct.pack_into('<I', fsinfo, 508, 0xAA550000)             # Trail signature
+
+        for base in (0, BACKUP_BOOT_SECTOR):
+            region[base * SECTOR_SIZE:(base + 1) * SECTOR_SIZE] = boot_sector
+            fsinfo_offset = (base + FSINFO_SECTOR) * SECTOR_SIZE
+            region[fsinfo_offset:fsinfo_offset + SECTOR_SIZE] = fsinfo
+
+        return bytes(region)
@@ -4,40 +4,150 @@ Migration Engine - Copy partitions from source to target
 
 import time
 import threading
-import queue
-import psutil
-import shutil
 import logging
 import subprocess
 import tempfile
+import shutil
 import struct
 import re
 import os
+import sys
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Callable, Optional
-from core.disk_manager import DiskManager
+from core.disk_manager import DiskManager, DiskpartSession, allocate_aligned_buffer
 from core.partition_writer import PartitionWriter
-from core.partition_models import DiskLayout
+from core.partition_models import DiskLayout, RAW_FOLDER_NAME, RAW_FOLDER_ID, EMUMMC_INI_TEMPLATE
+
+if sys.platform == 'win32':
+    import win32file
 
 logger = logging.getLogger(__name__)
 
 SECTOR_SIZE = 512
 
-# Auto-detect optimal chunk size based on available RAM
-def _get_optimal_chunk_size():
-    """Determine optimal chunk size based on available system RAM"""
+# FAT32 normally keeps a backup of the boot sector at this sector of the partition
+# (used when the BPB's own BkBootSec value is out of range)
+BACKUP_BOOT_SECTOR = 6
+
+# FAT32 BPB from offset 11: bytes per sector, sectors per cluster, reserved sectors,
+# number of FATs, then (offset 32) total sectors 32-bit, (offset 36) FAT size 32-bit,
+# (offset 48) FSInfo sector and (offset 50) backup boot sector
+_FAT32_BPB = struct.Struct('<HBHB15xII8xHH')
+_FAT32_TOTAL_SECTORS = struct.Struct('<I')
+
+# FSInfo lead and struct signatures (offsets 0 and 484), and its free cluster count (offset 488)
+_FSINFO_SIGNATURES = struct.Struct('<I480xI')
+_FSINFO_FREE_CLUSTERS = struct.Struct('<I')
+FSINFO_SIGNATURES = (0x41615252, 0x61417272)
+FSINFO_UNKNOWN_FREE = 0xFFFFFFFF
+
+# GPT header fields (92 bytes): signature, revision, header size, header CRC32, reserved,
+# current LBA, backup LBA, first/last usable LBA, disk GUID, entries LBA,
+# entry count, entry size, entries CRC32
+_GPT_HEADER = struct.Struct('<8sIIIIQQQQ16sQIII')
+_GPT_HEADER_CRC = struct.Struct('<I')
+
+# GPT partition entry (128 bytes): type GUID, unique GUID, first LBA, last LBA,
+# attributes, UTF-16LE name (zero padded)
+_GPT_ENTRY = struct.Struct('<16s16sQQQ72s')
+
+# Sector copy I/O size (capped by the adapters' maximum transfer length, but never below the minimum)
+COPY_IO_SIZE = 4 * 1024 * 1024
+MIN_COPY_IO_SIZE = 1024 * 1024
+
+# Most sector copy I/Os kept in flight
+MAX_QUEUE_DEPTH = 16
+
+# Sectors zeroed after a successful TRIM: MBR, primary GPT header and entries (64KB)
+HEADER_CLEAR_SECTORS = 128
+
+# Sector copy progress reaches the GUI at most this often (seconds)
+MIN_PROGRESS_INTERVAL = 1.0
+
+# How often the progress thread samples the sector copy's counter (seconds)
+PROGRESS_POLL_INTERVAL = 0.25
+
+# File copy progress is written to the log at most this often (seconds); the GUI
+# progress bar still follows every PROGRESS_POLL_INTERVAL update
+PROGRESS_LOG_INTERVAL = 5.0
+
+# Robocopy writes to a pipe in the console (OEM) code page; its output is read as
+# bytes and only decoded for logging
+ROBOCOPY_ENCODING = 'oem'
+
+def _get_optimal_chunk_size(max_transfer_length=None):
+    """
+    Determine (chunk_size, num_buffers) for sector copies
+
+    Chunks are sized to what the storage adapters transfer in one request, and
+    as many are kept in flight as MAX_QUEUE_DEPTH and available RAM allow.
+    """
+    chunk_size = COPY_IO_SIZE
+    if max_transfer_length:
+        chunk_size = min(chunk_size, max_transfer_length - max_transfer_length % SECTOR_SIZE)
+        chunk_size = max(chunk_size, MIN_COPY_IO_SIZE)
+
     try:
+        # Only needed once per migration, so keep it off the module import path
+        import psutil
         available_ram = psutil.virtual_memory().available
-        if available_ram > 8 * 1024**3:  # 8GB+
-            return 128 * 1024 * 1024, 3  # 128MB, triple buffering
-        elif available_ram > 4 * 1024**3:  # 4GB+
-            return 64 * 1024 * 1024, 2   # 64MB, double buffering
-        else:  # Low memory
-            return 32 * 1024 * 1024, 1   # 32MB, single buffer (no threading)
+        num_buffers = max(1, min(MAX_QUEUE_DEPTH, available_ram // (2 * chunk_size)))
     except:
-        return 32 * 1024 * 1024, 1  # Safe fallback
+        num_buffers = 1  # Safe fallback
+
+    return chunk_size, num_buffers
+
+# FAT32 file copy: files at least this large bypass the cache (COPY_FILE_NO_BUFFERING)
+UNBUFFERED_COPY_MIN_SIZE = 16 * 1024 * 1024
+COPY_FILE_NO_BUFFERING = 0x00001000
+
+# diskpart "list volume" rows for removable FAT32 volumes with a letter, e.g.
+# "  Volume 3     E   SWITCH SD    FAT32   Removable     51 GB  Healthy"
+_DISKPART_FAT32_VOLUME = re.compile(r'Volume\s+(\d+)\s+([A-Z])\s+.*FAT32.*Removable', re.IGNORECASE)
+
+# Starts each volume's section in the output of a batched "select volume"/"detail volume" script
+_DISKPART_SELECTED_VOLUME = re.compile(r'Volume (\d+) is the selected volume')
+
+# Robocopy end-of-job summary rows (raw output bytes), e.g. "Files :      1532      1532  0 ..."
+# The first number is the total for that row
+_ROBOCOPY_SUMMARY_LINE = re.compile(rb'(Dirs|Files|Bytes) :\s*(\d+)')
+
+# Files below this size are copied FILE_COPY_WORKERS at a time to hide per-file open/close
+# latency; larger ones go one at a time once those finish so they don't compete for the card's bandwidth
+PARALLEL_COPY_MAX_SIZE = 64 * 1024 * 1024
+FILE_COPY_WORKERS = 8
+
+def _run_with_hard_timeout(cmd, input, timeout):
+    """
+    Run a one-shot console tool (fat32format) and return a CompletedProcess
+
+    subprocess.run(timeout=...) terminates only the direct child and then
+    waits for its pipes to close, which a surviving grandchild can hold open
+    indefinitely. Here the whole process tree is killed with taskkill /T
+    before subprocess.TimeoutExpired is raised.
+    """
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        creationflags=subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP
+    )
+    try:
+        stdout, stderr = process.communicate(input, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        logger.warning(f"{cmd[0]} did not finish within {timeout}s, killing its process tree")
+        subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                       capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW)
+        try:
+            process.wait(5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        raise
 
-CHUNK_SIZE, NUM_BUFFERS = _get_optimal_chunk_size()
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
 
 class MigrationEngine:
     """Handles the complete migration process"""
@@ -53,6 +163,16 @@ class MigrationEngine:
         self.disk_manager = DiskManager()
         self.partition_writer = PartitionWriter(self.disk_manager)
 
+        # Sector copy chunk size and queue depth, from both disks' adapter limits
+        transfer_limits = [
+            limit for limit in (
+                self.disk_manager.get_max_transfer_length(source_disk['path']),
+                self.disk_manager.get_max_transfer_length(target_disk['path']),
+            ) if limit
+        ]
+        self.chunk_size, self.num_buffers = _get_optimal_chunk_size(min(transfer_limits, default=None))
+        logger.info(f"Sector copy: {self.chunk_size // 1024} KB chunks, up to {self.num_buffers} in flight")
+
         # Callbacks
         self.on_progress: Optional[Callable] = None
         self.on_complete: Optional[Callable] = None
@@ -60,6 +180,23 @@ class MigrationEngine:
 
         self.cancelled = False
 
+        # Aligned copy buffers shared by every partition's sector copy
+        self._copy_buffers = []
+
+        # One aligned zero chunk for every zero write; anonymous mappings are only
+        # committed when touched, and this one is never written
+        self._zero_buffer = allocate_aligned_buffer(self.chunk_size)
+
+        # Per-partition chunk CRC32s recorded during sector copies: {name: {sector_offset: (count, crc)}}
+        self.partition_checksums = {}
+
+        # Short-lived WMI partition and drive-letter lookups (see _get_partitions)
+        self._part_cache = {}
+        self._logical_disk_cache = {}
+
+        # One diskpart process shared by every assign/remove/rescan/volume query in this run
+        self._diskpart = DiskpartSession()
+
     def run(self):
         """Execute migration"""
         # Initialize COM for this thread (needed for WMI operations)
@@ -94,17 +231,13 @@ class MigrationEngine:
             # Stage 3: Create FAT32 filesystem using fat32format.exe
             # This must happen AFTER partition table is written so Windows can mount the partition
             self._report_progress("Preparing FAT32", 8, "Creating FAT32 filesystem...")
-            fat32_part = None
-            for part in self.target_layout.partitions:
-                if part.category == 'FAT32':
-                    fat32_part = part
-                    break
+            fat32_part = self.target_layout.get_fat32_partition()
             if fat32_part:
-                logger.info("Waiting for Windows to recognize new partitions...")
-                time.sleep(3)  # Give Windows extra time to recognize partitions
                 logger.info("Refreshing disk before formatting...")
                 self._refresh_disk_partitions(self.target_disk['path'])
-                time.sleep(2)
+                logger.info("Waiting for Windows to recognize the FAT32 partition...")
+                if not self._wait_for_partition_visible(fat32_part.start_sector, timeout=5.0):
+                    logger.warning("FAT32 partition not listed by Windows yet, formatting anyway")
                 logger.info("Formatting FAT32 partition with fat32format.exe...")
                 self._create_fat32_filesystem(fat32_part)
 
@@ -127,40 +260,59 @@ class MigrationEngine:
             if self.on_error:
                 self.on_error(str(e))
         finally:
+            # Release any write handle left open by an interrupted copy
+            try:
+                self.disk_manager.close_write_handle(self.target_disk['path'])
+            except Exception as e:
+                logger.warning(f"Failed to close target disk handle: {e}")
+
+            self._diskpart.close()
+
             # Uninitialize COM when done
             pythoncom.CoUninitialize()
 
     def _clear_target_disk(self):
-        """Clear first 16MB of target disk (MBR, GPT, etc.)"""
+        """Trim the target disk and clear its partition table headers"""
         self._report_progress("Preparing Disk", 5, "Clearing target disk headers...")
 
         # Prepare disk once at the beginning
         self.disk_manager._prepare_disk_for_write(self.target_disk['path'])
 
-        # Clear first 16MB (0x8000 sectors) in large chunks for speed
-        CLEAR_CHUNK_SECTORS = CHUNK_SIZE // SECTOR_SIZE  # Use same chunk size as data copy
-        total_sectors = 0x8000  # 16MB
-        zeros = b'\x00' * CHUNK_SIZE
+        # Trimming the whole card discards the old contents in one command; after that only
+        # the MBR and primary GPT (first 64KB) need explicit zeros. Without TRIM support,
+        # clear the first 16MB (0x8000 sectors) as before.
+        disk_sectors = self.disk_manager.get_disk_size(self.target_disk['path']) // SECTOR_SIZE
+        if disk_sectors and self.disk_manager.trim_disk(self.target_disk['path'], 0, disk_sectors):
+            total_sectors = HEADER_CLEAR_SECTORS
+        else:
+            total_sectors = 0x8000  # 16MB
+
+        # Clear in large chunks for speed
+        CLEAR_CHUNK_SECTORS = self.chunk_size // SECTOR_SIZE  # Use same chunk size as data copy
 
         sectors_cleared = 0
         while sectors_cleared < total_sectors:
             remaining = total_sectors - sectors_cleared
             sectors_to_clear = min(CLEAR_CHUNK_SECTORS, remaining)
 
-            # Write chunk of zeros (only allocate needed size for last chunk)
+            # Write chunk of zeros (a shorter view of the shared buffer for the last chunk)
             if sectors_to_clear < CLEAR_CHUNK_SECTORS:
-                chunk_zeros = b'\x00' * (sectors_to_clear * SECTOR_SIZE)
+                chunk_zeros = memoryview(self._zero_buffer)[:sectors_to_clear * SECTOR_SIZE]
             else:
-                chunk_zeros = zeros
+                chunk_zeros = self._zero_buffer
 
             # Skip prepare since we did it once at the beginning
-            self.disk_manager.write_sectors(self.target_disk['path'], sectors_cleared, chunk_zeros, skip_prepare=True)
+            self.disk_manager.write_sectors(self.target_disk['path'], sectors_cleared, chunk_zeros,
+                                            skip_prepare=True, keep_open=True, flush=False)
             sectors_cleared += sectors_to_clear
 
             # Update progress less frequently
             percent = 5 + (sectors_cleared / total_sectors) * 5
             self._report_progress("Preparing Disk", percent, f"Clearing headers ({sectors_cleared}/{total_sectors} sectors)...")
 
+        # Flush once and release the disk for the partition table writes
+        self.disk_manager.close_write_handle(self.target_disk['path'])
+
     def _copy_partitions(self):
         """Copy partition data from source to target"""
         total_partitions = len(self.source_layout.partitions)
@@ -225,7 +377,7 @@ class MigrationEngine:
             logger.info(f"Using sector-level copy for {source_part.category} partition")
 
             # Calculate chunk size in sectors
-            chunk_sectors = CHUNK_SIZE // SECTOR_SIZE
+            chunk_sectors = self.chunk_size // SECTOR_SIZE
             # Use the smaller of source or target partition size to avoid writing beyond partition boundary
             # Note: For emuMMC, the target partition size already has 1MB safety margin subtracted during layout creation
             total_sectors = min(source_part.size_sectors, target_part.size_sectors)
@@ -237,72 +389,182 @@ class MigrationEngine:
             logger.info(f"Copying {total_sectors} sectors from {source_part.name} "
                        f"({(total_sectors * SECTOR_SIZE) / (1024**3):.2f} GB)")
 
+            # Chunk CRCs are only recorded when the copy will be read back
+            checksums = {} if self.options.get('verify') else None
+
             # Use threaded I/O only if we have multiple buffers
-            if NUM_BUFFERS > 1:
+            if self.num_buffers > 1:
                 self._copy_partition_data_threaded(
                     source_part, target_part, stage_name, base_progress,
-                    chunk_sectors, total_sectors
+                    chunk_sectors, total_sectors, checksums
                 )
             else:
                 # Fallback to single-threaded for low-memory systems
                 self._copy_partition_data_single(
                     source_part, target_part, stage_name, base_progress,
-                    chunk_sectors, total_sectors
+                    chunk_sectors, total_sectors, checksums
                 )
 
-    def _copy_partition_data_single(self, source_part, target_part, stage_name,
-                                     base_progress, chunk_sectors, total_sectors):
-        """Single-threaded copy (original method, for low-memory systems)"""
-        sectors_copied = 0
-        last_progress_update = 0
+            if checksums is not None:
+                self.partition_checksums[source_part.name] = checksums
+                self._verify_partition_data(target_part, stage_name, base_progress, checksums)
+
+    def _verify_partition_data(self, target_part, stage_name, base_progress, checksums):
+        """Read the copied partition back and compare it against the CRCs taken during the copy"""
+        logger.info(f"Verifying {target_part.name} ({len(checksums)} chunks)...")
+        self._report_progress(stage_name, base_progress, f"Verifying {target_part.name}...")
+
         start_time = time.time()
-        last_log_time = start_time
+        mismatch = self.disk_manager.verify_sectors(
+            self.target_disk['path'], target_part.start_sector, checksums,
+            buffer=self._copy_buffers[0] if self._copy_buffers else None,
+            is_cancelled=lambda: self.cancelled
+        )
+
+        if self.cancelled:
+            raise Exception("Migration cancelled by user")
+        if mismatch is not None:
+            raise Exception(f"Verification failed for {target_part.name}: data read back from "
+                            f"sector {target_part.start_sector + mismatch} does not match the source")
+
+        elapsed = time.time() - start_time
+        logger.info(f"Verification of {target_part.name} passed in {elapsed:.1f} seconds")
+
+    def _copy_partition_data_single(self, source_part, target_part, stage_name,
+                                     base_progress, chunk_sectors, total_sectors, checksums=None):
+        """Sequential copy, one chunk in flight (for low-memory systems)"""
 
         # Note: disk is already prepared by _copy_partitions(), no need to prepare again
 
+        start_time = time.time()
+
         logger.info(f"Starting sector copy: {total_sectors} sectors ({(total_sectors * SECTOR_SIZE) / (1024**3):.2f} GB)")
 
-        while sectors_copied < total_sectors:
-            if self.cancelled:
-                raise Exception("Migration cancelled by user")
+        # Both disks are opened once for the whole partition; each chunk is read into
+        # one page-aligned buffer and written from it before the next read
+        # The copy loop only records its counter; a separate thread does the reporting
+        update_progress, stop_progress = self._start_progress_reporter(
+            self._make_copy_progress(stage_name, base_progress, total_sectors, start_time)
+        )
+        try:
+            completed = self.disk_manager.copy_sectors(
+                self.source_disk['path'], source_part.start_sector,
+                self.target_disk['path'], target_part.start_sector,
+                total_sectors, chunk_sectors, 1,
+                on_progress=update_progress,
+                is_cancelled=lambda: self.cancelled,
+                buffers=self._copy_buffers,
+                checksums=checksums,
+                skip_zero_chunks=True
+            )
+        finally:
+            stop_progress()
 
-            # Calculate sectors to copy in this iteration
-            remaining = total_sectors - sectors_copied
-            sectors_to_copy = min(chunk_sectors, remaining)
+        if not completed or self.cancelled:
+            raise Exception("Migration cancelled by user")
 
-            # Read from source
-            source_sector = source_part.start_sector + sectors_copied
-            data = self.disk_manager.read_sectors(
-                self.source_disk['path'],
-                source_sector,
-                sectors_to_copy
-            )
+        elapsed = time.time() - start_time
+        logger.info(f"Sector copy completed in {elapsed:.1f} seconds")
 
-            # Write to target (skip prepare since we did it once)
-            target_sector = target_part.start_sector + sectors_copied
-            self.disk_manager.write_sectors(
-                self.target_disk['path'],
-                target_sector,
-                data,
-                skip_prepare=True
+    def _copy_partition_data_threaded(self, source_part, target_part, stage_name,
+                                       base_progress, chunk_sectors, total_sectors, checksums=None):
+        """Overlapped copy keeping several reads and writes in flight on a completion port"""
+
+        # Note: disk is already prepared by _copy_partitions(), no need to prepare again
+
+        io_sectors = chunk_sectors
+        queue_depth = self.num_buffers
+
+        start_time = time.time()
+
+        logger.info(f"Starting overlapped sector copy: {total_sectors} sectors ({(total_sectors * SECTOR_SIZE) / (1024**3):.2f} GB)")
+        logger.info(f"Using queue depth {queue_depth} with {io_sectors} sectors per I/O")
+
+        # The copy loop only records its counter; a separate thread does the reporting
+        update_progress, stop_progress = self._start_progress_reporter(
+            self._make_copy_progress(stage_name, base_progress, total_sectors, start_time)
+        )
+        try:
+            completed = self.disk_manager.copy_sectors(
+                self.source_disk['path'], source_part.start_sector,
+                self.target_disk['path'], target_part.start_sector,
+                total_sectors, io_sectors, queue_depth,
+                on_progress=update_progress,
+                is_cancelled=lambda: self.cancelled,
+                buffers=self._copy_buffers,
+                checksums=checksums,
+                skip_zero_chunks=True
             )
+        finally:
+            stop_progress()
 
-            sectors_copied += sectors_to_copy
+        if not completed or self.cancelled:
+            raise Exception("Migration cancelled by user")
 
-            # Calculate progress and speed
-            percent = (sectors_copied / total_sectors) * 100
-            elapsed = time.time() - start_time
+        elapsed = time.time() - start_time
+        logger.info(f"Overlapped sector copy completed in {elapsed:.1f} seconds")
+
+    def _start_progress_reporter(self, report):
+        """
+        Call report(value) with the latest recorded value every PROGRESS_POLL_INTERVAL
+        from a daemon thread, keeping logging and GUI updates off the I/O loop
+
+        Returns (update, stop): update(value) records a value, stop() ends the
+        thread and reports the last value if it hasn't been reported yet.
+        """
+        latest = [None]
+        reported = [None]
+        stopped = threading.Event()
+
+        def report_latest():
+            value = latest[0]
+            if value is not None and value != reported[0]:
+                reported[0] = value
+                report(value)
+
+        def poll():
+            while not stopped.wait(PROGRESS_POLL_INTERVAL):
+                report_latest()
+
+        thread = threading.Thread(target=poll, daemon=True)
+        thread.start()
+
+        def update(value):
+            latest[0] = value
+
+        def stop():
+            stopped.set()
+            thread.join()
+            report_latest()
+
+        return update, stop
+
+    def _make_copy_progress(self, stage_name, base_progress, total_sectors, start_time):
+        """Build the on_progress callback for DiskManager.copy_sectors"""
+        # Invariants for the whole partition, so the per-chunk path is one clock read and two compares
+        progress_range = 70 / len(self.source_layout.partitions)
+        mb_per_sector = SECTOR_SIZE / (1024 * 1024)
+        mb_total = total_sectors * mb_per_sector
+        one_percent = max(1, total_sectors // 100)  # Integer, so the per-call gate never touches floats
+        next_update_sectors = [one_percent]
+        last_log_time = [start_time]
+
+        def on_progress(sectors_copied):
             current_time = time.time()
+            since_last = current_time - last_log_time[0]
 
-            # Report progress more frequently (every 1% or every 5 seconds)
-            should_update = (percent - last_progress_update >= 1.0 or
-                           sectors_copied == total_sectors or
-                           (current_time - last_log_time) >= 5.0)
+            # Report progress every 1% or every 5 seconds, but no more than once per
+            # MIN_PROGRESS_INTERVAL so fast copies don't flood the GUI's event queue
+            should_update = (sectors_copied == total_sectors or
+                           (since_last >= MIN_PROGRESS_INTERVAL and
+                            (sectors_copied >= next_update_sectors[0] or since_last >= 5.0)))
 
             if should_update:
-                progress = base_progress + (percent / 100) * (70 / len(self.source_layout.partitions))
-                mb_copied = (sectors_copied * SECTOR_SIZE) / (1024 * 1024)
-                mb_total = (total_sectors * SECTOR_SIZE) / (1024 * 1024)
+                # Calculate progress and speed
+                percent = (sectors_copied / total_sectors) * 100
+                progress = base_progress + (percent / 100) * progress_range
+                mb_copied = sectors_copied * mb_per_sector
+                elapsed = current_time - start_time
 
                 # Calculate speed
                 speed_mbps = mb_copied / elapsed if elapsed > 0 else 0
@@ -323,148 +585,10 @@ class MigrationEngine:
                 logger.info(log_msg)
                 self._report_progress(stage_name, progress, log_msg)
 
-                last_progress_update = percent
-                last_log_time = current_time
-
-        logger.info(f"Sector copy completed in {elapsed:.1f} seconds")
-
-    def _copy_partition_data_threaded(self, source_part, target_part, stage_name,
-                                       base_progress, chunk_sectors, total_sectors):
-        """Threaded copy with double/triple buffering for overlapped I/O"""
-
-        # Note: disk is already prepared by _copy_partitions(), no need to prepare again
-
-        # Queues for producer-consumer pattern
-        read_queue = queue.Queue(maxsize=NUM_BUFFERS)
-        write_queue = queue.Queue(maxsize=NUM_BUFFERS)
-
-        # Shared state
-        sectors_copied = [0]  # Use list for mutable reference
-        last_progress_update = [0]
-        start_time = [time.time()]
-        last_log_time = [time.time()]
-        error_holder = [None]
+                next_update_sectors[0] = sectors_copied + one_percent
+                last_log_time[0] = current_time
 
-        logger.info(f"Starting threaded sector copy: {total_sectors} sectors ({(total_sectors * SECTOR_SIZE) / (1024**3):.2f} GB)")
-        logger.info(f"Using {NUM_BUFFERS} buffers with {chunk_sectors} sectors per chunk")
-
-        def reader_thread():
-            """Read chunks from source disk"""
-            try:
-                sectors_read = 0
-                while sectors_read < total_sectors:
-                    if self.cancelled:
-                        return
-
-                    remaining = total_sectors - sectors_read
-                    sectors_to_read = min(chunk_sectors, remaining)
-
-                    source_sector = source_part.start_sector + sectors_read
-                    data = self.disk_manager.read_sectors(
-                        self.source_disk['path'],
-                        source_sector,
-                        sectors_to_read
-                    )
-
-                    # Put into write queue with sector position
-                    target_sector = target_part.start_sector + sectors_read
-                    write_queue.put((target_sector, data, sectors_to_read))
-
-                    sectors_read += sectors_to_read
-
-                # Signal end of reading
-                write_queue.put(None)
-
-            except Exception as e:
-                error_holder[0] = e
-                write_queue.put(None)
-
-        def writer_thread():
-            """Write chunks to target disk"""
-            try:
-                while True:
-                    if self.cancelled:
-                        return
-
-                    item = write_queue.get()
-                    if item is None:  # End signal
-                        break
-
-                    target_sector, data, sectors_written = item
-
-                    # Skip prepare since we did it once at the beginning
-                    self.disk_manager.write_sectors(
-                        self.target_disk['path'],
-                        target_sector,
-                        data,
-                        skip_prepare=True
-                    )
-
-                    # Update progress
-                    sectors_copied[0] += sectors_written
-
-                    # Calculate progress and speed
-                    percent = (sectors_copied[0] / total_sectors) * 100
-                    elapsed = time.time() - start_time[0]
-                    current_time = time.time()
-
-                    # Report progress more frequently (every 1% or every 5 seconds)
-                    should_update = (percent - last_progress_update[0] >= 1.0 or
-                                   sectors_copied[0] == total_sectors or
-                                   (current_time - last_log_time[0]) >= 5.0)
-
-                    if should_update:
-                        progress = base_progress + (percent / 100) * (70 / len(self.source_layout.partitions))
-                        mb_copied = (sectors_copied[0] * SECTOR_SIZE) / (1024 * 1024)
-                        mb_total = (total_sectors * SECTOR_SIZE) / (1024 * 1024)
-
-                        # Calculate speed
-                        speed_mbps = mb_copied / elapsed if elapsed > 0 else 0
-
-                        # Estimate time remaining
-                        if speed_mbps > 0:
-                            remaining_mb = mb_total - mb_copied
-                            eta_seconds = remaining_mb / speed_mbps
-                            eta_mins = int(eta_seconds / 60)
-                            eta_secs = int(eta_seconds % 60)
-                            eta_str = f" - ETA: {eta_mins}m {eta_secs}s"
-                        else:
-                            eta_str = ""
-
-                        log_msg = (f"Copied {mb_copied:.1f} MB / {mb_total:.1f} MB ({percent:.1f}%) "
-                                  f"at {speed_mbps:.1f} MB/s{eta_str}")
-
-                        logger.info(log_msg)
-                        self._report_progress(stage_name, progress, log_msg)
-
-                        last_progress_update[0] = percent
-                        last_log_time[0] = current_time
-
-                    write_queue.task_done()
-
-            except Exception as e:
-                error_holder[0] = e
-
-        # Start threads
-        reader = threading.Thread(target=reader_thread, daemon=True)
-        writer = threading.Thread(target=writer_thread, daemon=True)
-
-        reader.start()
-        writer.start()
-
-        # Wait for completion
-        reader.join()
-        writer.join()
-
-        # Check for errors
-        if error_holder[0]:
-            raise error_holder[0]
-
-        if self.cancelled:
-            raise Exception("Migration cancelled by user")
-
-        elapsed = time.time() - start_time[0]
-        logger.info(f"Threaded sector copy completed in {elapsed:.1f} seconds")
+        return on_progress
 
     def _copy_fat32_files(self, source_part, target_part, stage_name, base_progress, progress_range=70):
         """Copy FAT32 partition using file-level copy (much faster than sector copy)
@@ -542,59 +666,7 @@ class MigrationEngine:
         disk_index = self.target_disk['path'].replace("\\\\.\\PhysicalDrive", "")
 
         # We need to find the partition number by checking which partition matches our start sector
-        partition_num = None
-        MAX_RETRIES = 5
-        RETRY_DELAY = 2
-
-        for attempt in range(MAX_RETRIES):
-            try:
-                logger.info(f"Attempting to find partition number (attempt {attempt + 1}/{MAX_RETRIES})...")
-
-                # Refresh WMI connection if retry (COM is already initialized for this thread)
-                if attempt > 0:
-                    logger.info("Refreshing WMI connection...")
-                    import wmi
-                    self.disk_manager.wmi = wmi.WMI()
-
-                # Query partitions
-                partitions = self.disk_manager.wmi.query(
-                    f"SELECT * FROM Win32_DiskPartition WHERE DiskIndex={disk_index}"
-                )
-
-                logger.info(f"Found {len(partitions)} partitions on disk {disk_index}")
-
-                # Find the partition that matches our start sector
-                for part in partitions:
-                    part_start = int(part.StartingOffset) // SECTOR_SIZE
-                    logger.debug(f"Partition {part.Index}: starts at sector {part_start}")
-
-                    if abs(part_start - partition.start_sector) < 2048:  # Within 1MB tolerance
-                        partition_num = int(part.Index)
-                        logger.info(f"Found matching partition: {partition_num}")
-                        break
-
-                if partition_num is not None:
-                    break
-
-                # Partition not found yet, try refreshing with diskpart
-                if attempt < MAX_RETRIES - 1:
-                    logger.info(f"Partition not found, refreshing disk and waiting {RETRY_DELAY}s...")
-                    diskpart_script = f"select disk {disk_index}\nrescan\n"
-                    subprocess.run(
-                        ['diskpart'],
-                        input=diskpart_script,
-                        capture_output=True,
-                        text=True,
-                        timeout=30,
-                        creationflags=subprocess.CREATE_NO_WINDOW
-                    )
-                    time.sleep(RETRY_DELAY)
-
-            except Exception as e:
-                logger.warning(f"Error querying partitions: {e}")
-                if attempt < MAX_RETRIES - 1:
-                    logger.info(f"Waiting {RETRY_DELAY}s before retry...")
-                    time.sleep(RETRY_DELAY)
+        partition_num = self._find_partition_number(partition.start_sector)
 
         if partition_num is None:
             logger.warning("Could not find partition number, assuming partition 1")
@@ -607,23 +679,18 @@ assign
 """
 
         logger.info(f"Running diskpart to assign drive letter to partition {partition_num}...")
-        result = subprocess.run(
-            ['diskpart'],
-            input=diskpart_script,
-            capture_output=True,
-            text=True,
-            timeout=30,
-            creationflags=subprocess.CREATE_NO_WINDOW
-        )
+        output = self._diskpart.run(diskpart_script, timeout=30)
 
-        if result.returncode != 0:
-            logger.error(f"Diskpart assign failed: {result.stderr}")
-            raise Exception(f"Failed to assign drive letter to FAT32 partition: {result.stderr}")
+        if "error" in output.lower():
+            logger.error(f"Diskpart assign failed: {output.strip()}")
+            raise Exception(f"Failed to assign drive letter to FAT32 partition: {output.strip()}")
 
         logger.info("Successfully assigned drive letter to partition")
+        self._invalidate_partition_cache()
 
         # Wait for Windows to mount the partition
-        time.sleep(3)
+        if not self._wait_for_drive_letter(partition.start_sector, timeout=3.0):
+            logger.warning("No drive letter visible yet for FAT32 partition")
 
         logger.info("FAT32 partition should now be mounted")
 
@@ -656,20 +723,15 @@ select partition {partition_num}
 assign
 """
 
-        result = subprocess.run(
-            ['diskpart'],
-            input=diskpart_script,
-            capture_output=True,
-            text=True,
-            timeout=30,
-            creationflags=subprocess.CREATE_NO_WINDOW
-        )
+        output = self._diskpart.run(diskpart_script, timeout=30).lower()
 
-        if result.returncode != 0 and "already assigned" not in result.stdout.lower():
-            logger.warning(f"Diskpart assign returned: {result.stderr}")
+        if "error" in output and "already assigned" not in output:
+            logger.warning(f"Diskpart assign returned: {output.strip()}")
+
+        self._invalidate_partition_cache()
 
         # Wait for assignment to take effect
-        time.sleep(2)
+        self._wait_for_drive_letter(partition.start_sector, timeout=2.0)
 
         # Get the actual drive letter
         drive_letter = self._get_drive_letter_for_partition(self.target_disk['path'], partition.start_sector)
@@ -681,45 +743,23 @@ assign
         return drive_letter
 
     def _find_partition_number(self, start_sector):
-        """Find the partition number (index) for a partition starting at a specific sector"""
-        disk_index = self.target_disk['path'].replace("\\\\.\\PhysicalDrive", "")
-        MAX_RETRIES = 10
-        RETRY_DELAY = 2
-
-        for attempt in range(MAX_RETRIES):
-            try:
-                logger.info(f"Looking for partition at sector {start_sector} (attempt {attempt + 1}/{MAX_RETRIES})...")
+        """Find the partition number for a partition starting at a specific sector"""
+        disk_path = self.target_disk['path']
 
-                # Refresh WMI if retry
-                if attempt > 0:
-                    import wmi
-                    self.disk_manager.wmi = wmi.WMI()
-
-                partitions = self.disk_manager.wmi.query(
-                    f"SELECT * FROM Win32_DiskPartition WHERE DiskIndex={disk_index}"
-                )
-
-                logger.info(f"Found {len(partitions)} partitions on disk {disk_index}")
-
-                for part in partitions:
-                    part_start = int(part.StartingOffset) // SECTOR_SIZE
-                    logger.info(f"  Partition {part.Index}: starts at sector {part_start}")
+        try:
+            partitions = self.disk_manager.get_drive_layout(disk_path)
+        except Exception as e:
+            logger.warning(f"Error reading drive layout: {e}")
+            return None
 
-                    if abs(part_start - start_sector) < 2048:  # Within 1MB tolerance
-                        logger.info(f"Found matching partition number: {part.Index}")
-                        return int(part.Index)
+        logger.info(f"Found {len(partitions)} partitions on {disk_path}")
 
-                # Not found, refresh and retry
-                if attempt < MAX_RETRIES - 1:
-                    logger.info(f"Partition not found, refreshing and waiting {RETRY_DELAY}s...")
-                    diskpart_script = f"select disk {disk_index}\nrescan\n"
-                    subprocess.run(['diskpart'], input=diskpart_script, capture_output=True, text=True, timeout=30, creationflags=subprocess.CREATE_NO_WINDOW)
-                    time.sleep(RETRY_DELAY)
+        for number, part_start, _ in partitions:
+            logger.debug(f"  Partition {number}: starts at sector {part_start}")
 
-            except Exception as e:
-                logger.warning(f"Error finding partition: {e}")
-                if attempt < MAX_RETRIES - 1:
-                    time.sleep(RETRY_DELAY)
+            if abs(part_start - start_sector) < 2048:  # Within 1MB tolerance
+                logger.info(f"Found matching partition number: {number}")
+                return number
 
         return None
 
@@ -763,13 +803,10 @@ assign
 
         # Run the format command with "Y" piped to confirm
         # fat32format.exe asks for confirmation, so we need to answer "Y"
-        result = subprocess.run(
+        result = _run_with_hard_timeout(
             format_cmd,
-            input="Y\n",  # Auto-confirm the format operation
-            capture_output=True,
-            text=True,
-            timeout=300,  # 5 minute timeout
-            creationflags=subprocess.CREATE_NO_WINDOW
+            "Y\n",  # Auto-confirm the format operation
+            300     # 5 minute timeout
         )
 
         logger.info(f"Format command output:\n{result.stdout}")
@@ -796,24 +833,40 @@ assign
             # Otherwise Windows may have it cached and will overwrite our changes
             logger.info("Dismounting FAT32 volume before BPB update...")
             self._dismount_partition(partition)
-            time.sleep(1)
+            self._wait_for_drive_letter(partition.start_sector, assigned=False, timeout=1.0)
 
-            # Read the boot sector (sector 0 of the partition)
-            boot_sector_data = self.disk_manager.read_sectors(
+            # Read the boot sector through the usual backup FSInfo (sectors 0-7 of the partition)
+            # in one I/O, so every copy can be rewritten with a single write
+            boot_region = bytearray(self.disk_manager.read_sectors(
                 self.target_disk['path'],
                 partition.start_sector,
-                1
-            )
+                BACKUP_BOOT_SECTOR + 2
+            ))
 
             # Parse FAT32 BPB
-            bytes_per_sector = struct.unpack('<H', boot_sector_data[11:13])[0]
-            sectors_per_cluster = boot_sector_data[13]
-            reserved_sectors = struct.unpack('<H', boot_sector_data[14:16])[0]
-            num_fats = boot_sector_data[16]
-
-            # FAT32 specific fields
-            fat_size_32 = struct.unpack('<I', boot_sector_data[36:40])[0]
-            total_sectors_32 = struct.unpack('<I', boot_sector_data[32:36])[0]
+            (bytes_per_sector, sectors_per_cluster, reserved_sectors, num_fats,
+             total_sectors_32, fat_size_32, fs_info_sector,
+             backup_boot_sector) = _FAT32_BPB.unpack_from(boot_region, 11)
+
+            # Trust the BPB's backup boot sector only if it lies inside the reserved region
+            if not 0 < backup_boot_sector < reserved_sectors:
+                logger.warning(f"BPB backup boot sector {backup_boot_sector} is invalid, using {BACKUP_BOOT_SECTOR}")
+                backup_boot_sector = BACKUP_BOOT_SECTOR
+
+            # FSInfo sits in front of the backup boot sector and is copied behind it
+            if not 0 < fs_info_sector < backup_boot_sector or backup_boot_sector + fs_info_sector >= reserved_sectors:
+                logger.warning(f"BPB FSInfo sector {fs_info_sector} is invalid, FSInfo will not be updated")
+                fs_info_sector = 0
+
+            region_sectors = backup_boot_sector + fs_info_sector + 1
+            if region_sectors * SECTOR_SIZE > len(boot_region):
+                boot_region = bytearray(self.disk_manager.read_sectors(
+                    self.target_disk['path'],
+                    partition.start_sector,
+                    region_sectors
+                ))
+            else:
+                del boot_region[region_sectors * SECTOR_SIZE:]
 
             logger.info(f"Current FAT32 BPB values:")
             logger.info(f"  Bytes per sector: {bytes_per_sector}")
@@ -821,6 +874,7 @@ assign
             logger.info(f"  Reserved sectors: {reserved_sectors}")
             logger.info(f"  Number of FATs: {num_fats}")
             logger.info(f"  FAT size (sectors): {fat_size_32}")
+            logger.info(f"  FSInfo sector: {fs_info_sector}, backup boot sector: {backup_boot_sector}")
             logger.info(f"  Total sectors in filesystem: {total_sectors_32}")
 
             # Calculate what the total sectors SHOULD be (based on partition size)
@@ -834,40 +888,39 @@ assign
                 logger.warning(f"FAT32 BPB mismatch! BPB reports {total_sectors_32} sectors, but partition has {expected_total_sectors} sectors")
                 logger.info(f"Updating FAT32 BPB to reflect correct partition size...")
 
-                # Create updated boot sector with corrected total sectors
-                boot_sector_updated = bytearray(boot_sector_data)
-
-                # Update total sectors (offset 32, 4 bytes, little-endian)
-                boot_sector_updated[32:36] = struct.pack('<I', expected_total_sectors)
+                # Update total sectors (offset 32, 4 bytes, little-endian) in place
+                _FAT32_TOTAL_SECTORS.pack_into(boot_region, 32, expected_total_sectors)
 
-                # Recalculate and update the boot sector signature if needed
-                # (Most implementations don't check this, but let's be thorough)
+                if fs_info_sector:
+                    self._update_fsinfo_free_clusters(
+                        boot_region, fs_info_sector, total_sectors_32, expected_total_sectors,
+                        bytes_per_sector, sectors_per_cluster, reserved_sectors, num_fats, fat_size_32
+                    )
 
-                # Write the updated boot sector back
-                logger.info(f"Writing updated boot sector to partition...")
+                # The backup boot sector and FSInfo get the same contents as the primaries;
+                # everything goes out in one write together with the unchanged sectors in between
+                view = memoryview(boot_region)
+                backup_offset = backup_boot_sector * SECTOR_SIZE
+                view[backup_offset:backup_offset + SECTOR_SIZE] = view[:SECTOR_SIZE]
+                if fs_info_sector:
+                    fs_info = view[fs_info_sector * SECTOR_SIZE:(fs_info_sector + 1) * SECTOR_SIZE]
+                    backup_fs_info_offset = backup_offset + fs_info_sector * SECTOR_SIZE
+                    view[backup_fs_info_offset:backup_fs_info_offset + SECTOR_SIZE] = fs_info
+                    fs_info.release()
+                view.release()
+
+                logger.info(f"Writing updated boot sector and backup boot sector to partition...")
                 self.disk_manager.write_sectors(
                     self.target_disk['path'],
                     partition.start_sector,
-                    bytes(boot_sector_updated),
-                    skip_prepare=True
-                )
-
-                # Also update backup boot sector (FAT32 keeps backup at sector 6)
-                logger.info(f"Updating backup boot sector at sector 6...")
-                self.disk_manager.write_sectors(
-                    self.target_disk['path'],
-                    partition.start_sector + 6,
-                    bytes(boot_sector_updated),
+                    boot_region,
                     skip_prepare=True
                 )
 
+                # write_sectors closed its handle with FlushFileBuffers, so the BPB is on the card;
+                # the partition table is unchanged and needs no rescan
                 logger.info(f"FAT32 BPB updated successfully - filesystem now reports {expected_total_sectors} sectors")
 
-                # Flush disk cache to ensure changes are written
-                logger.info("Flushing disk cache to ensure BPB changes are committed...")
-                self._refresh_disk_partitions(self.target_disk['path'])
-                time.sleep(2)
-
             else:
                 logger.info(f"FAT32 BPB is correct - filesystem size matches partition size")
 
@@ -875,25 +928,50 @@ assign
             logger.error(f"Error verifying/fixing FAT32 BPB: {e}")
             logger.warning("Continuing anyway - the partition may still work, but Hekate might see wrong size")
 
+        # The dismount removed the locked letter; mounting it again also makes Windows read the new BPB
+        if getattr(self, 'target_fat32_drive', None):
+            try:
+                self.target_fat32_drive = self._assign_and_lock_drive_letter(
+                    partition, preferred_letter=self.target_fat32_drive
+                )
+            except Exception as e:
+                logger.warning(f"Could not remount FAT32 partition as {self.target_fat32_drive}: {e}")
+
+    def _update_fsinfo_free_clusters(self, boot_region, fs_info_sector, old_total_sectors, new_total_sectors,
+                                     bytes_per_sector, sectors_per_cluster, reserved_sectors, num_fats, fat_size):
+        """
+        Shift the FSInfo free cluster count by the clusters gained or lost with the new total size,
+        so Windows doesn't have to rescan the whole FAT on first mount
+        """
+        offset = fs_info_sector * SECTOR_SIZE
+        if _FSINFO_SIGNATURES.unpack_from(boot_region, offset) != FSINFO_SIGNATURES:
+            logger.warning("FSInfo signatures not found, leaving FSInfo unchanged")
+            return
+
+        free_clusters, = _FSINFO_FREE_CLUSTERS.unpack_from(boot_region, offset + 488)
+        if free_clusters == FSINFO_UNKNOWN_FREE:
+            return
+
+        data_start = reserved_sectors + num_fats * fat_size
+        # Clusters past what the FAT can describe are never usable
+        max_clusters = fat_size * bytes_per_sector // 4 - 2
+
+        def cluster_count(total_sectors):
+            return max(0, min((total_sectors - data_start) // sectors_per_cluster, max_clusters))
+
+        new_free = free_clusters + cluster_count(new_total_sectors) - cluster_count(old_total_sectors)
+        new_free = max(0, new_free)
+
+        _FSINFO_FREE_CLUSTERS.pack_into(boot_region, offset + 488, new_free)
+        logger.info(f"FSInfo free clusters updated: {free_clusters} -> {new_free}")
+
     def _dismount_partition(self, partition):
         """Dismount/offline a partition using diskpart to release Windows locks"""
         try:
             disk_index = self.target_disk['path'].replace("\\\\.\\PhysicalDrive", "")
 
-            # Find the partition number for this start sector
-            partition_num = None
-            try:
-                partitions = self.disk_manager.wmi.query(
-                    f"SELECT * FROM Win32_DiskPartition WHERE DiskIndex={disk_index}"
-                )
-
-                for part in partitions:
-                    part_start = int(part.StartingOffset) // SECTOR_SIZE
-                    if abs(part_start - partition.start_sector) < 2048:  # Within 1MB tolerance
-                        partition_num = int(part.Index)
-                        break
-            except:
-                logger.warning("Could not find partition number via WMI")
+            # Find the partition number for this start sector (from the drive layout, no WMI)
+            partition_num = self._find_partition_number(partition.start_sector)
 
             if partition_num is None:
                 logger.warning("Could not determine partition number for dismount")
@@ -906,64 +984,128 @@ remove
 """
 
             logger.info(f"Dismounting partition {partition_num} on disk {disk_index}...")
-            result = subprocess.run(
-                ['diskpart'],
-                input=diskpart_script,
-                capture_output=True,
-                text=True,
-                timeout=30,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            output = self._diskpart.run(diskpart_script, timeout=30)
+
+            self._invalidate_partition_cache()
 
-            if result.returncode == 0:
+            if "error" not in output.lower():
                 logger.info("Successfully dismounted partition")
             else:
-                logger.warning(f"Diskpart dismount returned: {result.stderr}")
+                logger.warning(f"Diskpart dismount returned: {output.strip()}")
 
         except Exception as e:
             logger.warning(f"Could not dismount partition: {e}")
 
+    def _get_partitions(self, disk_index, max_age=2.0):
+        """Get [(start_sector, DeviceID), ...] for a disk from WMI, cached for max_age seconds"""
+        cached = self._part_cache.get(disk_index)
+        if cached and time.monotonic() - cached[0] < max_age:
+            return cached[1]
+
+        partitions = [
+            (int(part.StartingOffset) // SECTOR_SIZE, part.DeviceID)
+            for part in self.disk_manager.wmi.query(
+                f"SELECT DeviceID, StartingOffset FROM Win32_DiskPartition WHERE DiskIndex={disk_index}"
+            )
+        ]
+        self._part_cache[disk_index] = (time.monotonic(), partitions)
+        return partitions
+
+    def _get_logical_disks(self, device_id):
+        """Get the drive letters of a WMI partition, cached until the layout or letters change"""
+        letters = self._logical_disk_cache.get(device_id)
+        if letters is None:
+            letters = [
+                logical_disk.DeviceID for logical_disk in self.disk_manager.wmi.query(
+                    f"ASSOCIATORS OF {{Win32_DiskPartition.DeviceID='{device_id}'}} "
+                    f"WHERE AssocClass=Win32_LogicalDiskToPartition"
+                )
+            ]
+            # A partition without a letter yet is asked again next time
+            if letters:
+                self._logical_disk_cache[device_id] = letters
+        return letters
+
+    def _invalidate_partition_cache(self):
+        """Drop cached WMI lookups after partitions or drive letters may have changed"""
+        self._part_cache.clear()
+        self._logical_disk_cache.clear()
+
+    def _wait_for(self, condition, timeout, interval=0.1):
+        """Poll condition until it is true or timeout elapses"""
+        deadline = time.monotonic() + timeout
+        while True:
+            if condition():
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+
+    def _find_target_partition(self, start_sector, max_age=2.0):
+        """Get the WMI DeviceID of the target partition at start_sector (within 1MB), or None"""
+        disk_index = self.target_disk['path'].replace("\\\\.\\PhysicalDrive", "")
+        for part_start, device_id in self._get_partitions(disk_index, max_age):
+            if abs(part_start - start_sector) < 2048:
+                return device_id
+        return None
+
+    def _wait_for_partition_visible(self, start_sector, timeout=2.0, interval=0.1):
+        """Wait until Windows lists a target partition at start_sector"""
+        def check():
+            try:
+                return self._find_target_partition(start_sector, max_age=0) is not None
+            except Exception as e:
+                logger.debug(f"Partition query failed while waiting: {e}")
+                return False
+
+        return self._wait_for(check, timeout, interval)
+
+    def _wait_for_drive_letter(self, start_sector, assigned=True, timeout=2.0, interval=0.1):
+        """Wait until the target partition at start_sector has (or no longer has) a drive letter"""
+        def check():
+            try:
+                device_id = self._find_target_partition(start_sector, max_age=0)
+                if device_id is None:
+                    return not assigned
+                # Letters are cached once found, so a removal has to be asked fresh
+                self._logical_disk_cache.pop(device_id, None)
+                return bool(self._get_logical_disks(device_id)) == assigned
+            except Exception as e:
+                logger.debug(f"Drive letter query failed while waiting: {e}")
+                return False
+
+        return self._wait_for(check, timeout, interval)
+
     def _get_drive_letter_for_partition(self, disk_path, start_sector):
         """Get the drive letter for a partition at a specific sector"""
-        MAX_RETRIES = 5
-        RETRY_DELAY = 2  # seconds
+        MAX_RETRIES = 7
+        RETRY_DELAY = 0.1  # seconds, doubled after every attempt (6.3s in total)
 
         for attempt in range(MAX_RETRIES):
             try:
                 disk_index = disk_path.replace("\\\\.\\PhysicalDrive", "")
 
-                # Reconnect WMI if needed (helps with stale cache issues, COM is already initialized for this thread)
+                # Have Windows re-read the layout before querying again (the WMI connection stays)
                 if attempt > 0:
-                    logger.info(f"Retry {attempt + 1}/{MAX_RETRIES}: Refreshing WMI connection...")
-                    try:
-                        import wmi
-                        self.disk_manager.wmi = wmi.WMI()
-                    except Exception as wmi_err:
-                        logger.warning(f"Could not refresh WMI connection: {wmi_err}")
-
-                # Query all partitions on this disk
-                partitions = self.disk_manager.wmi.query(
-                    f"SELECT * FROM Win32_DiskPartition WHERE DiskIndex={disk_index}"
-                )
+                    logger.info(f"Retry {attempt + 1}/{MAX_RETRIES}: Refreshing disk layout...")
+                    self.disk_manager.rescan_disk(disk_path)
+
+                # Query all partitions on this disk (retries always see a fresh list)
+                partitions = self._get_partitions(disk_index, max_age=0 if attempt > 0 else 2.0)
 
                 logger.debug(f"Found {len(partitions)} partitions on disk {disk_index}")
 
-                for partition in partitions:
+                for part_start, device_id in partitions:
                     # Check if this partition starts at our target sector
-                    part_start = int(partition.StartingOffset) // SECTOR_SIZE
-
                     logger.debug(f"Checking partition at sector {part_start} (looking for {start_sector})")
 
                     # Allow some tolerance (within 2048 sectors = 1MB)
                     if abs(part_start - start_sector) < 2048:
                         # Get associated logical disk
-                        logical_disks = self.disk_manager.wmi.query(
-                            f"ASSOCIATORS OF {{Win32_DiskPartition.DeviceID='{partition.DeviceID}'}} "
-                            f"WHERE AssocClass=Win32_LogicalDiskToPartition"
-                        )
+                        logical_disks = self._get_logical_disks(device_id)
 
                         if logical_disks:
-                            drive_letter = logical_disks[0].DeviceID
+                            drive_letter = logical_disks[0]
                             logger.info(f"Found drive letter: {drive_letter} for partition at sector {start_sector}")
                             return drive_letter
 
@@ -980,8 +1122,9 @@ remove
 
                 # If no partitions found at all, WMI might need to refresh - retry
                 if attempt < MAX_RETRIES - 1:
-                    logger.info(f"No partitions found on disk {disk_index}, waiting {RETRY_DELAY}s before retry...")
-                    time.sleep(RETRY_DELAY)
+                    delay = RETRY_DELAY * 2 ** attempt
+                    logger.info(f"No partitions found on disk {disk_index}, waiting {delay:.1f}s before retry...")
+                    time.sleep(delay)
                 else:
                     return None
 
@@ -992,8 +1135,9 @@ remove
                 # Check if it's a WMI COM error
                 if "COM Error" in error_str or "-2147352567" in error_str:
                     if attempt < MAX_RETRIES - 1:
-                        logger.info(f"WMI COM error detected, waiting {RETRY_DELAY}s before retry...")
-                        time.sleep(RETRY_DELAY)
+                        delay = RETRY_DELAY * 2 ** attempt
+                        logger.info(f"WMI COM error detected, waiting {delay:.1f}s before retry...")
+                        time.sleep(delay)
                     else:
                         logger.error("WMI COM error persists after all retries")
                         return None
@@ -1008,57 +1152,39 @@ remove
         Alternative method to find drive letter using diskpart
         Used when WMI can't see GPT partitions on hybrid MBR/GPT disks
         """
-        import subprocess
         try:
             disk_index = disk_path.replace("\\\\.\\PhysicalDrive", "")
             logger.info(f"Using diskpart to find partitions on disk {disk_index}...")
 
             # Use diskpart to list all volumes and find FAT32 volumes
-            script = f"""list volume
-exit
-"""
-            process = subprocess.Popen(
-                ['diskpart'],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            stdout, stderr = process.communicate(input=script, timeout=30)
+            stdout = self._diskpart.run("list volume\n", timeout=30)
 
             logger.debug(f"Diskpart output:\n{stdout}")
 
             # Parse diskpart output to find FAT32 volumes
-            # Look for lines like: "  Volume 3     E   SWITCH SD    FAT32   Removable     51 GB  Healthy"
-            import re
-            for line in stdout.split('\n'):
-                # Match volume lines with drive letter
-                match = re.search(r'Volume\s+\d+\s+([A-Z])\s+.*FAT32.*Removable', line, re.IGNORECASE)
-                if match:
-                    drive_letter = match.group(1) + ':'
-                    logger.info(f"Found potential source FAT32 volume: {drive_letter}")
-
-                    # Verify this is the correct disk by checking volume info
-                    # Query detailed info for this volume
-                    verify_script = f"""select volume {match.group(1)}
-detail volume
-exit
-"""
-                    verify_process = subprocess.Popen(
-                        ['diskpart'],
-                        stdin=subprocess.PIPE,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True,
-                        creationflags=subprocess.CREATE_NO_WINDOW
-                    )
-                    verify_out, _ = verify_process.communicate(input=verify_script, timeout=30)
+            candidates = {}
+            for match in _DISKPART_FAT32_VOLUME.finditer(stdout):
+                candidates[match.group(1)] = match.group(2) + ':'
+                logger.info(f"Found potential source FAT32 volume: {match.group(2)}:")
+
+            if not candidates:
+                logger.warning(f"Could not find FAT32 volume on disk {disk_index} using diskpart")
+                return None
+
+            # Verify which candidate is on the correct disk with one diskpart run for all of them
+            verify_script = "".join(
+                f"select volume {number}\ndetail volume\n" for number in candidates
+            )
+            verify_out = self._diskpart.run(verify_script, timeout=30)
 
-                    # Check if this volume is on the correct disk
-                    if f"Disk {disk_index}" in verify_out:
-                        logger.info(f"Confirmed {drive_letter} is on disk {disk_index}")
-                        return drive_letter
+            # split() yields [preamble, number, details, number, details, ...]
+            sections = _DISKPART_SELECTED_VOLUME.split(verify_out)
+            on_disk = re.compile(rf'\bDisk {disk_index}\b')
+            for number, details in zip(sections[1::2], sections[2::2]):
+                if number in candidates and on_disk.search(details):
+                    drive_letter = candidates[number]
+                    logger.info(f"Confirmed {drive_letter} is on disk {disk_index}")
+                    return drive_letter
 
             logger.warning(f"Could not find FAT32 volume on disk {disk_index} using diskpart")
             return None
@@ -1072,6 +1198,13 @@ exit
 
     def _refresh_disk_partitions(self, disk_path):
         """Refresh disk to make new partitions visible to Windows"""
+        self._invalidate_partition_cache()
+
+        if self.disk_manager.rescan_disk(disk_path):
+            logger.info("Disk partitions refreshed")
+            return
+
+        # Fall back to diskpart if the IOCTL isn't available
         try:
             disk_index = disk_path.replace("\\\\.\\PhysicalDrive", "")
 
@@ -1079,14 +1212,7 @@ exit
 rescan
 """
 
-            subprocess.run(
-                ['diskpart'],
-                input=diskpart_script,
-                capture_output=True,
-                text=True,
-                timeout=10,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            self._diskpart.run(diskpart_script, timeout=10)
 
             logger.info("Disk partitions refreshed")
 
@@ -1094,14 +1220,11 @@ rescan
             logger.warning(f"Could not refresh disk partitions: {e}")
 
     def _copy_files_simple(self, source_drive, target_drive, stage_name, base_progress, progress_range=60):
-        """Copy files using simple Python shutil - more reliable than robocopy
+        """Copy files with the Windows CopyFileEx kernel copy path - more reliable than robocopy
 
         Args:
             progress_range: Total progress range allocated for file copy (default 60)
         """
-        import os
-        from pathlib import Path
-
         # Ensure drive letters are properly formatted (e.g., "G:\" or "G:/")
         # Don't strip the colon - only strip trailing backslashes
         source = Path(source_drive.rstrip('\\') + '\\')
@@ -1117,89 +1240,118 @@ rescan
         if not source.is_dir():
             raise Exception(f"Source path is not a directory: {source}")
 
-        # Count total files first for better progress reporting
+        # Scan once: directories to create and files to copy, with sizes from the directory listing
         logger.info(f"Scanning source directory for files...")
+        target_dirs, copy_list, skipped_files = self._scan_copy_tree(str(source), str(target))
+        total_files = len(copy_list)
+        total_bytes = sum(file_size for _, _, file_size in copy_list)
 
-        # Define system folders/files to exclude (anything starting with dot)
-        def should_skip(name):
-            """Skip hidden files/folders (those starting with dot)"""
-            return name.startswith('.')
-
-        # Count files, excluding hidden/system files and folders
-        total_files = 0
-        for root, dirs, files in os.walk(source):
-            # Remove hidden directories from dirs list to prevent os.walk from entering them
-            dirs[:] = [d for d in dirs if not should_skip(d)]
-            # Count only non-hidden files
-            total_files += sum(1 for f in files if not should_skip(f))
-
-        logger.info(f"Found {total_files} files to copy (excluding hidden/system files)")
+        logger.info(f"Found {total_files} files to copy, {total_bytes / (1024**3):.2f} GB (excluding hidden/system files)")
 
         start_time = time.time()
         files_copied = 0
         bytes_copied = 0
-        skipped_files = 0
         failed_files = []
+        stats_lock = threading.Lock()
+
+        def progress_routine(total_size, transferred, stream_size, stream_transferred,
+                             stream_number, reason, source_file, target_file, data):
+            # Only installed for large files, so a cancel doesn't wait for the whole file
+            return win32file.PROGRESS_CANCEL if self.cancelled else win32file.PROGRESS_CONTINUE
+
+        def copy_file(source_file, target_file, file_size):
+            nonlocal files_copied, bytes_copied
+            if self.cancelled:
+                return
+
+            try:
+                # Copy file (data, attributes and timestamps) inside the kernel
+                if file_size >= UNBUFFERED_COPY_MIN_SIZE:
+                    win32file.CopyFileEx(source_file, target_file, progress_routine, None, False,
+                                         COPY_FILE_NO_BUFFERING)
+                else:
+                    win32file.CopyFileEx(source_file, target_file, None, None, False, 0)
+            except Exception as e:
+                if self.cancelled:
+                    return
+                # Log error but continue with other files (non-fatal)
+                logger.error(f"Failed to copy {source_file}: {e}")
+                with stats_lock:
+                    failed_files.append(source_file)
+                return
+
+            with stats_lock:
+                files_copied += 1
+                bytes_copied += file_size
+
+        # Use 90% of the range for actual copying, reserve 10% for completion
+        progress_scale = progress_range * 0.9
+        last_report = [0.0]
+        last_log = [0.0]
+
+        # Progress follows bytes, so a few large files don't leave the bar stalled; file counts
+        # are only used when every file is empty. The divisor is settled once, here.
+        count_bytes = total_bytes > 0
+        inv_total = 1.0 / (total_bytes if count_bytes else max(total_files, 1))
+
+        def report_progress():
+            # Wall-clock throttle: back-to-back large files don't each cost a log line and GUI update
+            now = time.monotonic()
+            if now - last_report[0] < PROGRESS_POLL_INTERVAL:
+                return
+            last_report[0] = now
+
+            with stats_lock:
+                copied, copied_bytes = files_copied, bytes_copied
+
+            elapsed = time.time() - start_time
+            speed_mbps = (copied_bytes / (1024 * 1024)) / elapsed if elapsed > 0 else 0
+            fraction = (copied_bytes if count_bytes else copied) * inv_total
+            percent_complete = fraction * 100
+            if now - last_log[0] >= PROGRESS_LOG_INTERVAL:
+                last_log[0] = now
+                logger.info(f"Copied {copied}/{total_files} files ({percent_complete:.1f}%), {copied_bytes / (1024**3):.2f} GB at {speed_mbps:.1f} MB/s")
+
+            # Calculate progress within allocated range
+            file_progress = fraction * progress_scale
+            current_progress = base_progress + file_progress
+            # Cap at 100% to prevent overflow
+            current_progress = min(100, current_progress)
+            self._report_progress(stage_name, current_progress,
+                                f"Copied {copied}/{total_files} files ({percent_complete:.0f}%)")
+
+        small_files = [item for item in copy_list if item[2] < PARALLEL_COPY_MAX_SIZE]
+        large_files = [item for item in copy_list if item[2] >= PARALLEL_COPY_MAX_SIZE]
+        logger.info(f"Copying {len(small_files)} files with {FILE_COPY_WORKERS} workers, "
+                    f"{len(large_files)} large files sequentially")
 
         try:
-            # Walk through source directory
-            for root, dirs, files in os.walk(source):
-                # Skip hidden directories (modify dirs in-place to prevent os.walk from entering them)
-                original_dirs = dirs[:]
-                dirs[:] = [d for d in dirs if not should_skip(d)]
-
-                # Log skipped directories
-                skipped_dirs = set(original_dirs) - set(dirs)
-                if skipped_dirs:
-                    for skipped_dir in skipped_dirs:
-                        logger.info(f"Skipping hidden/system directory: {Path(root) / skipped_dir}")
-
-                # Calculate relative path
-                rel_path = Path(root).relative_to(source)
-                target_dir = target / rel_path
-
-                # Create target directory if it doesn't exist
-                target_dir.mkdir(parents=True, exist_ok=True)
-
-                # Copy each file (skip hidden files)
-                for file in files:
-                    # Skip hidden/system files
-                    if should_skip(file):
-                        skipped_files += 1
-                        logger.debug(f"Skipping hidden/system file: {Path(root) / file}")
-                        continue
-                    if self.cancelled:
-                        raise Exception("Migration cancelled by user")
+            # Create the whole directory tree before the file pass; the scan lists parents
+            # before their children, so a plain mkdir per directory is enough
+            for target_dir in target_dirs:
+                try:
+                    os.mkdir(target_dir)
+                except FileExistsError:
+                    pass
 
-                    source_file = Path(root) / file
-                    target_file = target_dir / file
+            executor = ThreadPoolExecutor(max_workers=FILE_COPY_WORKERS)
+            try:
+                pending = {executor.submit(copy_file, *item) for item in small_files}
+                while pending and not self.cancelled:
+                    _, pending = wait(pending, timeout=MIN_PROGRESS_INTERVAL)
+                    report_progress()
 
-                    try:
-                        # Copy file
-                        shutil.copy2(source_file, target_file)
-                        files_copied += 1
-                        bytes_copied += source_file.stat().st_size
-
-                        # Update progress every 10 files or every 100MB
-                        if files_copied % 10 == 0 or (bytes_copied // (100 * 1024 * 1024)) > ((bytes_copied - source_file.stat().st_size) // (100 * 1024 * 1024)):
-                            elapsed = time.time() - start_time
-                            speed_mbps = (bytes_copied / (1024 * 1024)) / elapsed if elapsed > 0 else 0
-                            percent_complete = (files_copied / total_files * 100) if total_files > 0 else 0
-                            logger.info(f"Copied {files_copied}/{total_files} files ({percent_complete:.1f}%), {bytes_copied / (1024**3):.2f} GB at {speed_mbps:.1f} MB/s")
-
-                            # Calculate progress within allocated range
-                            # Use 90% of the range for actual copying, reserve 10% for completion
-                            file_progress = (files_copied / total_files * progress_range * 0.9) if total_files > 0 else 0
-                            current_progress = base_progress + file_progress
-                            # Cap at 100% to prevent overflow
-                            current_progress = min(100, current_progress)
-                            self._report_progress(stage_name, current_progress,
-                                                f"Copied {files_copied}/{total_files} files ({percent_complete:.0f}%)")
-                    except Exception as e:
-                        # Log error but continue with other files (non-fatal)
-                        logger.error(f"Failed to copy {source_file}: {e}")
-                        failed_files.append(str(source_file))
-                        # Continue to next file instead of raising
+                # Large files run one at a time on this thread once the pool has drained
+                for item in large_files:
+                    if self.cancelled:
+                        break
+                    copy_file(*item)
+                    report_progress()
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+            if self.cancelled:
+                raise Exception("Migration cancelled by user")
 
             elapsed_time = time.time() - start_time
             mb_copied = bytes_copied / (1024 * 1024)
@@ -1236,6 +1388,46 @@ rescan
             logger.error(f"File copy error: {e}")
             raise
 
+    def _scan_copy_tree(self, source, target):
+        """
+        Walk the source tree with os.scandir, skipping hidden entries (names starting with a dot)
+
+        Returns (target_dirs, copy_list, skipped_files) where target_dirs lists
+        the directories to create under target, each once and parents first,
+        and copy_list holds (source_file, target_file, size) tuples. Sizes come
+        from the directory listing, so no file is stat'ed separately.
+        """
+        target_dirs = []
+        copy_list = []
+        skipped_files = 0
+
+        pending = [(source, target)]
+        while pending:
+            source_dir, target_dir = pending.pop()
+
+            with os.scandir(source_dir) as entries:
+                for entry in entries:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+
+                    # Skip hidden/system files and folders
+                    if entry.name.startswith('.'):
+                        if is_dir:
+                            logger.info(f"Skipping hidden/system directory: {entry.path}")
+                        else:
+                            # Counted only; the total is logged once after the copy
+                            skipped_files += 1
+                        continue
+
+                    if is_dir:
+                        child_dir = os.path.join(target_dir, entry.name)
+                        target_dirs.append(child_dir)
+                        pending.append((entry.path, child_dir))
+                    else:
+                        copy_list.append((entry.path, os.path.join(target_dir, entry.name),
+                                          entry.stat(follow_symlinks=False).st_size))
+
+        return target_dirs, copy_list, skipped_files
+
     def _copy_files_robocopy(self, source_drive, target_drive, stage_name, base_progress):
         """Copy files using robocopy with progress tracking"""
 
@@ -1273,18 +1465,17 @@ rescan
         self._report_progress(stage_name, base_progress, "Scanning source files...")
 
         try:
+            # Bytes written are measured as the drop in the target's free space
+            initial_free = shutil.disk_usage(target + '\\').free
+
             # Run robocopy with real-time output
             start_time = time.time()
             process = subprocess.Popen(
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
                 creationflags=subprocess.CREATE_NO_WINDOW,
-                bufsize=1,  # Line buffered
-                universal_newlines=True
+                bufsize=1 << 16  # Binary reads - no per-line text decoding
             )
 
             # Track progress by monitoring output
@@ -1292,28 +1483,32 @@ rescan
             dirs_created = 0
             bytes_copied = 0
             last_progress_time = start_time
-            last_file = ""
+            last_file = b""
+            last_log = start_time
             monitor_running = [True]  # Shared flag for monitor thread
 
             logger.info("Robocopy started with optimized settings...")
 
             # Start a background thread to monitor target directory and provide heartbeat
             def monitor_target():
-                """Background thread to monitor target directory for progress"""
-                last_count = 0
+                """Background thread to monitor target free space for progress"""
+                last_written = 0
                 while monitor_running[0] and process.poll() is None:
                     try:
-                        # Count files in target directory
-                        file_count = sum(1 for _ in Path(target).rglob('*') if _.is_file())
+                        # One GetDiskFreeSpaceEx call instead of walking the target tree,
+                        # which would compete with robocopy for the card
+                        bytes_written = max(0, initial_free - shutil.disk_usage(target + '\\').free)
+                        mb_written = bytes_written / (1024 * 1024)
 
-                        if file_count != last_count:
-                            logger.info(f"Target directory now has {file_count} files")
-                            last_count = file_count
+                        if bytes_written != last_written:
+                            logger.info(f"Target now has {mb_written:.1f} MB written")
+                            last_written = bytes_written
 
                         # Update progress
                         elapsed = time.time() - start_time
+                        speed_mbps = mb_written / elapsed if elapsed > 0 else 0
                         self._report_progress(stage_name, base_progress + 5,
-                                            f"Copying... {file_count} files so far ({elapsed:.0f}s)")
+                                            f"Copying... {mb_written:.0f} MB so far at {speed_mbps:.1f} MB/s ({elapsed:.0f}s)")
                     except Exception as e:
                         logger.debug(f"Monitor thread error: {e}")
 
@@ -1323,60 +1518,46 @@ rescan
             monitor_thread.start()
 
             # Read output line by line in real-time
-            for line in process.stdout:
+            for line in iter(process.stdout.readline, b''):
                 line = line.strip()
 
                 if not line:
                     continue
 
+                # Summary rows all start with D, F or B; only those lines reach the regex
+                summary = _ROBOCOPY_SUMMARY_LINE.match(line) if line[:1] in b'DFB' else None
+
+                if summary:
+                    logger.info(f"Robocopy summary: {line.decode(ROBOCOPY_ENCODING, 'replace')}")
+                    kind, total = summary.group(1), int(summary.group(2))
+                    if kind == b'Dirs':
+                        dirs_created = total
+                    elif kind == b'Files':
+                        # Use the summary count if it's higher (more accurate)
+                        files_copied = max(files_copied, total)
+                    else:
+                        bytes_copied = total
+
                 # Check if this line indicates a file being copied
                 # Robocopy with default output shows files in various formats
-                if line.startswith('New File') or line.startswith('Newer') or (line and '\\' in line and not line.startswith('-') and not line.startswith('Total')):
+                elif (b'\\' in line and not line.startswith((b'-', b'Total'))) or line.startswith((b'New File', b'Newer')):
                     # This is likely a file operation
                     files_copied += 1
                     last_file = line
 
                     # Log periodically
                     if files_copied % 50 == 0:
-                        logger.info(f"Copied {files_copied} files...")
-
-                # Parse summary lines
-                elif line.startswith('Dirs :'):
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        try:
-                            dirs_created = int(parts[2])
-                            logger.info(f"Robocopy summary: {line}")
-                        except ValueError:
-                            pass
-
-                elif line.startswith('Files :'):
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        try:
-                            files_total = int(parts[2])
-                            logger.info(f"Robocopy summary: {line}")
-                            # Use the summary count if it's higher (more accurate)
-                            if files_total > files_copied:
-                                files_copied = files_total
-                        except ValueError:
-                            pass
-
-                elif line.startswith('Bytes :'):
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        try:
-                            bytes_copied = int(parts[2])
-                            logger.info(f"Robocopy summary: {line}")
-                        except ValueError:
-                            pass
-
-                elif 'Error' in line or 'ERROR' in line or 'Failed' in line:
-                    logger.warning(f"Robocopy warning: {line}")
+                        now = time.time()
+                        if now - last_log >= PROGRESS_LOG_INTERVAL:
+                            last_log = now
+                            logger.info(f"Copied {files_copied} files...")
+
+                elif b'Error' in line or b'ERROR' in line or b'Failed' in line:
+                    logger.warning(f"Robocopy warning: {line.decode(ROBOCOPY_ENCODING, 'replace')}")
 
                 # Log all output for debugging
                 else:
-                    logger.debug(f"Robocopy output: {line}")
+                    logger.debug(f"Robocopy output: {line.decode(ROBOCOPY_ENCODING, 'replace')}")
 
             # Wait for process to complete (no timeout - large migrations can take hours)
             process.wait()
@@ -1387,7 +1568,7 @@ rescan
             elapsed_time = time.time() - start_time
 
             # Check stderr for errors
-            stderr_output = process.stderr.read()
+            stderr_output = process.stderr.read().decode(ROBOCOPY_ENCODING, 'replace')
             if stderr_output:
                 logger.warning(f"Robocopy stderr: {stderr_output}")
 
@@ -1432,11 +1613,16 @@ rescan
         # Refresh disk to make new partitions visible to Windows
         logger.info("Refreshing disk to make partitions visible...")
         self._refresh_disk_partitions(self.target_disk['path'])
-        time.sleep(2)  # Give Windows time to recognize new partitions
+        # Give Windows time to recognize new partitions (hybrid MBR/GPT layouts may
+        # never list every partition through WMI, so this is bounded rather than required)
+        deadline = time.monotonic() + 2.0
+        for partition in self.target_layout.partitions:
+            self._wait_for_partition_visible(partition.start_sector,
+                                             timeout=max(0, deadline - time.monotonic()))
 
         self._report_progress("Writing Partition Tables", 15, "Partition table written")
 
-    def _write_emummc_efi_signature(self, emummc_partition):
+    def _write_emummc_efi_signature(self, emummc_partition, source_emummc=None):
         """
         Write EFI signature at the correct offset within emuMMC partition
         for hekate's "Fix Raw" detection to work
@@ -1457,7 +1643,9 @@ rescan
         2. If found, copy to target
         3. If not found, try to find it in already-copied target data
         4. If still not found, create minimal valid GPT header
-        
+
+        source_emummc is the matching source emuMMC partition, if the source has one.
+
         Returns: The detected offset (0xC001 or 0x4001) for use in emummc.ini calculation
         """
         detected_offset = 0xC001  # Default offset
@@ -1470,13 +1658,6 @@ rescan
 
             target_partition_start = emummc_partition.start_sector
 
-            # Find source emuMMC partition
-            source_emummc = None
-            for part in self.source_layout.partitions:
-                if part.category == 'emuMMC':
-                    source_emummc = part
-                    break
-
             gpt_header_to_write = None
             gpt_entries_to_write = None
 
@@ -1492,28 +1673,30 @@ rescan
                 logger.info(f"Step 1: Reading GPT from SOURCE emuMMC at physical sector {source_gpt_sector} (0x{source_gpt_sector:X})")
 
                 try:
-                    source_gpt_data = self.disk_manager.read_sectors(
+                    # Header and the 32 sectors of partition entries that follow it in one read,
+                    # together with the MBR sector in front of it that the MBR heuristic checks first
+                    source_probe = self.disk_manager.read_sectors(
                         self.source_disk['path'],
-                        source_gpt_sector,
-                        1
+                        source_gpt_sector - 1,
+                        34
                     )
+                    source_mbr_data = source_probe[:SECTOR_SIZE]
+                    source_gpt_data = source_probe[SECTOR_SIZE:]
 
                     if source_gpt_data[:8] == b'EFI PART':
                         logger.info("✓ Found valid EFI signature in SOURCE at physical offset 0x14001")
-                        gpt_header_to_write = source_gpt_data
+                        gpt_header_to_write = source_gpt_data[:SECTOR_SIZE]
                         detected_offset = physical_gpt_offset  # Store physical offset from partition start
 
-                        # Read GPT partition entries (32 sectors after header)
-                        logger.info("Reading GPT partition entries from source (32 sectors)...")
-                        gpt_entries_to_write = self.disk_manager.read_sectors(
-                            self.source_disk['path'],
-                            source_gpt_sector + 1,
-                            32
-                        )
+                        # GPT partition entries (32 sectors after header)
+                        gpt_entries_to_write = source_gpt_data[SECTOR_SIZE:]
                         logger.info(f"✓ Read {len(gpt_entries_to_write)} bytes of GPT partition entries")
                     else:
                         logger.info("✗ No EFI signature at expected physical GPT offset 0x14001; attempting MBR heuristic...")
-                        detected_offset = self._detect_emummc_offset_by_mbr(source_emummc.start_sector)
+                        detected_offset = self._detect_emummc_offset_by_mbr(
+                            source_emummc.start_sector,
+                            known_sectors={physical_gpt_offset - 1: source_mbr_data}
+                        )
                         logger.info(f"Detected offset from MBR heuristic: 0x{detected_offset:X}")
 
                 except Exception as e:
@@ -1562,36 +1745,30 @@ rescan
                 # Use target partition size to build dynamic GPT (emuMMC total sectors)
                 gpt_header_to_write = self._create_minimal_gpt_header(emummc_partition.size_sectors)
 
-            # STEP 4: Write GPT header to target at detected offset
+            # STEP 4+5: Write GPT header to target at detected offset, followed by the
+            # partition entries (if we have them from source OR generated them) in the same write
             target_gpt_sector = target_partition_start + detected_offset
             logger.info(f"Step 4: Writing GPT header to target sector {target_gpt_sector} (0x{target_gpt_sector:X})")
 
+            gpt_data_to_write = gpt_header_to_write
+            if gpt_entries_to_write:
+                logger.info(f"Step 5: Writing GPT partition entries from SOURCE (32 sectors)...")
+                gpt_data_to_write = gpt_header_to_write + gpt_entries_to_write
+            elif hasattr(self, 'generated_gpt_entries'):
+                # We generated partition entries because source didn't have them
+                logger.info(f"Step 5: Writing GENERATED Switch NAND partition entries (32 sectors)...")
+                gpt_data_to_write = gpt_header_to_write + self.generated_gpt_entries
+
             self.disk_manager.write_sectors(
                 self.target_disk['path'],
                 target_gpt_sector,
-                gpt_header_to_write,
+                gpt_data_to_write,
                 skip_prepare=True
             )
-            
-            # STEP 5: Write GPT partition entries (if we have them from source OR generated them)
+
             if gpt_entries_to_write:
-                logger.info(f"Step 5: Writing GPT partition entries from SOURCE (32 sectors)...")
-                self.disk_manager.write_sectors(
-                    self.target_disk['path'],
-                    target_gpt_sector + 1,
-                    gpt_entries_to_write,
-                    skip_prepare=True
-                )
                 logger.info("✓ Successfully wrote GPT partition entries from source")
             elif hasattr(self, 'generated_gpt_entries'):
-                # We generated partition entries because source didn't have them
-                logger.info(f"Step 5: Writing GENERATED Switch NAND partition entries (32 sectors)...")
-                self.disk_manager.write_sectors(
-                    self.target_disk['path'],
-                    target_gpt_sector + 1,
-                    self.generated_gpt_entries,
-                    skip_prepare=True
-                )
                 logger.info("✓ Successfully wrote GENERATED GPT partition entries")
                 logger.info("✓ TegraExplorer should now see: PRODINFO, PRODINFOF, SAFE, SYSTEM, USER, etc.")
 
@@ -1607,7 +1784,7 @@ rescan
             # Don't fail the migration, just log the error
             return 0xC001  # Return default offset
 
-    def _detect_emummc_offset_by_mbr(self, partition_start_sector: int) -> int:
+    def _detect_emummc_offset_by_mbr(self, partition_start_sector: int, known_sectors: dict = None) -> int:
         """
         Detect emuMMC offset by searching for the MBR signature (0x55AA) at known offsets.
         
@@ -1618,6 +1795,9 @@ rescan
         - MBR at offset 0xC000 or 0x8000 from BOOT0 start
         - GPT at offset 0xC001 or 0x4001 from BOOT0 start (if exists)
         
+        known_sectors maps offsets (from partition start) to sector data the caller already
+        read, so those MBR candidates are checked without another read.
+
         Returns: Detected offset (0x0, 0x4001, or 0xC001)
         """
         logger.info(f"Searching for MBR in emuMMC partition starting at sector {partition_start_sector}...")
@@ -1637,11 +1817,13 @@ rescan
                 mbr_sector = partition_start_sector + mbr_offset
                 logger.info(f"  Checking MBR at offset 0x{mbr_offset:X} ({description})...")
                 
-                mbr_data = self.disk_manager.read_sectors(
-                    self.source_disk['path'],
-                    mbr_sector,
-                    1
-                )
+                mbr_data = (known_sectors or {}).get(mbr_offset)
+                if mbr_data is None:
+                    mbr_data = self.disk_manager.read_sectors(
+                        self.source_disk['path'],
+                        mbr_sector,
+                        1
+                    )
                 
                 # Check for MBR signature 0x55AA at offset 510-511
                 if len(mbr_data) >= 512 and mbr_data[510:512] == b'\x55\xAA':
@@ -1732,40 +1914,28 @@ rescan
              0x9CC000, min(0x1D3FFFF, max_lba), 0x0000000000000000),
         ]
         
-        # Create partition entries array (128 entries × 128 bytes = 16384 bytes = 32 sectors)
-        entries = bytearray(128 * 128)
+        import hashlib
+
+        # Create partition entries array (128 entries × 128 bytes = 16384 bytes = 32 sectors);
+        # each entry is packed straight into it, unused entries stay zero
+        entries = bytearray(128 * _GPT_ENTRY.size)
         
         logger.info(f"Creating {len(switch_partitions)} Switch NAND GPT partition entries...")
         
         for idx, (name, type_guid_bytes, start_lba, end_lba, attributes) in enumerate(switch_partitions):
-            entry_offset = idx * 128
-            entry = bytearray(128)
-            
-            # Type GUID (16 bytes) - Use actual Switch partition type GUIDs
-            entry[0:16] = type_guid_bytes
-            
-            # Unique partition GUID (16 bytes) - Generate unique GUID for each partition
-            # Format: first 8 bytes from name hash, last 8 bytes from index
-            import hashlib
+            # Unique partition GUID - first 8 bytes from name hash, last 8 bytes from index
             name_hash = hashlib.sha256(name.encode('utf-8')).digest()[:8]
-            unique_guid = name_hash + struct.pack('<Q', idx)
-            entry[16:32] = unique_guid
-            
-            # Starting LBA (8 bytes)
-            entry[32:40] = struct.pack('<Q', start_lba)
-            
-            # Ending LBA (8 bytes)
-            entry[40:48] = struct.pack('<Q', end_lba)
-            
-            # Attributes (8 bytes)
-            entry[48:56] = struct.pack('<Q', attributes)
-            
-            # Partition name (72 bytes, UTF-16LE)
-            name_utf16 = name.encode('utf-16le')[:72].ljust(72, b'\x00')
-            entry[56:128] = name_utf16
-            
-            # Copy entry into main entries array
-            entries[entry_offset:entry_offset + 128] = entry
+            unique_guid = name_hash + idx.to_bytes(8, 'little')
+
+            _GPT_ENTRY.pack_into(
+                entries, idx * _GPT_ENTRY.size,
+                type_guid_bytes,                # Type GUID - actual Switch partition type GUIDs
+                unique_guid,                    # Unique partition GUID
+                start_lba,                      # Starting LBA
+                end_lba,                        # Ending LBA
+                attributes,                     # Attributes
+                name.encode('utf-16le')[:72]    # Partition name (72 bytes, UTF-16LE)
+            )
             
             size_mb = ((end_lba - start_lba + 1) * 512) // (1024 * 1024)
             logger.info(f"  [{idx}] {name:30s} LBA 0x{start_lba:08X} - 0x{end_lba:08X} ({size_mb:6d} MB)")
@@ -1817,30 +1987,6 @@ rescan
         # Create the partition entries first so we can calculate their CRC
         self.generated_gpt_entries = self._create_switch_nand_gpt_entries(max_lba=max_user_lba)
 
-        # Create 512-byte sector
-        header = bytearray(512)
-
-        # GPT Header structure (first 92 bytes are defined, rest is reserved/zero)
-        # Offset 0-7: Signature "EFI PART"
-        header[0:8] = b'EFI PART'
-
-        # Offset 8-11: Revision (1.0) = 0x00010000
-        header[8:12] = struct.pack('<I', 0x00010000)
-
-        # Offset 12-15: Header size = 92 bytes
-        header[12:16] = struct.pack('<I', 92)
-
-        # Offset 16-19: CRC32 of header (calculated later)
-        header[16:20] = struct.pack('<I', 0)
-
-        # Offset 20-23: Reserved (must be zero)
-        header[20:24] = struct.pack('<I', 0)
-
-        # Offset 24-31: Current LBA (location of this header)
-        # In emuMMC context, GPT is at sector 0xC001 relative to BOOT0
-        # This is the LBA within the emuMMC "disk", not the SD card absolute sector
-        header[24:32] = struct.pack('<Q', 0xC001)
-
         # Compute logical USER region size (exclude protective gap before BOOT0)
         # emummc_partition_sectors includes protective area; logical usable begins after protective_offset.
         logical_sectors = max(0, emummc_partition_sectors - protective_offset)
@@ -1848,41 +1994,43 @@ rescan
         # We keep values relative to the emuMMC "disk" whose LBA 0 = BOOT0 start + (C000 - protective_offset) nuance
         # For minimal compatibility we set alt_lba to logical_sectors - 1 if large enough, else a safe minimum.
         alt_lba = logical_sectors - 1 if logical_sectors > 34 else 34
-        header[32:40] = struct.pack('<Q', alt_lba)
-
-        # Offset 40-47: First usable LBA for partitions = 34
-        # (1 MBR + 1 GPT header + 32 sectors for partition entries)
-        # This is relative to the emuMMC "disk", so it's from the start of the USER partition (0xC000)
-        header[40:48] = struct.pack('<Q', 0xC000 + 34)
 
-        # Offset 48-55: Last usable LBA (one before backup header minus 33 for entries/header space)
+        # Last usable LBA: one before backup header minus 33 for entries/header space
         last_use_lba = alt_lba - 33 if alt_lba > 33 else alt_lba
-        header[48:56] = struct.pack('<Q', last_use_lba)
 
-        # Offset 56-71: Disk GUID (16 bytes, random)
-        # Use a recognizable pattern for NXMigratorPro: "NXMigratorProGPT"
+        # Disk GUID: a recognizable pattern for NXMigratorPro
         disk_guid = b'NXMigratorProGPT'
-        header[56:72] = disk_guid
-
-        # Offset 72-79: Starting LBA of partition entries = 2
-        # Partition entries start right after GPT header (0xC001 + 1 = 0xC002)
-        header[72:80] = struct.pack('<Q', 0xC002)
-
-        # Offset 80-83: Number of partition entries
-        # Standard is 128, but we'll use minimum needed for Switch (around 32)
-        header[80:84] = struct.pack('<I', 128)
-
-        # Offset 84-87: Size of a single partition entry = 128 bytes
-        header[84:88] = struct.pack('<I', 128)
 
-        # Offset 88-91: CRC32 of partition entries array
         # Calculate CRC of the actual partition entries we created
         entries_crc = zlib.crc32(self.generated_gpt_entries) & 0xFFFFFFFF
-        header[88:92] = struct.pack('<I', entries_crc)
+
+        # Create 512-byte sector; the first 92 bytes are defined, the rest is reserved/zero
+        header = bytearray(512)
+        _GPT_HEADER.pack_into(
+            header, 0,
+            b'EFI PART',            # Signature
+            0x00010000,             # Revision 1.0
+            92,                     # Header size
+            0,                      # Header CRC32 (calculated below)
+            0,                      # Reserved (must be zero)
+            # Current LBA: GPT is at sector 0xC001 relative to BOOT0 - the LBA
+            # within the emuMMC "disk", not the SD card absolute sector
+            0xC001,
+            alt_lba,                # Backup GPT header LBA
+            # First usable LBA: 34 sectors (1 MBR + 1 GPT header + 32 sectors for
+            # partition entries) from the start of the USER partition (0xC000)
+            0xC000 + 34,
+            last_use_lba,           # Last usable LBA
+            disk_guid,              # Disk GUID
+            0xC002,                 # Partition entries start right after the GPT header
+            128,                    # Number of partition entries
+            128,                    # Size of a single partition entry
+            entries_crc             # CRC32 of partition entries array
+        )
 
         # Calculate CRC32 of header (bytes 0-91)
-        header_crc = zlib.crc32(bytes(header[0:92])) & 0xFFFFFFFF
-        header[16:20] = struct.pack('<I', header_crc)
+        header_crc = zlib.crc32(memoryview(header)[:_GPT_HEADER.size]) & 0xFFFFFFFF
+        _GPT_HEADER_CRC.pack_into(header, 16, header_crc)
 
         logger.info("Created complete GPT header with Switch NAND partitions:")
         logger.info(f"  Signature: {header[0:8]}")
@@ -1910,29 +2058,28 @@ rescan
 
         # First, write the EFI signature at the correct offset for hekate's Fix Raw detection
         # This also detects the actual offset used in the source emuMMC
-        detected_offset = self._write_emummc_efi_signature(target_emummc[0])
+        detected_offset = self._write_emummc_efi_signature(target_emummc[0], source_emummc[0])
 
         # Need to create/update hekate emuMMC configuration
         self._report_progress("Updating emuMMC Config", 96, "Creating hekate emuMMC configuration...")
 
         try:
             # Get the target FAT32 drive letter
-            fat32_part = None
-            for part in self.target_layout.partitions:
-                if part.category == 'FAT32':
-                    fat32_part = part
-                    break
+            fat32_part = self.target_layout.get_fat32_partition()
 
             if not fat32_part:
                 logger.error("Cannot find FAT32 partition to update emuMMC config")
                 self._report_progress("Updating emuMMC Config", 97, "⚠️ Could not find FAT32 partition")
                 return
 
-            # Get drive letter for target FAT32 partition
-            drive_letter = self._get_drive_letter_for_partition(
-                self.target_disk['path'],
-                fat32_part.start_sector
-            )
+            # Reuse the letter locked while formatting if it is still mounted; only
+            # look it up through WMI when it is gone
+            drive_letter = getattr(self, 'target_fat32_drive', None)
+            if not drive_letter or not os.path.exists(drive_letter.rstrip('\\') + '\\'):
+                drive_letter = self._get_drive_letter_for_partition(
+                    self.target_disk['path'],
+                    fat32_part.start_sector
+                )
 
             if not drive_letter:
                 logger.error("FAT32 partition not mounted - cannot create emuMMC config")
@@ -2013,8 +2160,7 @@ rescan
             # Determine which RAW folder to use (RAW1, RAW2, or RAW3)
             # Based on which MBR partition the emuMMC is in
             # For now, we'll use RAW1 as default
-            raw_folder_name = "RAW1"
-            raw_folder_path = emummc_path / raw_folder_name
+            raw_folder_path = emummc_path / RAW_FOLDER_NAME
 
             # Create RAW folder
             raw_folder_path.mkdir(exist_ok=True)
@@ -2023,31 +2169,18 @@ rescan
             # Create raw_based file with the sector offset
             # This file contains a 4-byte little-endian integer of the sector value for emummc.ini
             raw_based_file = raw_folder_path / "raw_based"
-            with open(raw_based_file, 'wb') as f:
-                # Write sector as 4-byte little-endian integer
-                f.write(emummc_ini_sector.to_bytes(4, byteorder='little'))
+            raw_based_file.write_bytes(emummc_ini_sector.to_bytes(4, byteorder='little'))
             logger.info(f"Created raw_based file at {raw_based_file} with sector: 0x{emummc_ini_sector:x}")
 
             # Create emummc.ini file for hekate
-            # The id field should be the RAW folder name encoded as hex (e.g., "RAW1" = 0x31574152)
-            # Calculate id from folder name: "RAW1" = 0x31 0x57 0x41 0x31 (little-endian ASCII)
-            folder_id = int.from_bytes(raw_folder_name.encode('ascii')[:4].ljust(4, b'\x00'), byteorder='little')
-
+            # The id field is the RAW folder name encoded as hex ("RAW1" = 0x31574152)
             emummc_ini_path = emummc_path / "emummc.ini"
-            ini_content = (
-                "[emummc]\n"
-                "enabled=1\n"
-                f"sector=0x{emummc_ini_sector:X}\n"
-                f"id=0x{folder_id:X}\n"
-                f"path=emuMMC/{raw_folder_name}\n"
-                f"nintendo_path=emuMMC/{raw_folder_name}/Nintendo\n"
-            )
+            ini_content = EMUMMC_INI_TEMPLATE % (emummc_ini_sector, RAW_FOLDER_ID)
 
-            with open(emummc_ini_path, 'w', encoding='utf-8') as f:
-                f.write(ini_content)
+            emummc_ini_path.write_bytes(ini_content)
 
             logger.info(f"Created emummc.ini at {emummc_ini_path}")
-            logger.info(f"emuMMC configuration:\n{ini_content}")
+            logger.info(f"emuMMC configuration:\n{ini_content.decode('ascii')}")
 
             self._report_progress("Updating emuMMC Config", 99, "✓ emuMMC config created successfully")
             logger.info("Successfully created hekate emuMMC configuration")
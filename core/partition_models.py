@@ -3,9 +3,26 @@ Partition Data Models
 """
 
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional
 from enum import Enum
 
+# 2048 512-byte sectors per MB: sectors >> 11 is sectors * 512 // (1024 * 1024)
+SECTORS_PER_MB_SHIFT = 11
+
+# emuMMC RAW folder and its hekate folder id (the folder name read as a little-endian u32)
+RAW_FOLDER_NAME = "RAW1"
+RAW_FOLDER_ID = 0x31574152
+
+# emummc.ini for the RAW1 folder; only the sector and folder id vary (CRLF, as Windows text mode wrote it)
+EMUMMC_INI_TEMPLATE = (
+    b"[emummc]\r\n"
+    b"enabled=1\r\n"
+    b"sector=0x%X\r\n"
+    b"id=0x%X\r\n"
+    b"path=emuMMC/RAW1\r\n"
+    b"nintendo_path=emuMMC/RAW1/Nintendo\r\n"
+)
+
 class PartitionType(Enum):
     """Partition types"""
     FAT32 = 0x0C
@@ -23,11 +40,15 @@ class Partition:
     type_name: str
     start_sector: int
     size_sectors: int
-    size_mb: int
     category: str  # 'FAT32', 'Linux', 'Android', 'emuMMC', 'Free'
     in_mbr: bool = True
     in_gpt: bool = False
 
+    @property
+    def size_mb(self) -> int:
+        """Size in whole MB, derived from size_sectors"""
+        return self.size_sectors >> SECTORS_PER_MB_SHIFT
+
 class DiskLayout:
     """Represents complete disk partition layout"""
 
@@ -35,9 +56,6 @@ class DiskLayout:
         self.partitions: List[Partition] = []
         self.total_sectors = 0
         self.has_gpt = False
-        self.has_linux = False
-        self.has_android = False
-        self.has_emummc = False
 
         # Android details
         self.android_dynamic = False  # True = Android 10+, False = Android 7-9
@@ -45,15 +63,31 @@ class DiskLayout:
         # emuMMC details
         self.emummc_double = False  # True = dual emuMMC
 
+        self._reset_partition_stats()
+
+    def _reset_partition_stats(self):
+        """Reset the per-category index, flags and sizes derived from partitions"""
+        # Partitions grouped by category, kept in sync by add_partition
+        self._by_category: Dict[str, List[Partition]] = {}
+
+        self.has_linux = False
+        self.has_android = False
+        self.has_emummc = False
+
         # Sizes in MB
         self.fat32_size_mb = 0
         self.linux_size_mb = 0
         self.android_size_mb = 0
         self.emummc_size_mb = 0
 
+        # Sectors allocated to partitions, for get_free_space_mb
+        self._used_sectors = 0
+
     def add_partition(self, partition: Partition):
         """Add partition to layout"""
         self.partitions.append(partition)
+        self._by_category.setdefault(partition.category, []).append(partition)
+        self._used_sectors += partition.size_sectors
 
         # Update flags
         if partition.category == 'Linux':
@@ -68,31 +102,38 @@ class DiskLayout:
         elif partition.category == 'FAT32':
             self.fat32_size_mb += partition.size_mb
 
+    def set_partitions(self, partitions: List[Partition]):
+        """Replace all partitions, recalculating flags and sizes"""
+        self.partitions = []
+        self._reset_partition_stats()
+        for partition in partitions:
+            self.add_partition(partition)
+
+    def get_partitions_by_category(self, category: str) -> List[Partition]:
+        """Get all partitions of a category, in the order they were added"""
+        return list(self._by_category.get(category, ()))
+
     def get_fat32_partition(self) -> Optional[Partition]:
         """Get FAT32 partition"""
-        for p in self.partitions:
-            if p.category == 'FAT32':
-                return p
-        return None
+        fat32 = self._by_category.get('FAT32')
+        return fat32[0] if fat32 else None
 
     def get_linux_partition(self) -> Optional[Partition]:
         """Get Linux partition"""
-        for p in self.partitions:
-            if p.category == 'Linux':
-                return p
-        return None
+        linux = self._by_category.get('Linux')
+        return linux[0] if linux else None
 
     def get_linux_partitions(self) -> List[Partition]:
         """Get all Linux partitions"""
-        return [p for p in self.partitions if p.category == 'Linux']
+        return self.get_partitions_by_category('Linux')
 
     def get_emummc_partitions(self) -> List[Partition]:
         """Get all emuMMC partitions"""
-        return [p for p in self.partitions if p.category == 'emuMMC']
+        return self.get_partitions_by_category('emuMMC')
 
     def get_android_partitions(self) -> List[Partition]:
         """Get all Android partitions"""
-        return [p for p in self.partitions if p.category == 'Android']
+        return self.get_partitions_by_category('Android')
 
     def get_fat32_size_mb(self) -> int:
         """Get FAT32 partition size in MB"""
@@ -112,9 +153,7 @@ class DiskLayout:
 
     def get_free_space_mb(self) -> int:
         """Get free/unallocated space in MB"""
-        used_sectors = sum(p.size_sectors for p in self.partitions)
-        free_sectors = self.total_sectors - used_sectors
-        return (free_sectors * 512) // (1024 * 1024)
+        return (self.total_sectors - self._used_sectors) >> SECTORS_PER_MB_SHIFT
 
     def get_summary(self) -> str:
         """Get human-readable summary"""
@@ -11,6 +11,15 @@ from core.partition_models import DiskLayout, Partition, PartitionType
 SECTOR_SIZE = 512
 ALIGN_SECTORS = 0x8000  # 16MB alignment
 
+# MBR (sector 0) + GPT header (sector 1) + GPT entries (sectors 2-33)
+HEADER_SECTORS = 34
+
+_U32 = struct.Struct('<I')
+
+# GPT partition entry: type GUID, unique GUID, first LBA, last LBA, attributes, name
+_GPT_ENTRY = struct.Struct('<16s16sQQQ72s')
+EMPTY_GUID = b'\x00' * 16
+
 class PartitionScanner:
     """Scans disks and detects hekate partition layouts"""
 
@@ -31,18 +40,22 @@ class PartitionScanner:
         disk_size = self.disk_manager.get_disk_size(disk_path)
         layout.total_sectors = disk_size // SECTOR_SIZE
 
-        # Read MBR (sector 0)
-        mbr_data = self.disk_manager.read_sectors(disk_path, 0, 1)
+        # Read MBR, GPT header and GPT entries with a single raw disk read
+        # and slice the individual structures out of it without copying
+        header_data = memoryview(self.disk_manager.read_sectors(disk_path, 0, HEADER_SECTORS))
+
+        # MBR (sector 0)
+        mbr_data = header_data[0:SECTOR_SIZE]
         self._parse_mbr(mbr_data, layout)
         logger.info(f"After MBR parse: {len(layout.partitions)} partitions")
         for p in layout.partitions:
             logger.info(f"  MBR: {p.name} ({p.category}) at sector {p.start_sector}, size {p.size_mb}MB")
 
         # Check for GPT (sector 1)
-        gpt_header_data = self.disk_manager.read_sectors(disk_path, 1, 1)
+        gpt_header_data = header_data[SECTOR_SIZE:2 * SECTOR_SIZE]
         if gpt_header_data[0:8] == b'EFI PART':
-            # Read GPT entries (sectors 2-33)
-            gpt_entries_data = self.disk_manager.read_sectors(disk_path, 2, 32)
+            # GPT entries (sectors 2-33)
+            gpt_entries_data = header_data[2 * SECTOR_SIZE:HEADER_SECTORS * SECTOR_SIZE]
             mbr_count = len(layout.partitions)
             self._parse_gpt(gpt_entries_data, layout)
             logger.info(f"After GPT parse: {len(layout.partitions)} partitions (added {len(layout.partitions) - mbr_count} from GPT)")
@@ -72,7 +85,7 @@ class PartitionScanner:
 
         return layout
 
-    def _parse_mbr(self, mbr_data: bytes, layout: DiskLayout):
+    def _parse_mbr(self, mbr_data, layout: DiskLayout):
         """Parse MBR partition table"""
 
         # Check boot signature
@@ -82,13 +95,12 @@ class PartitionScanner:
         # Parse 4 partition entries
         for i in range(4):
             offset = 0x1BE + (i * 16)
-            entry = mbr_data[offset:offset + 16]
 
             # Extract partition info
-            status = entry[0]
-            part_type = entry[4]
-            start_sector = struct.unpack('<I', entry[8:12])[0]
-            size_sectors = struct.unpack('<I', entry[12:16])[0]
+            status = mbr_data[offset]
+            part_type = mbr_data[offset + 4]
+            start_sector = _U32.unpack_from(mbr_data, offset + 8)[0]
+            size_sectors = _U32.unpack_from(mbr_data, offset + 12)[0]
 
             # Skip empty partitions
             if part_type == 0 or size_sectors == 0:
@@ -101,15 +113,12 @@ class PartitionScanner:
             # Determine partition category and name
             category, name = self._categorize_partition(part_type, f"MBR{i}")
 
-            size_mb = (size_sectors * SECTOR_SIZE) // (1024 * 1024)
-
             partition = Partition(
                 name=name,
                 type_id=part_type,
                 type_name=self._get_type_name(part_type),
                 start_sector=start_sector,
                 size_sectors=size_sectors,
-                size_mb=size_mb,
                 category=category,
                 in_mbr=True,
                 in_gpt=False
@@ -117,33 +126,21 @@ class PartitionScanner:
 
             layout.add_partition(partition)
 
-    def _parse_gpt(self, gpt_data: bytes, layout: DiskLayout):
+    def _parse_gpt(self, gpt_data, layout: DiskLayout):
         """Parse GPT partition entries"""
 
         # GPT entry size is 128 bytes
         # We have 32 sectors * 512 bytes = 16384 bytes
-        # Maximum 128 entries
-
-        for i in range(128):
-            offset = i * 128
-            entry = gpt_data[offset:offset + 128]
-
-            # Type GUID
-            type_guid = entry[0:16]
+        # Maximum 128 entries, unpacked in one pass with a precompiled layout
 
+        for i, (type_guid, _, lba_start, lba_end, _, name_bytes) in enumerate(_GPT_ENTRY.iter_unpack(gpt_data)):
             # Check if entry is empty (all zeros)
-            if type_guid == b'\x00' * 16:
+            if type_guid == EMPTY_GUID:
                 continue
 
-            # LBA start and end
-            lba_start = struct.unpack('<Q', entry[32:40])[0]
-            lba_end = struct.unpack('<Q', entry[40:48])[0]
-
             size_sectors = lba_end - lba_start + 1
-            size_mb = (size_sectors * SECTOR_SIZE) // (1024 * 1024)
 
             # Name (UTF-16LE, max 72 bytes = 36 characters)
-            name_bytes = entry[56:56 + 72]
             name = name_bytes.decode('utf-16le', errors='ignore').rstrip('\x00')
 
             if not name:
@@ -158,7 +155,6 @@ class PartitionScanner:
                 type_name=category,
                 start_sector=lba_start,
                 size_sectors=size_sectors,
-                size_mb=size_mb,
                 category=category,
                 in_mbr=False,
                 in_gpt=True
@@ -319,28 +315,7 @@ class PartitionScanner:
 
         # Replace partitions list and recalculate sizes
         # Sort by start_sector to ensure physical disk order (left to right)
-        layout.partitions = sorted(unique_partitions, key=lambda p: p.start_sector)
-        layout.has_linux = False
-        layout.has_android = False
-        layout.has_emummc = False
-        layout.fat32_size_mb = 0
-        layout.linux_size_mb = 0
-        layout.android_size_mb = 0
-        layout.emummc_size_mb = 0
-
-        # Recalculate flags and sizes
-        for p in layout.partitions:
-            if p.category == 'Linux':
-                layout.has_linux = True
-                layout.linux_size_mb += p.size_mb
-            elif p.category == 'Android':
-                layout.has_android = True
-                layout.android_size_mb += p.size_mb
-            elif p.category == 'emuMMC':
-                layout.has_emummc = True
-                layout.emummc_size_mb += p.size_mb
-            elif p.category == 'FAT32':
-                layout.fat32_size_mb += p.size_mb
+        layout.set_partitions(sorted(unique_partitions, key=lambda p: p.start_sector))
 
     def calculate_target_layout(self, source_layout: DiskLayout, target_size_bytes: int,
                                 options: Dict) -> DiskLayout:
@@ -421,7 +396,6 @@ class PartitionScanner:
             type_name='FAT32 (LBA)',
             start_sector=current_lba,
             size_sectors=fat32_sectors,
-            size_mb=fat32_size_mb,
             category='FAT32',
             in_mbr=True,
             in_gpt=target_layout.has_gpt
@@ -442,7 +416,6 @@ class PartitionScanner:
                 type_name='Linux',
                 start_sector=current_lba,
                 size_sectors=linux_sectors,
-                size_mb=source_layout.linux_size_mb,
                 category='Linux',
                 # Only include in MBR if no GPT (i.e., no Android). When Android is present,
                 # Linux should only be in GPT to match Hekate's hybrid MBR+GPT implementation.
@@ -466,7 +439,6 @@ class PartitionScanner:
                     type_name=apart.type_name,
                     start_sector=current_lba,
                     size_sectors=apart.size_sectors,
-                    size_mb=apart.size_mb,
                     category='Android',
                     in_mbr=False,
                     in_gpt=True
@@ -487,7 +459,6 @@ class PartitionScanner:
                 # This prevents Windows sector access errors at partition boundaries
                 safety_margin = 2048  # 1MB
                 adjusted_size_sectors = max(0, epart.size_sectors - safety_margin)
-                adjusted_size_mb = (adjusted_size_sectors * SECTOR_SIZE) // (1024 * 1024)
 
                 new_epart = Partition(
                     name=epart.name,
@@ -495,13 +466,12 @@ class PartitionScanner:
                     type_name='emuMMC',
                     start_sector=current_lba,
                     size_sectors=adjusted_size_sectors,
-                    size_mb=adjusted_size_mb,
                     category='emuMMC',
                     in_mbr=True,
                     in_gpt=target_layout.has_gpt
                 )
                 target_layout.add_partition(new_epart)
-                logger.info(f"  Added emuMMC partition: {epart.name}, {adjusted_size_mb} MB (reduced by 1MB safety margin)")
+                logger.info(f"  Added emuMMC partition: {epart.name}, {new_epart.size_mb} MB (reduced by 1MB safety margin)")
                 current_lba += adjusted_size_sectors
         else:
             logger.info(f"NOT adding emuMMC partitions - has_emummc={source_layout.has_emummc}, migrate_emummc={options.get('migrate_emummc', False)}")
@@ -37,26 +37,22 @@ class PartitionWriter:
         # Create MBR
         mbr_data = self._create_mbr(layout)
 
-        # Write MBR to sector 0 (skip prepare since we just did it)
-        self.disk_manager.write_sectors(disk_path, 0, mbr_data, skip_prepare=True)
+        # MBR goes to sector 0
+        runs = [(0, mbr_data)]
 
-        # Create and write GPT if needed
+        # Create GPT if needed
         if layout.has_gpt:
             gpt_data = self._create_gpt(layout)
 
-            # Write main GPT header (sector 1)
-            self.disk_manager.write_sectors(disk_path, 1, gpt_data['main_header'], skip_prepare=True)
+            # Main GPT header (sector 1) and entries (sectors 2-33)
+            runs.append((1, gpt_data['main_header'] + gpt_data['entries']))
 
-            # Write GPT entries (sectors 2-33)
-            self.disk_manager.write_sectors(disk_path, 2, gpt_data['entries'], skip_prepare=True)
-
-            # Write backup GPT entries
+            # Backup GPT entries followed by the backup header in the last sector
             backup_entries_lba = layout.total_sectors - 33
-            self.disk_manager.write_sectors(disk_path, backup_entries_lba, gpt_data['entries'], skip_prepare=True)
+            runs.append((backup_entries_lba, gpt_data['entries'] + gpt_data['backup_header']))
 
-            # Write backup GPT header
-            backup_header_lba = layout.total_sectors - 1
-            self.disk_manager.write_sectors(disk_path, backup_header_lba, gpt_data['backup_header'], skip_prepare=True)
+        # Write everything in one batch (skip prepare since we just did it)
+        self.disk_manager.write_sectors_many(disk_path, runs, skip_prepare=True)
 
     def _create_mbr(self, layout: DiskLayout) -> bytes:
         """Create MBR (512 bytes)"""
@@ -28,7 +28,7 @@ class MainWindow:
 
     def __init__(self, root):
         self.root = root
-        self.disk_manager = DiskManager()
+        self.disk_manager = DiskManager(watch_changes=True)
         self.scanner = PartitionScanner()
         self.migration_engine = None
 